@@ -45,6 +45,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First, its total covers the other middlewares
+    'core.timing.RequestTimingMiddleware',
+    'core.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -52,6 +55,8 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    # Last, profiles the view alone, unused with REQUEST_PROFILING off
+    'core.profiling.ProfilingMiddleware',
 ]
 
 ROOT_URLCONF = 'app.urls'
@@ -89,6 +94,27 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/2.1/ref/settings/#caches
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # Tag and character list responses of 'series.cache', in process by
+    # default(least recently used entries culled past MAX_ENTRIES), use a
+    # shared backend(memcached..) to share it between workers
+    'series': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'series-lists',
+        'TIMEOUT': 600,
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
+    },
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/2.1/ref/settings/#auth-password-validators
 
@@ -136,3 +162,63 @@ MEDIA_ROOT = '/vol/web/media'
 STATIC_ROOT = '/vol/web/static'
 # custom User model authorization
 AUTH_USER_MODEL = 'core.User'
+
+# In-process token -> user cache of 'core.authentication', max. number of
+# tokens kept and their time to live in seconds
+TOKEN_CACHE_SIZE = 10000
+TOKEN_CACHE_TTL = 300
+# Lifetime in seconds of the signed access tokens, see 'users:token-refresh'
+ACCESS_TOKEN_LIFETIME = 300
+# Alias in CACHES of the tag and character list response cache
+SERIES_LIST_CACHE = 'series'
+
+# Requests slower than this(ms) get their SQL logged by
+# 'core.timing.RequestTimingMiddleware', for this fraction of them
+REQUEST_TIMING_SLOW_MS = 500
+REQUEST_TIMING_TRACE_RATE = 1.0
+# Directory shared by the worker processes for the '/metrics' values, each
+# process writes its own at most every METRICS_FLUSH_INTERVAL seconds. Unset
+# with a single process, the values then stay in memory.
+METRICS_DIR = os.environ.get('METRICS_DIR')
+METRICS_FLUSH_INTERVAL = 5
+# '?profile=cprofile|stacks|memory' requests of staff users return a profile
+# of the view, see 'core.profiling'. The stacks are sampled every interval
+# (seconds).
+REQUEST_PROFILING = os.environ.get('REQUEST_PROFILING') == '1'
+REQUEST_PROFILING_SAMPLE_INTERVAL = 0.001
+
+# Statements slower than this(ms) are logged by 'core.slow_queries' to the
+# SLOW_QUERY_LOG file(JSON lines, summarized by 'manage.py slow_queries'), a
+# fraction of them with their plan. Nothing is logged without a file.
+# EXPLAIN ANALYZE runs the SELECTs again in the request, opt-in.
+SLOW_QUERY_MS = 200
+SLOW_QUERY_EXPLAIN_RATE = 0.1
+SLOW_QUERY_EXPLAIN_ANALYZE = \
+    os.environ.get('SLOW_QUERY_EXPLAIN_ANALYZE') == '1'
+SLOW_QUERY_LOG = os.environ.get('SLOW_QUERY_LOG')
+
+# The per-request timing lines are logged at INFO, slow request traces at
+# WARNING
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+        'slow_query_file': {
+            'class': 'logging.FileHandler',
+            'filename': SLOW_QUERY_LOG,
+            'delay': True,
+        } if SLOW_QUERY_LOG else {'class': 'logging.NullHandler'},
+    },
+    'loggers': {
+        'core.timing': {
+            'handlers': ['console'],
+            'level': os.environ.get('REQUEST_LOG_LEVEL', 'WARNING'),
+        },
+        'core.slow_queries': {
+            'handlers': ['slow_query_file'],
+            'level': 'WARNING' if SLOW_QUERY_LOG else 'CRITICAL',
+            'propagate': False,
+        },
+    },
+}
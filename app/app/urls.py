@@ -19,8 +19,12 @@ from django.urls import path, include
 from django.conf.urls.static import static
 from django.conf import settings
 
+from core.metrics import metrics_view
+
 urlpatterns = [
     path('admin/', admin.site.urls),
+    # Prometheus scrape endpoint
+    path('metrics', metrics_view, name='metrics'),
     path('api/user/', include('users.urls')),
     path('api/series/', include('series.urls')),
 ] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
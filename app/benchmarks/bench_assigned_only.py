@@ -0,0 +1,89 @@
+# Benchmark for the 'assigned_only' tags/characters filter, compares the old
+# JOIN + DISTINCT query with the EXISTS semi-join used by the views.
+# The bench_* modules are not picked by the test discovery, run it with:
+#   python manage.py test benchmarks.bench_assigned_only
+import random
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+
+from core.models import Tag, Series
+from series.views import TagViewSet
+
+
+SERIES = 100000
+TAGS = 200
+TAGS_PER_SERIES = 3
+
+
+def explain_analyze(queryset):
+    """Return the EXPLAIN ANALYZE output of a queryset"""
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute('EXPLAIN ANALYZE ' + sql, params)
+        return '\n'.join(row[0] for row in cursor.fetchall())
+
+
+def execution_time(plan):
+    """Return the execution time in ms reported by EXPLAIN ANALYZE"""
+    line = next(
+        line for line in plan.splitlines()
+        if line.startswith('Execution Time')
+    )
+    return float(line.split(':')[1].split()[0])
+
+
+class AssignedOnlyBenchmark(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        rand = random.Random(1)
+        cls.user = get_user_model().objects.create_user(
+            'bench@akshay.com', 'benchpass'
+        )
+        # Half of the tags are never used, the assigned filter has work to do
+        tags = Tag.objects.bulk_create(
+            Tag(user=cls.user, name=f'Tag {i}') for i in range(TAGS)
+        )
+        used_tags = [tag.id for tag in tags[:TAGS // 2]]
+        series = Series.objects.bulk_create(
+            Series(user=cls.user, title=f'Series {i}', watch_rate=1, rating=5)
+            for i in range(SERIES)
+        )
+        Series.tags.through.objects.bulk_create(
+            (
+                Series.tags.through(series_id=item.id, tag_id=tag_id)
+                for item in series
+                for tag_id in rand.sample(used_tags, TAGS_PER_SERIES)
+            ),
+            batch_size=10000
+        )
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def test_compare_plans(self):
+        """Compare the JOIN + DISTINCT and the EXISTS plans"""
+        old = Tag.objects.filter(
+            series__isnull=False
+        ).filter(user=self.user).order_by('-name').distinct()
+        new = Tag.objects.extra(
+            where=[TagViewSet()._assigned_sql()]
+        ).filter(user=self.user).order_by('-name')
+
+        # Same tags, in the same order
+        self.assertEqual(
+            list(old.values_list('id', flat=True)),
+            list(new.values_list('id', flat=True))
+        )
+
+        results = {}
+        for name, queryset in (('join+distinct', old), ('exists', new)):
+            explain_analyze(queryset)  # warm up the cache
+            plan = explain_analyze(queryset)
+            results[name] = execution_time(plan)
+            print(f'\n--- {name} ---\n{plan}')
+
+        print(f"\n{SERIES} series, {TAGS} tags: "
+              f"join+distinct {results['join+distinct']:.2f} ms, "
+              f"exists {results['exists']:.2f} ms")
@@ -0,0 +1,64 @@
+# Benchmark for the authentication modes of the series endpoints, compares
+# the requests/sec of database tokens(cold and cached) and signed tokens.
+#   python manage.py test benchmarks.bench_auth_modes
+import time
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.authentication import create_access_token, token_cache
+from core.models import Tag
+
+
+TAGS_URL = reverse('series:tag-list')
+REQUESTS = 1000
+
+
+class AuthModesBenchmark(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(
+            'bench@akshay.com', 'benchpass'
+        )
+        cls.token = Token.objects.create(user=cls.user)
+        Tag.objects.create(user=cls.user, name='Drama')
+
+    def _requests_per_second(self, header, clear_cache=False):
+        """Return the requests/sec of GETs to the tags list"""
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=header)
+        token_cache.clear()
+
+        start = time.perf_counter()
+        for _ in range(REQUESTS):
+            if clear_cache:
+                token_cache.clear()
+            res = client.get(TAGS_URL)
+        elapsed = time.perf_counter() - start
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return REQUESTS / elapsed
+
+    def test_compare_auth_modes(self):
+        """Compare the token and the signed access token requests/sec"""
+        results = {
+            'token (database)': self._requests_per_second(
+                f'Token {self.token.key}', clear_cache=True
+            ),
+            'token (cached)': self._requests_per_second(
+                f'Token {self.token.key}'
+            ),
+            'signed access token': self._requests_per_second(
+                f'Bearer {create_access_token(self.user)}'
+            ),
+        }
+
+        print()
+        for name, rate in results.items():
+            print(f'{name:>20}: {rate:8.1f} req/s')
@@ -0,0 +1,57 @@
+# Benchmark for the series bulk create endpoint, series/sec of a 10k items
+# request with tags and characters.
+#   python manage.py test benchmarks.bench_bulk_create
+import time
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Tag, Character, Series
+
+
+SERIES_BULK_URL = reverse('series:series-bulk-create')
+ITEMS = 10000
+
+
+class BulkCreateBenchmark(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(
+            'bench@akshay.com', 'benchpass'
+        )
+        cls.tags = Tag.objects.bulk_create(
+            Tag(user=cls.user, name=f'Tag {i}') for i in range(50)
+        )
+        cls.characters = Character.objects.bulk_create(
+            Character(user=cls.user, name=f'Character {i}') for i in range(50)
+        )
+
+    def test_bulk_create_rate(self):
+        """Measure the series/sec of the bulk create endpoint"""
+        client = APIClient()
+        client.force_authenticate(self.user)
+        items = [{
+            'title': f'Series {i}',
+            'status': bool(i % 2),
+            'watch_rate': i % 20,
+            'rating': '8.25',
+            'link': '',
+            'tags': [tag.id for tag in self.tags[i % 47:i % 47 + 3]],
+            'characters': [
+                character.id for character in self.characters[i % 48:][:2]
+            ],
+        } for i in range(ITEMS)]
+
+        start = time.perf_counter()
+        res = client.post(SERIES_BULK_URL, items, format='json')
+        elapsed = time.perf_counter() - start
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Series.objects.count(), ITEMS)
+        print(f'\n{ITEMS} series in {elapsed:.2f} s: '
+              f'{ITEMS / elapsed:.0f} series/sec')
@@ -0,0 +1,69 @@
+# Benchmark for the streaming export, time to first byte, rows/sec and the
+# peak memory(tracemalloc) for a small and a large library.
+#   python manage.py test benchmarks.bench_export
+import time
+import tracemalloc
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from core.models import Tag, Series
+from series.bulk import insert_through_rows
+
+
+EXPORT_URL = reverse('series:series-export')
+SIZES = (1000, 100000)
+
+
+class ExportBenchmark(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = []
+        for size in SIZES:
+            user = get_user_model().objects.create_user(
+                f'bench{size}@akshay.com', 'benchpass'
+            )
+            tags = Tag.objects.bulk_create(
+                Tag(user=user, name=f'Tag {i}') for i in range(50)
+            )
+            series = Series.objects.bulk_create(
+                Series(user=user, title=f'Series {i}', watch_rate=i % 20,
+                       rating='8.25')
+                for i in range(size)
+            )
+            insert_through_rows(
+                'tags',
+                [item.id for item in series for _ in range(3)],
+                [tags[(i + j) % 50].id
+                 for i in range(size) for j in range(3)]
+            )
+            cls.users.append(user)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def test_export(self):
+        """Measure the export of a small and a large library"""
+        for size, user in zip(SIZES, self.users):
+            client = APIClient()
+            client.force_authenticate(user)
+
+            tracemalloc.start()
+            start = time.perf_counter()
+            res = client.get(EXPORT_URL)
+            stream = iter(res.streaming_content)
+            length = len(next(stream))
+            first_byte = time.perf_counter() - start
+            for chunk in stream:
+                length += len(chunk)
+            elapsed = time.perf_counter() - start
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+            print(f'\n{size} series, {length / 2 ** 20:.1f} MB: first byte '
+                  f'{first_byte * 1000:.0f} ms, {size / elapsed:.0f} rows/sec,'
+                  f' peak memory {peak / 2 ** 20:.1f} MB')
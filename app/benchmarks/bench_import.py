@@ -0,0 +1,64 @@
+# Benchmark for the 'import_series' command, rows/sec of a 100k records
+# NDJSON file with tags and characters, with and without the foreign key
+# checks(needs a superuser). A TransactionTestCase, the checks run at commit.
+#   python manage.py test benchmarks.bench_import
+import json
+import os
+import tempfile
+import time
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TransactionTestCase
+
+from core.models import Series
+
+
+ROWS = 100000
+
+
+class ImportBenchmark(TransactionTestCase):
+
+    def _write_records(self, links):
+        """Write the NDJSON input, return its path"""
+        handle, path = tempfile.mkstemp(suffix='.ndjson')
+        self.addCleanup(os.remove, path)
+        with os.fdopen(handle, 'w') as input_file:
+            for i in range(ROWS):
+                record = {
+                    'title': f'Series {i}',
+                    'start_date': '2020-01-01T10:00:00+00:00',
+                    'status': bool(i % 2),
+                    'rating': '8.25',
+                    'link': '',
+                    'watch_rate': i % 20,
+                }
+                if links:
+                    record['tags'] = [f'Tag {(i + j) % 200}' for j in range(3)]
+                    record['characters'] = [f'Character {i % 500}']
+                input_file.write(json.dumps(record) + '\n')
+        return path
+
+    def test_import_rate(self):
+        """Measure the rows/sec of the import command"""
+        user = get_user_model().objects.create_user(
+            'bench@akshay.com', 'benchpass'
+        )
+        for links in (False, True):
+            path = self._write_records(links)
+            for skip_fk_checks in (False, True):
+                for model in (Series.tags.through,
+                              Series.characters.through, Series):
+                    model.objects.all()._raw_delete('default')
+
+                start = time.perf_counter()
+                call_command('import_series', path, user=user.email,
+                             restart=True, skip_fk_checks=skip_fk_checks,
+                             stdout=StringIO())
+                elapsed = time.perf_counter() - start
+
+                self.assertEqual(Series.objects.count(), ROWS)
+                print(f'\n{ROWS} series, {4 * links} links each, fk checks '
+                      f'{"off" if skip_fk_checks else "on"}: {elapsed:.2f} s, '
+                      f'{ROWS / elapsed:.0f} series/sec')
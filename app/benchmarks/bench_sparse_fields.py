@@ -0,0 +1,68 @@
+# Benchmark for the sparse fieldsets of the series list, time and queries of
+# a 1000 series page with every field and with '?fields=id,title,status'.
+#   python manage.py test benchmarks.bench_sparse_fields
+import time
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from core.models import Tag, Character, Series
+from series.bulk import insert_through_rows
+
+
+SERIES_URL = reverse('series:series-list')
+SIZE = 20000
+ROUNDS = 20
+FIELDSETS = (None, 'id,title,status', 'id,title,status,tags')
+
+
+class SparseFieldsBenchmark(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(
+            'bench@akshay.com', 'benchpass'
+        )
+        series = Series.objects.bulk_create(
+            Series(user=cls.user, title=f'Series {i}', watch_rate=i % 20,
+                   rating='8.25', link='https://example.com/series')
+            for i in range(SIZE)
+        )
+        for model, field_name, per_series in ((Tag, 'tags', 3),
+                                              (Character, 'characters', 2)):
+            related = model.objects.bulk_create(
+                model(user=cls.user, name=f'{field_name} {i}')
+                for i in range(50)
+            )
+            insert_through_rows(
+                field_name,
+                [item.id for item in series for _ in range(per_series)],
+                [related[(i + j) % 50].id
+                 for i in range(SIZE) for j in range(per_series)]
+            )
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def test_sparse_fields(self):
+        """Measure a page of series with and without a sparse fieldset"""
+        client = APIClient()
+        client.force_authenticate(self.user)
+        for fields in FIELDSETS:
+            params = {'page_size': 1000}
+            if fields is not None:
+                params['fields'] = fields
+            client.get(SERIES_URL, params)
+
+            start = time.perf_counter()
+            for _ in range(ROUNDS):
+                with CaptureQueriesContext(connection) as queries:
+                    client.get(SERIES_URL, params)
+            elapsed = (time.perf_counter() - start) / ROUNDS
+
+            print(f'\nfields={fields or "(all)"}: {elapsed * 1000:.1f} ms '
+                  f'per 1000 series page, {len(queries)} queries')
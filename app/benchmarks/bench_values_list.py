@@ -0,0 +1,69 @@
+# Benchmark for the values() path of the series list against the serializer
+# path, rows per second and queries of a 1000 series page.
+#   python manage.py test benchmarks.bench_values_list
+import time
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from core.models import Tag, Character, Series
+from series.bulk import insert_through_rows
+from series.views import SeriesViewSet
+
+
+SERIES_URL = reverse('series:series-list')
+SIZE = 20000
+PAGE_SIZE = 1000
+ROUNDS = 20
+
+
+class ValuesListBenchmark(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(
+            'bench@akshay.com', 'benchpass'
+        )
+        series = Series.objects.bulk_create(
+            Series(user=cls.user, title=f'Series {i}', watch_rate=i % 20,
+                   rating='8.25', link='https://example.com/series')
+            for i in range(SIZE)
+        )
+        for model, field_name, per_series in ((Tag, 'tags', 3),
+                                              (Character, 'characters', 2)):
+            related = model.objects.bulk_create(
+                model(user=cls.user, name=f'{field_name} {i}')
+                for i in range(50)
+            )
+            insert_through_rows(
+                field_name,
+                [item.id for item in series for _ in range(per_series)],
+                [related[(i + j) % 50].id
+                 for i in range(SIZE) for j in range(per_series)]
+            )
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def test_values_list(self):
+        """Measure a page of series through the serializer and values()"""
+        client = APIClient()
+        client.force_authenticate(self.user)
+        params = {'page_size': PAGE_SIZE}
+        for label, values_list in (('serializer', False), ('values', True)):
+            with patch.object(SeriesViewSet, 'values_list', values_list):
+                client.get(SERIES_URL, params)
+                start = time.perf_counter()
+                for _ in range(ROUNDS):
+                    with CaptureQueriesContext(connection) as queries:
+                        client.get(SERIES_URL, params)
+                elapsed = (time.perf_counter() - start) / ROUNDS
+
+            print(f'\n{label}: {elapsed * 1000:.1f} ms per {PAGE_SIZE} '
+                  f'series page, {PAGE_SIZE / elapsed:,.0f} rows/s, '
+                  f'{len(queries)} queries')
@@ -3,3 +3,10 @@ from django.apps import AppConfig
 
 class CoreConfig(AppConfig):
     name = 'core'
+
+    def ready(self):
+        """Connect the signal handlers, expose the token cache counters"""
+        from core import signals  # noqa: F401
+        from core.authentication import token_cache
+        from core.metrics import registry
+        registry.add_cache('token', token_cache)
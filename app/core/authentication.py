@@ -0,0 +1,145 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import signing
+from django.utils.translation import ugettext_lazy as _
+
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+
+
+# Bounded in-process LRU cache with a TTL, for the token -> user lookup.
+# Entries are dropped by the signals in 'core.signals' when a token gets
+# deleted or a user saved, in other worker processes the TTL bounds how long
+# a stale entry can live.
+class TokenCache:
+    """
+    LRU cache of auth tokens with a time to live
+    """
+
+    def __init__(self, max_size=10000, ttl=300):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return the cached token for 'key', None if missing or expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            # Most recently used entries are kept at the end
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, token):
+        """Cache a token, evicting the least recently used entries"""
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, token)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key):
+        """Drop the entry for a token key"""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def invalidate_user(self, user_id):
+        """Drop every entry belonging to a user"""
+        with self._lock:
+            for key in [key for key, (_, token) in self._entries.items()
+                        if token.user_id == user_id]:
+                del self._entries[key]
+
+    def clear(self):
+        """Drop all the entries and reset the counters"""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        """Return the size and the hit/miss counters"""
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+            }
+
+
+token_cache = TokenCache(
+    max_size=getattr(settings, 'TOKEN_CACHE_SIZE', 10000),
+    ttl=getattr(settings, 'TOKEN_CACHE_TTL', 300),
+)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    Token authentication that skips the database for recently seen tokens
+    """
+    cache = token_cache
+
+    def authenticate_credentials(self, key):
+        """Return the (user, token) from the cache or the database"""
+        token = self.cache.get(key)
+        if token is None:
+            # Raises AuthenticationFailed for unknown keys and inactive
+            # users, only valid tokens get cached
+            user, token = super().authenticate_credentials(key)
+            self.cache.set(key, token)
+
+        # Each request gets its own copy(with the user), views may modify
+        # request.user and must not touch the cached instance
+        token = copy.deepcopy(token)
+        return (token.user, token)
+
+
+# Short lived access tokens, signed with the SECRET_KEY and carrying the user
+# id and the expiry. Checking one is a HMAC computation, no database lookup,
+# the long lived authtoken(refresh token) is used to get new ones.
+ACCESS_TOKEN_SALT = 'core.authentication.access'
+
+
+def create_access_token(user):
+    """Return a signed access token for the user"""
+    lifetime = getattr(settings, 'ACCESS_TOKEN_LIFETIME', 300)
+    return signing.dumps(
+        {'uid': user.pk, 'exp': int(time.time()) + lifetime},
+        salt=ACCESS_TOKEN_SALT
+    )
+
+
+class SignedTokenAuthentication(TokenAuthentication):
+    """
+    Stateless authentication with signed access tokens
+    """
+    keyword = 'Bearer'
+
+    def authenticate_credentials(self, key):
+        """Return a (user, payload) if the signature is valid"""
+        try:
+            payload = signing.loads(key, salt=ACCESS_TOKEN_SALT)
+        except signing.BadSignature:
+            raise exceptions.AuthenticationFailed(_('Invalid token.'))
+        if payload['exp'] < time.time():
+            raise exceptions.AuthenticationFailed(_('Token has expired.'))
+
+        # The user is never loaded, views only get its id(to filter and to
+        # assign owned objects). A deactivated user keeps access until the
+        # token expires, refreshing it checks the database again.
+        user = get_user_model()(pk=payload['uid'], is_active=True)
+        user._state.adding = False
+        return (user, payload)
@@ -0,0 +1,355 @@
+import json
+import math
+import os
+import platform
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO, StringIO
+from itertools import count
+
+import django
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.core.signals import request_finished, request_started
+from django.db import close_old_connections, connection
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+
+from PIL import Image
+
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.authentication import create_access_token
+from core.models import Tag, Series
+
+
+# Endpoints measured, in this order, see the '_call_<name>' methods
+ENDPOINTS = (
+    'user_create', 'token', 'me', 'tags', 'characters', 'series_list',
+    'series_detail', 'series_filter', 'upload_image',
+)
+PERCENTILES = (50, 95, 99)
+# Prefix of the dataset users, the benchmark user is the first one(the
+# largest library with the default skew)
+PREFIX = 'bench'
+PASSWORD = 'password'
+
+
+def percentile(ordered, percent):
+    """Return the nearest-rank percentile of a sorted list"""
+    rank = max(math.ceil(percent / 100 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+def compare(results, baseline, tolerance):
+    """Return the regressions of 'results' against a baseline run"""
+    regressions = []
+    for name, current in results['endpoints'].items():
+        previous = baseline.get('endpoints', {}).get(name)
+        if previous is None:
+            continue
+        # Latency and throughput vary from run to run, the query count and
+        # the errors must not get worse at all
+        checks = (
+            ('p95_ms', current['p95_ms'] >
+             previous['p95_ms'] * (1 + tolerance)),
+            ('requests_per_sec', current['requests_per_sec'] <
+             previous['requests_per_sec'] * (1 - tolerance)),
+            ('queries_per_request', current['queries_per_request'] >
+             previous['queries_per_request']),
+            ('errors', current['errors'] > previous['errors']),
+        )
+        for metric, regressed in checks:
+            if regressed:
+                regressions.append(
+                    f'{name}: {metric} {previous[metric]} -> {current[metric]}'
+                )
+    return regressions
+
+
+class Command(BaseCommand):
+    """
+    Django command to benchmark the API endpoints under concurrency
+    """
+    help = 'Measure latency percentiles, requests/sec and queries per ' \
+           'request of the API endpoints'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200,
+                            help='Measured requests per endpoint')
+        parser.add_argument('--concurrency', type=int, default=4,
+                            help='Client threads per endpoint')
+        parser.add_argument('--warmup', type=int, default=10,
+                            help='Unmeasured requests per endpoint')
+        parser.add_argument('--endpoints', nargs='+', choices=ENDPOINTS,
+                            default=list(ENDPOINTS))
+        parser.add_argument('--users', type=int, default=10,
+                            help='Users of the generated dataset')
+        parser.add_argument('--series', type=int, default=20000,
+                            help='Series of the generated dataset')
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--output',
+                            help="Write the results as JSON, '-' for stdout")
+        parser.add_argument(
+            '--baseline',
+            help='JSON results of an earlier run, fail on regressions'
+        )
+        parser.add_argument(
+            '--tolerance', type=float, default=0.2,
+            help='Allowed p95 and requests/sec change against the baseline'
+        )
+        parser.add_argument(
+            '--keepdb', action='store_true',
+            help='Keep the benchmark database(and its dataset) for next runs'
+        )
+        parser.add_argument(
+            '--use-current-db', action='store_true',
+            help='Run in the configured database instead of a test database'
+        )
+
+    def handle(self, *args, **options):
+        """Run the benchmark in a throwaway database, report and compare"""
+        self.options = options
+        if options['requests'] < 1 or options['concurrency'] < 1:
+            raise CommandError('Give at least one request and one thread')
+        baseline = self._load_baseline(options['baseline'])
+
+        if options['use_current_db']:
+            results = self._run()
+        else:
+            # The test database of the test runner, the benchmark writes
+            # users, series and images
+            old_name = connection.settings_dict['NAME']
+            connection.creation.create_test_db(
+                verbosity=0, autoclobber=True, keepdb=options['keepdb']
+            )
+            try:
+                results = self._run()
+            finally:
+                connection.creation.destroy_test_db(
+                    old_name, verbosity=0, keepdb=options['keepdb']
+                )
+
+        self._report(results)
+        if options['output'] == '-':
+            self.stdout.write(json.dumps(results, indent=2))
+        elif options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(results, output, indent=2)
+
+        if baseline is not None:
+            regressions = compare(results, baseline, options['tolerance'])
+            if regressions:
+                raise CommandError(
+                    'Regressions against the baseline:\n' +
+                    '\n'.join(regressions)
+                )
+            self.stdout.write(self.style.SUCCESS(
+                'No regressions against the baseline'
+            ))
+
+    def _load_baseline(self, path):
+        """Return the baseline results, None without one"""
+        if path is None:
+            return None
+        try:
+            with open(path) as baseline:
+                return json.load(baseline)
+        except (OSError, ValueError) as exc:
+            raise CommandError(f'Can not read the baseline: {exc}')
+
+    def _run(self):
+        """Prepare the dataset and measure every endpoint"""
+        media_root = tempfile.mkdtemp()
+        # The test client closes the thread's connection after each request,
+        # like a server without persistent connections. Worker threads keep
+        # theirs here, as with CONN_MAX_AGE, or every request would pay for
+        # a new connection.
+        request_started.disconnect(close_old_connections)
+        request_finished.disconnect(close_old_connections)
+        try:
+            with override_settings(DEBUG=False, ALLOWED_HOSTS=['testserver'],
+                                   MEDIA_ROOT=media_root):
+                self._prepare()
+                endpoints = {
+                    name: self._measure(name)
+                    for name in ENDPOINTS if name in self.options['endpoints']
+                }
+        finally:
+            request_started.connect(close_old_connections)
+            request_finished.connect(close_old_connections)
+            shutil.rmtree(media_root, ignore_errors=True)
+
+        return {
+            'meta': {
+                'time': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'platform': platform.platform(),
+                'cpus': os.cpu_count(),
+                'requests': self.options['requests'],
+                'concurrency': self.options['concurrency'],
+                'warmup': self.options['warmup'],
+                'users': self.options['users'],
+                'series': self.options['series'],
+                'seed': self.options['seed'],
+            },
+            'endpoints': endpoints,
+        }
+
+    def _prepare(self):
+        """Generate the dataset if missing, collect the request data"""
+        user_model = get_user_model()
+        if not user_model.objects.filter(
+                email__startswith=f'{PREFIX}-').exists():
+            call_command(
+                'generate_dataset', users=self.options['users'],
+                series=self.options['series'], seed=self.options['seed'],
+                prefix=PREFIX, stdout=StringIO()
+            )
+        self.user = user_model.objects.get(email=f'{PREFIX}-0@example.com')
+        self.token = Token.objects.get_or_create(user=self.user)[0].key
+        self.tag_ids = list(Tag.objects.filter(
+            user=self.user).order_by('id').values_list('id', flat=True)[:2])
+        self.series_ids = list(Series.objects.filter(
+            user=self.user).order_by('id').values_list('id', flat=True)[:100])
+        if not self.series_ids:
+            raise CommandError('The benchmark user has no series')
+
+        image = BytesIO()
+        Image.new('RGB', (160, 240), (200, 30, 30)).save(image, format='JPEG')
+        self.image = image.getvalue()
+        # Unique emails for the user creation across runs with --keepdb
+        self.emails = count()
+        self.run_id = int(time.time() * 1000)
+
+    def _measure(self, name):
+        """Return the latency, throughput and query stats of an endpoint"""
+        call = getattr(self, f'_call_{name}')
+        total = self.options['requests']
+        concurrency = self.options['concurrency']
+        warmup = self.options['warmup']
+        # Requests handed out to the threads, warmup ones first
+        tickets = iter(range(warmup + total))
+        lock = threading.Lock()
+        samples = []
+
+        def worker():
+            """Run requests until the tickets are gone"""
+            client = APIClient()
+            access = create_access_token(self.user)
+            try:
+                while True:
+                    with lock:
+                        ticket = next(tickets, None)
+                    if ticket is None:
+                        return
+                    with CaptureQueriesContext(connection) as queries:
+                        start = time.perf_counter()
+                        response = call(client, access, ticket)
+                        elapsed = time.perf_counter() - start
+                    if ticket >= warmup:
+                        with lock:
+                            samples.append((
+                                elapsed, len(queries),
+                                not 200 <= response.status_code < 300
+                            ))
+            finally:
+                # Each thread got its own database connection
+                connection.close()
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            for future in [executor.submit(worker)
+                           for _ in range(concurrency)]:
+                future.result()
+        # The warmup requests are in the wall time, the throughput is
+        # slightly underestimated with a large warmup
+        wall = time.perf_counter() - start
+
+        latencies = sorted(elapsed * 1000 for elapsed, _, _ in samples)
+        stats = {
+            f'p{percent}_ms': round(percentile(latencies, percent), 2)
+            for percent in PERCENTILES
+        }
+        stats.update({
+            'requests': len(samples),
+            'requests_per_sec': round((warmup + total) / wall, 1),
+            'mean_ms': round(sum(latencies) / len(latencies), 2),
+            'queries_per_request': round(
+                sum(queries for _, queries, _ in samples) / len(samples), 2
+            ),
+            'errors': sum(error for _, _, error in samples),
+        })
+        return stats
+
+    def _report(self, results):
+        """Print a table of the results"""
+        self.stdout.write(
+            f"{'endpoint':<16}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+            f"{'req/s':>9}{'queries':>9}{'errors':>8}"
+        )
+        for name, stats in results['endpoints'].items():
+            self.stdout.write(
+                f"{name:<16}{stats['p50_ms']:>9}{stats['p95_ms']:>9}"
+                f"{stats['p99_ms']:>9}{stats['requests_per_sec']:>9}"
+                f"{stats['queries_per_request']:>9}{stats['errors']:>8}"
+            )
+
+    # A request to each endpoint, 'access' is the thread's signed access
+    # token and 'ticket' the request number
+    def _call_user_create(self, client, access, ticket):
+        return client.post(reverse('users:create'), {
+            'email': f'new-{self.run_id}-{next(self.emails)}@example.com',
+            'password': 'benchpass',
+            'name': 'Bench',
+        })
+
+    def _call_token(self, client, access, ticket):
+        return client.post(reverse('users:token'), {
+            'email': self.user.email, 'password': PASSWORD,
+        })
+
+    def _call_me(self, client, access, ticket):
+        return client.get(reverse('users:me'),
+                          HTTP_AUTHORIZATION=f'Token {self.token}')
+
+    def _call_tags(self, client, access, ticket):
+        return client.get(reverse('series:tag-list'),
+                          HTTP_AUTHORIZATION=f'Bearer {access}')
+
+    def _call_characters(self, client, access, ticket):
+        return client.get(reverse('series:character-list'),
+                          HTTP_AUTHORIZATION=f'Bearer {access}')
+
+    def _call_series_list(self, client, access, ticket):
+        return client.get(reverse('series:series-list'),
+                          HTTP_AUTHORIZATION=f'Bearer {access}')
+
+    def _call_series_detail(self, client, access, ticket):
+        pk = self.series_ids[ticket % len(self.series_ids)]
+        return client.get(reverse('series:series-detail', args=[pk]),
+                          HTTP_AUTHORIZATION=f'Bearer {access}')
+
+    def _call_series_filter(self, client, access, ticket):
+        return client.get(
+            reverse('series:series-list'),
+            {'tags': ','.join(str(pk) for pk in self.tag_ids)},
+            HTTP_AUTHORIZATION=f'Bearer {access}'
+        )
+
+    def _call_upload_image(self, client, access, ticket):
+        pk = self.series_ids[ticket % len(self.series_ids)]
+        image = SimpleUploadedFile('bench.jpg', self.image,
+                                   content_type='image/jpeg')
+        return client.post(
+            reverse('series:series-upload-image', args=[pk]),
+            {'image': image}, format='multipart',
+            HTTP_AUTHORIZATION=f'Bearer {access}'
+        )
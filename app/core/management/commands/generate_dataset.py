@@ -0,0 +1,233 @@
+import os
+import random
+import time
+from datetime import datetime, timedelta, timezone
+from itertools import accumulate
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from PIL import Image
+
+from core.models import Tag, Character, Series
+from series.bulk import copy_lines, reserve_ids
+
+
+# Series start dates are spread over the years before this date, a fixed
+# date keeps the datasets of a seed identical
+START = datetime(2020, 1, 1, tzinfo=timezone.utc)
+DATE_RANGE = timedelta(days=10 * 365)
+# Distinct image files shared by the series with an image
+IMAGE_FILES = 8
+IMAGE_DIRECTORY = 'uploads/series'
+# Tables of the size report
+REPORT_TABLES = (
+    get_user_model()._meta.db_table,
+    Tag._meta.db_table,
+    Character._meta.db_table,
+    Series._meta.db_table,
+    Series.tags.field.m2m_db_table(),
+    Series.characters.field.m2m_db_table(),
+)
+
+
+def zipf_weights(count, skew):
+    """Return the cumulative weights of 'count' ranks, 0 skew is uniform"""
+    return list(accumulate(1 / (rank ** skew) for rank in range(1, count + 1)))
+
+
+class Command(BaseCommand):
+    """
+    Django command to generate a synthetic dataset for load testing
+    """
+    help = 'Generate users, tags, characters and series from a seed'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--series', type=int, default=100000,
+                            help='Total number of series')
+        parser.add_argument('--tags', type=int, default=100,
+                            help='Tags per user')
+        parser.add_argument('--characters', type=int, default=100,
+                            help='Characters per user')
+        parser.add_argument('--tags-per-series', type=int, default=3,
+                            help='Max. tags of a series')
+        parser.add_argument('--characters-per-series', type=int, default=2,
+                            help='Max. characters of a series')
+        parser.add_argument(
+            '--skew', type=float, default=1.0,
+            help='Zipf exponent of the series per user and of the tag and '
+                 'character popularity, 0 for uniform'
+        )
+        parser.add_argument('--images', type=float, default=0.0,
+                            help='Fraction of the series with an image')
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--batch-size', type=int, default=50000)
+        parser.add_argument('--prefix', default='load',
+                            help='Prefix of the user emails')
+
+    def handle(self, *args, **options):
+        """Generate the dataset, then print the size report"""
+        self.options = options
+        self.rand = random.Random(options['seed'])
+        if options['users'] < 1:
+            raise CommandError('Give at least one user')
+        if get_user_model().objects.filter(
+                email__startswith=f"{options['prefix']}-").exists():
+            raise CommandError(
+                f"Users '{options['prefix']}-*' exist, use another --prefix"
+            )
+
+        start = time.perf_counter()
+        with transaction.atomic():
+            user_ids = self._create_users()
+            tags = self._create_named(Tag, user_ids, options['tags'])
+            characters = self._create_named(
+                Character, user_ids, options['characters']
+            )
+        images = self._create_images() if options['images'] > 0 else []
+        created = self._create_series(user_ids, tags, characters, images)
+        elapsed = time.perf_counter() - start
+
+        self.stdout.write(
+            f'{created} series in {elapsed:.1f} s, '
+            f'{created / elapsed:.0f} series/sec'
+        )
+        self._report()
+
+    def _create_users(self):
+        """Create the users, all with the password 'password'"""
+        # Hashing once, a password hash per user would take minutes
+        password = make_password('password')
+        users = get_user_model().objects.bulk_create(
+            get_user_model()(
+                email=f"{self.options['prefix']}-{i}@example.com",
+                name=f'Load user {i}',
+                password=password,
+            )
+            for i in range(self.options['users'])
+        )
+        return [user.id for user in users]
+
+    def _create_named(self, model, user_ids, count):
+        """Create 'count' objects per user, return {user id: [ids]}"""
+        label = model._meta.verbose_name.title()
+        objects = model.objects.bulk_create(
+            (model(user_id=user_id, name=f'{label} {i}')
+             for user_id in user_ids for i in range(count)),
+            batch_size=self.options['batch_size']
+        )
+        ids = {}
+        for obj in objects:
+            ids.setdefault(obj.user_id, []).append(obj.id)
+        return ids
+
+    def _create_images(self):
+        """Write the image files shared by the series, return their names"""
+        directory = os.path.join(settings.MEDIA_ROOT, IMAGE_DIRECTORY)
+        os.makedirs(directory, exist_ok=True)
+        names = []
+        for i in range(IMAGE_FILES):
+            name = f'{IMAGE_DIRECTORY}/load-{i}.jpg'
+            color = tuple(self.rand.randrange(256) for _ in range(3))
+            Image.new('RGB', (160, 240), color).save(
+                os.path.join(settings.MEDIA_ROOT, name), format='JPEG'
+            )
+            names.append(name)
+        return names
+
+    def _series_counts(self, user_ids):
+        """Split the series between the users, following the skew"""
+        total = self.options['series']
+        weights = [1 / (rank ** self.options['skew'])
+                   for rank in range(1, len(user_ids) + 1)]
+        weights_sum = sum(weights)
+        counts = [int(total * weight / weights_sum) for weight in weights]
+        # The rounding leftovers go to the biggest libraries
+        for i in range(total - sum(counts)):
+            counts[i % len(counts)] += 1
+        return counts
+
+    def _create_series(self, user_ids, tags, characters, images):
+        """Create the series and their links with COPY, batch by batch"""
+        options = self.options
+        owners = (
+            user_id
+            for user_id, count in zip(user_ids, self._series_counts(user_ids))
+            for _ in range(count)
+        )
+        relations = [
+            (field, related, max_count, zipf_weights(count, options['skew']))
+            for field, related, count, max_count in (
+                (Series.tags.field, tags, options['tags'],
+                 options['tags_per_series']),
+                (Series.characters.field, characters, options['characters'],
+                 options['characters_per_series']),
+            )
+            if count > 0 and max_count > 0
+        ]
+        rand, created = self.rand, 0
+        batch_size = options['batch_size']
+
+        while True:
+            batch = [owner for _, owner in zip(range(batch_size), owners)]
+            if not batch:
+                return created
+
+            with transaction.atomic(), connection.cursor() as cursor:
+                ids = reserve_ids(cursor, Series, len(batch))
+                lines = []
+                for number, (pk, user_id) in enumerate(zip(ids, batch),
+                                                       start=created):
+                    start_date = START - DATE_RANGE * rand.random()
+                    image = (rand.choice(images)
+                             if rand.random() < options['images'] else '\\N')
+                    lines.append(
+                        f'{pk}\t{user_id}\tSeries {number}\t'
+                        f'{start_date.isoformat()}\t'
+                        f'{"t" if rand.random() < 0.3 else "f"}\t'
+                        f'{int(rand.random() * 21)}\t'
+                        f'{rand.random() * 10:.2f}\t\t{image}\n'
+                    )
+                copy_lines(
+                    cursor, Series._meta.db_table,
+                    ('id', 'user_id', 'title', 'start_date', 'status',
+                     'watch_rate', 'rating', 'link', 'image'),
+                    lines
+                )
+
+                for field, related, max_count, cum_weights in relations:
+                    lines = []
+                    for pk, user_id in zip(ids, batch):
+                        choices = rand.choices(
+                            related[user_id], cum_weights=cum_weights,
+                            k=int(rand.random() * (max_count + 1))
+                        )
+                        # Popular objects may be picked twice
+                        for related_id in set(choices):
+                            lines.append(f'{pk}\t{related_id}\n')
+                    copy_lines(
+                        cursor, field.m2m_db_table(),
+                        (field.m2m_column_name(), field.m2m_reverse_name()),
+                        lines
+                    )
+
+            created += len(batch)
+            self.stdout.write(f'{created} series')
+
+    def _report(self):
+        """Print the rows and the size on disk of the tables"""
+        self.stdout.write(f"{'table':<28}{'rows':>12}{'size':>12}")
+        with connection.cursor() as cursor:
+            for table in REPORT_TABLES:
+                cursor.execute(
+                    f'SELECT COUNT(*), '
+                    f'pg_size_pretty(pg_total_relation_size(%s)) '
+                    f'FROM {connection.ops.quote_name(table)}',
+                    [table]
+                )
+                rows, size = cursor.fetchone()
+                self.stdout.write(f'{table:<28}{rows:>12}{size:>12}')
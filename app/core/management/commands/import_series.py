@@ -0,0 +1,284 @@
+import csv
+import io
+import json
+import os
+import re
+import sys
+import time
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from core.models import Tag, Character, Series, DataVersion, SeriesImport
+from series.bulk import copy_lines, copy_text, get_or_create_names, \
+                        reserve_ids
+
+
+# Fields of an input record, the format written by the series export
+# ('/api/series/series/export/'), in CSV the names are JSON arrays
+RELATIONS = (('tags', Tag), ('characters', Character))
+# Ratings the column takes as they are, max. 4 digits with 2 decimals
+RATING_RE = re.compile(r'-?\d{1,2}(\.\d{1,2})?$')
+TRUE_VALUES = ('1', 'true', 't', 'yes', 'y')
+FALSE_VALUES = ('', '0', 'false', 'f', 'no', 'n')
+
+
+class Command(BaseCommand):
+    """
+    Django command to import series from a CSV or NDJSON file
+    """
+    help = 'Import series with their tag and character names for a user'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="CSV or NDJSON file, '-' for stdin")
+        parser.add_argument('--user', required=True, help='Email of the owner')
+        parser.add_argument(
+            '--format', choices=('csv', 'ndjson'),
+            help='Input format, by default from the file extension'
+        )
+        parser.add_argument('--batch-size', type=int, default=20000)
+        parser.add_argument(
+            '--source',
+            help='Name of the import for resuming it, the path by default'
+        )
+        parser.add_argument(
+            '--restart', action='store_true',
+            help='Import from the first record, even if done before'
+        )
+        parser.add_argument(
+            '--skip-fk-checks', action='store_true',
+            help='Skip the foreign key checks of the new rows(needs a '
+                 'superuser), only while nothing else deletes the '
+                 "user's tags and characters"
+        )
+
+    def handle(self, *args, **options):
+        """Import the records in batches, one transaction each"""
+        try:
+            self.user = get_user_model().objects.get(email=options['user'])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f"No user '{options['user']}'")
+        path = options['path']
+        input_format = options['format'] or \
+            os.path.splitext(path)[1].lstrip('.').lower()
+        if input_format not in ('csv', 'ndjson'):
+            raise CommandError('Give the input --format, csv or ndjson')
+        source = options['source'] or (
+            os.path.abspath(path) if path != '-' else None
+        )
+        if source is None:
+            raise CommandError('Give a --source to import from stdin')
+
+        checkpoint, _ = SeriesImport.objects.get_or_create(
+            user=self.user, source=source
+        )
+        if options['restart']:
+            checkpoint.rows_done = 0
+            checkpoint.finished = False
+        elif checkpoint.finished:
+            raise CommandError(
+                f'{source} was already imported, use --restart to import '
+                f'it again'
+            )
+        elif checkpoint.rows_done:
+            self.stdout.write(f'Resuming after {checkpoint.rows_done} rows')
+
+        # Names already resolved to ids, lowercased, tags and characters are
+        # unique per user ignoring the case
+        self.known = {field_name: {} for field_name, _ in RELATIONS}
+        with self._open(path) as stream:
+            records = self._records(stream, input_format)
+            # Records of the batches imported before
+            for _ in islice(records, checkpoint.rows_done):
+                pass
+
+            start, imported = time.perf_counter(), 0
+            while True:
+                batch = list(islice(records, options['batch_size']))
+                if not batch:
+                    break
+                with transaction.atomic():
+                    if options['skip_fk_checks']:
+                        self._skip_fk_checks()
+                    self._import_batch(batch, checkpoint.rows_done)
+                    checkpoint.rows_done += len(batch)
+                    checkpoint.save()
+                imported += len(batch)
+                rate = imported / (time.perf_counter() - start)
+                self.stdout.write(
+                    f'{checkpoint.rows_done} rows, {rate:.0f} rows/sec'
+                )
+
+        checkpoint.finished = True
+        checkpoint.save()
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {checkpoint.rows_done} series from {source}'
+        ))
+
+    def _skip_fk_checks(self):
+        """Disable the triggers, foreign key checks included, until commit"""
+        # The checks are run at commit, one lookup per new row and foreign
+        # key, they take most of the time of a batch with many tags. The ids
+        # are valid by construction: the user, the series just inserted and
+        # the tags/characters just resolved.
+        try:
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.execute('SET LOCAL session_replication_role = replica')
+        except DatabaseError as exc:
+            raise CommandError(f'Can not skip the foreign key checks: {exc}')
+        # The data version triggers are disabled as well
+        DataVersion.objects.filter(user=self.user).update(
+            version=F('version') + 1
+        )
+
+    def _open(self, path):
+        """Return the input stream"""
+        if path == '-':
+            return io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8',
+                                    newline='')
+        try:
+            return open(path, encoding='utf-8', newline='')
+        except OSError as exc:
+            raise CommandError(str(exc))
+
+    def _records(self, stream, input_format):
+        """Yield the input records as dicts, names as lists"""
+        if input_format == 'csv':
+            for number, record in enumerate(csv.DictReader(stream), 1):
+                for field_name, _ in RELATIONS:
+                    record[field_name] = self._csv_names(
+                        number, field_name, record.get(field_name)
+                    )
+                yield record
+        else:
+            for line in stream:
+                if line.strip():
+                    yield json.loads(line)
+
+    def _csv_names(self, number, field_name, cell):
+        """Return the names of a CSV cell, a JSON array of strings"""
+        if not cell:
+            return []
+        try:
+            names = json.loads(cell)
+        except ValueError:
+            names = None
+        if not isinstance(names, list) or \
+                not all(isinstance(name, str) for name in names):
+            raise CommandError(
+                f'Invalid record {number}: {field_name} is not a JSON array '
+                f'of names'
+            )
+        return names
+
+    def _import_batch(self, batch, offset):
+        """Insert a batch of records with their tag/character links"""
+        series_rows = []
+        for number, record in enumerate(batch, start=offset + 1):
+            try:
+                series_rows.append(self._series_row(record))
+            except (KeyError, TypeError, ValueError, InvalidOperation) as exc:
+                raise CommandError(f'Invalid record {number}: {exc!r}')
+
+        related_ids = {
+            field_name: self._resolve(field_name, model, batch)
+            for field_name, model in RELATIONS
+        }
+
+        with connection.cursor() as cursor:
+            ids = reserve_ids(cursor, Series, len(batch))
+            copy_lines(
+                cursor, Series._meta.db_table,
+                ('id', 'user_id', 'title', 'start_date', 'status',
+                 'watch_rate', 'rating', 'link'),
+                (f'{pk}\t{row}\n' for pk, row in zip(ids, series_rows))
+            )
+            for field_name, _ in RELATIONS:
+                field = Series._meta.get_field(field_name)
+                known = related_ids[field_name]
+                lines = []
+                for pk, record in zip(ids, batch):
+                    names = record.get(field_name)
+                    if not names:
+                        continue
+                    for related_id in {known[name.strip().lower()]
+                                       for name in names if name.strip()}:
+                        lines.append(f'{pk}\t{related_id}\n')
+                copy_lines(
+                    cursor, field.m2m_db_table(),
+                    (field.m2m_column_name(), field.m2m_reverse_name()),
+                    lines
+                )
+
+    def _series_row(self, record):
+        """Return the COPY line of a series record, without the id"""
+        title = record['title'].strip()
+        if not title or len(title) > 255:
+            raise ValueError('title must have 1 to 255 characters')
+        link = (record.get('link') or '').strip()
+        if len(link) > 255:
+            raise ValueError('link is longer than 255 characters')
+
+        start_date = record.get('start_date')
+        if start_date:
+            # fromisoformat() is much faster than parse_datetime() but doesn't
+            # take every ISO 8601 variant, a valid string with an offset goes
+            # to postgres unchanged
+            try:
+                parsed = datetime.fromisoformat(start_date)
+            except ValueError:
+                parsed = parse_datetime(start_date)
+                if parsed is None:
+                    raise ValueError('start_date is not a valid date')
+            # fromisoformat() takes any separator, postgres a 'T' or a space
+            if parsed.tzinfo is None:
+                start_date = timezone.make_aware(parsed).isoformat()
+            elif start_date[10:11] not in ('T', ' '):
+                start_date = parsed.isoformat()
+        else:
+            start_date = timezone.now().isoformat()
+
+        status = record.get('status', False)
+        if isinstance(status, str):
+            if status.lower() not in TRUE_VALUES + FALSE_VALUES:
+                raise ValueError('status is not a boolean')
+            status = status.lower() in TRUE_VALUES
+        rating = str(record['rating'])
+        if RATING_RE.match(rating) is None:
+            rating = Decimal(rating).quantize(Decimal('0.01'))
+            if abs(rating) >= 100:
+                raise ValueError('rating must be less than 100')
+
+        # The row in the COPY text format, without the id
+        return (
+            f'{self.user.pk}\t{copy_text(title)}\t{start_date}\t'
+            f'{"t" if status else "f"}\t{int(record["watch_rate"])}\t'
+            f'{rating}\t{copy_text(link)}'
+        )
+
+    def _resolve(self, field_name, model, batch):
+        """Return {lowercased name: id} of the batch names, creating them"""
+        known = self.known[field_name]
+        missing = {}
+        for record in batch:
+            for name in record.get(field_name) or []:
+                name = name.strip()
+                if name and name.lower() not in known:
+                    if len(name) > 255:
+                        raise CommandError(f'Name too long: {name[:50]}...')
+                    missing.setdefault(name.lower(), name)
+
+        if missing:
+            objects = get_or_create_names(
+                model, self.user, list(missing.values())
+            )
+            for name, (pk, _) in objects.items():
+                known[name.lower()] = pk
+        return known
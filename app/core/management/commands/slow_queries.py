@@ -0,0 +1,88 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+SORT_KEYS = {
+    'total': lambda entry: entry['total_ms'],
+    'max': lambda entry: entry['max_ms'],
+    'mean': lambda entry: entry['total_ms'] / entry['count'],
+    'count': lambda entry: entry['count'],
+}
+
+
+class Command(BaseCommand):
+    """
+    Django command to summarize the slow query log by fingerprint
+    """
+    help = 'Print the worst statement fingerprints of a slow query log'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', nargs='?',
+            help='Log file of core.slow_queries, SLOW_QUERY_LOG by default'
+        )
+        parser.add_argument('--top', type=int, default=10)
+        parser.add_argument('--sort', choices=sorted(SORT_KEYS),
+                            default='total')
+        parser.add_argument(
+            '--plans', action='store_true',
+            help='Print the plan of the slowest explained statement'
+        )
+
+    def handle(self, *args, **options):
+        """Group the log records by fingerprint and print the worst"""
+        path = options['path'] or getattr(settings, 'SLOW_QUERY_LOG', None)
+        if not path:
+            raise CommandError('Give the log file, SLOW_QUERY_LOG is unset')
+        try:
+            with open(path) as log:
+                entries = self._summarize(log)
+        except OSError as exc:
+            raise CommandError(str(exc))
+
+        worst = sorted(entries.values(), key=SORT_KEYS[options['sort']],
+                       reverse=True)[:options['top']]
+        self.stdout.write(
+            f"{'fingerprint':<18}{'count':>7}{'total ms':>12}{'mean ms':>10}"
+            f"{'max ms':>10}  views"
+        )
+        for entry in worst:
+            views = ', '.join(sorted(entry['views'])) or '-'
+            self.stdout.write(
+                f"{entry['fingerprint']:<18}{entry['count']:>7}"
+                f"{entry['total_ms']:>12.1f}"
+                f"{entry['total_ms'] / entry['count']:>10.1f}"
+                f"{entry['max_ms']:>10.1f}  {views}"
+            )
+            self.stdout.write(f"    {entry['sql']}")
+            if options['plans'] and entry['plan']:
+                for line in entry['plan'].splitlines():
+                    self.stdout.write(f'      {line}')
+
+    def _summarize(self, log):
+        """Return the totals per fingerprint of the log records"""
+        entries = {}
+        for line in log:
+            # Lines of other loggers sharing the file are skipped
+            try:
+                record = json.loads(line)
+                key = record['fingerprint']
+            except (ValueError, TypeError, KeyError):
+                continue
+            entry = entries.setdefault(key, {
+                'fingerprint': key, 'sql': record['sql'], 'count': 0,
+                'total_ms': 0.0, 'max_ms': 0.0, 'views': set(),
+                'plan': None, 'plan_ms': 0.0,
+            })
+            entry['count'] += 1
+            entry['total_ms'] += record['ms']
+            entry['max_ms'] = max(entry['max_ms'], record['ms'])
+            if record.get('view'):
+                entry['views'].add(
+                    '.'.join(filter(None, (record['view'], record['action'])))
+                )
+            if record.get('plan') and record['ms'] >= entry['plan_ms']:
+                entry['plan'], entry['plan_ms'] = record['plan'], record['ms']
+        return entries
@@ -0,0 +1,371 @@
+import glob
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+import weakref
+from bisect import bisect_left
+
+from django.conf import settings
+from django.db import connection
+from django.http import HttpResponse
+
+from core.timing import RequestTimings, current_timings
+
+
+# In-process metrics in the Prometheus text format. Each thread updates its
+# own shard of a metric(no lock on the request path), the shards are summed
+# when scraped. With several worker processes every process writes its values
+# to METRICS_DIR(at most every METRICS_FLUSH_INTERVAL seconds) and the scrape
+# sums the files of all the processes, the directory should be emptied when
+# the workers are (re)deployed.
+class Metric:
+    """
+    Base of the labeled metrics, values are lists of numbers per label set
+    """
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._local = threading.local()
+        # {id: values} of the live threads, the values of the threads that
+        # ended are folded into '_retired'(runserver starts a thread per
+        # request)
+        self._shards = {}
+        self._retired = {}
+        # Reentrant, a finalizer may run while the lock is held
+        self._lock = threading.RLock()
+
+    def _shard(self):
+        """Return the values of the current thread"""
+        holder = getattr(self._local, 'holder', None)
+        if holder is None:
+            holder = self._local.holder = _ShardHolder()
+            with self._lock:
+                self._shards[id(holder.values)] = holder.values
+            # The thread-local holder is dropped when the thread ends
+            weakref.finalize(holder, self._retire, holder.values)
+        return holder.values
+
+    def _retire(self, shard):
+        """Fold the values of an ended thread into the retired ones"""
+        with self._lock:
+            self._shards.pop(id(shard), None)
+            self._add(self._retired, shard)
+
+    @staticmethod
+    def _add(total, shard):
+        """Add the values of a shard to 'total'"""
+        for labels, values in list(shard.items()):
+            summed = total.setdefault(labels, [0] * len(values))
+            for i, value in enumerate(values):
+                summed[i] += value
+
+    def collect(self):
+        """Return {label values: values} summed over the threads"""
+        merged = {}
+        # Under the lock, a retiring shard is counted once
+        with self._lock:
+            self._add(merged, self._retired)
+            for shard in list(self._shards.values()):
+                self._add(merged, shard)
+        return merged
+
+    def reset(self):
+        """Drop the values of all the threads"""
+        with self._lock:
+            self._retired.clear()
+            for shard in self._shards.values():
+                shard.clear()
+
+
+class _ShardHolder:
+    """
+    Thread-local owner of a shard, weak referenceable(unlike dicts)
+    """
+    __slots__ = ('values', '__weakref__')
+
+    def __init__(self):
+        self.values = {}
+
+
+class Counter(Metric):
+    """
+    Monotonic counter
+    """
+    kind = 'counter'
+
+    def inc(self, labels=(), amount=1):
+        """Add 'amount' to the counter of the label values"""
+        shard = self._shard()
+        values = shard.get(labels)
+        if values is None:
+            values = shard[labels] = [0]
+        values[0] += amount
+
+    def samples(self, values):
+        """Return the (suffix, extra labels, value) of the exposition"""
+        return [('', (), values[0])]
+
+
+class Histogram(Metric):
+    """
+    Histogram with fixed buckets, values are the bucket counts and the sum
+    """
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=()):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, labels, value):
+        """Count 'value' in its bucket"""
+        shard = self._shard()
+        values = shard.get(labels)
+        if values is None:
+            # One count per bucket, the +Inf one, then the sum
+            values = shard[labels] = [0] * (len(self.buckets) + 2)
+        values[bisect_left(self.buckets, value)] += 1
+        values[-1] += value
+
+    def samples(self, values):
+        """Return the (suffix, extra labels, value) of the exposition"""
+        samples, cumulative = [], 0
+        for bound, count in zip(self.buckets + ('+Inf',), values[:-1]):
+            cumulative += count
+            samples.append(('_bucket', (('le', str(bound)),), cumulative))
+        samples.append(('_sum', (), values[-1]))
+        samples.append(('_count', (), cumulative))
+        return samples
+
+
+class Registry:
+    """
+    Metrics and cache counters exposed by the '/metrics' view
+    """
+
+    def __init__(self):
+        self.metrics = []
+        self.caches = {}
+        self._flushed = 0
+        self._pid = None
+        self._filename = None
+        self._flush_lock = threading.Lock()
+
+    def register(self, metric):
+        """Add a metric to the exposition, return it"""
+        self.metrics.append(metric)
+        return metric
+
+    def add_cache(self, name, cache):
+        """Expose the hit/miss counters of a cache with a 'stats()'"""
+        self.caches[name] = cache
+
+    def snapshot(self):
+        """Return the JSON-able values of this process"""
+        values = {
+            metric.name: {json.dumps(labels): value
+                          for labels, value in metric.collect().items()}
+            for metric in self.metrics
+        }
+        for name, cache in self.caches.items():
+            stats = cache.stats()
+            label = json.dumps([name])
+            values[CACHE_HITS.name][label] = [stats['hits']]
+            values[CACHE_MISSES.name][label] = [stats['misses']]
+        return values
+
+    @property
+    def directory(self):
+        return getattr(settings, 'METRICS_DIR', None)
+
+    def flush(self):
+        """Write the values of this process to the metrics directory"""
+        # Named once per process, forked workers get their own file
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._filename = f'metrics-{self._pid}-{uuid.uuid4().hex}.json'
+        handle, temp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(handle, 'w') as output:
+            json.dump(self.snapshot(), output)
+        # Atomic, the scrape never reads a partial file
+        os.replace(temp, os.path.join(self.directory, self._filename))
+        self._flushed = time.monotonic()
+
+    def maybe_flush(self):
+        """Flush if the interval passed, called after each request"""
+        if self.directory is None:
+            return
+        interval = getattr(settings, 'METRICS_FLUSH_INTERVAL', 5)
+        if time.monotonic() - self._flushed < interval:
+            return
+        # A request of another thread may be flushing already
+        if self._flush_lock.acquire(blocking=False):
+            try:
+                self.flush()
+            finally:
+                self._flush_lock.release()
+
+    def merged(self):
+        """Return the values of every process, or of this one alone"""
+        if self.directory is None:
+            return self.snapshot()
+        with self._flush_lock:
+            self.flush()
+        merged = {}
+        for path in glob.glob(os.path.join(self.directory, 'metrics-*.json')):
+            try:
+                with open(path) as values_file:
+                    values = json.load(values_file)
+            except (OSError, ValueError):
+                continue
+            for name, series in values.items():
+                target = merged.setdefault(name, {})
+                for labels, numbers in series.items():
+                    total = target.setdefault(labels, [0] * len(numbers))
+                    for i, number in enumerate(numbers):
+                        total[i] += number
+        return merged
+
+    def render(self):
+        """Return the metrics in the Prometheus text exposition format"""
+        merged = self.merged()
+        lines = []
+        for metric in self.metrics:
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            for labels, values in sorted(merged.get(metric.name, {}).items()):
+                labels = tuple(zip(metric.labelnames, json.loads(labels)))
+                for suffix, extra, value in metric.samples(values):
+                    lines.append(
+                        f'{metric.name}{suffix}'
+                        f'{_format_labels(labels + extra)} {_number(value)}'
+                    )
+
+        lines.append('# HELP cache_hit_ratio Hits over lookups of a cache')
+        lines.append('# TYPE cache_hit_ratio gauge')
+        misses = merged.get(CACHE_MISSES.name, {})
+        for labels, hits in sorted(merged.get(CACHE_HITS.name, {}).items()):
+            lookups = hits[0] + misses.get(labels, [0])[0]
+            ratio = hits[0] / lookups if lookups else 0.0
+            labels = tuple(zip(CACHE_HITS.labelnames, json.loads(labels)))
+            lines.append(f'cache_hit_ratio{_format_labels(labels)} {ratio}')
+        return '\n'.join(lines) + '\n'
+
+
+def _format_labels(labels):
+    """Return the {name="value",...} of the label pairs"""
+    if not labels:
+        return ''
+    pairs = ','.join(
+        '{}="{}"'.format(name, str(value).replace('\\', r'\\')
+                         .replace('"', r'\"').replace('\n', r'\n'))
+        for name, value in labels
+    )
+    return '{' + pairs + '}'
+
+
+def _number(value):
+    """Format a sample value, integers without a fraction"""
+    if isinstance(value, float) and not value.is_integer():
+        return repr(value)
+    return str(int(value))
+
+
+registry = Registry()
+
+REQUESTS = registry.register(Counter(
+    'http_requests_total', 'Requests by view, action, method and status',
+    ('view', 'action', 'method', 'status')
+))
+REQUEST_DURATION = registry.register(Histogram(
+    'http_request_duration_seconds', 'Request latency by view and action',
+    ('view', 'action'),
+    (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+))
+REQUEST_QUERIES = registry.register(Histogram(
+    'http_request_queries', 'Database queries per request by view and action',
+    ('view', 'action'), (0, 1, 2, 3, 5, 10, 20, 50, 100)
+))
+IMAGE_UPLOADS = registry.register(Counter(
+    'series_image_uploads_total', 'Series images uploaded'
+))
+IMAGE_UPLOAD_BYTES = registry.register(Counter(
+    'series_image_upload_bytes_total', 'Bytes of the series images uploaded'
+))
+# Set from the caches' own counters when scraped
+CACHE_HITS = registry.register(Counter(
+    'cache_hits_total', 'Cache hits', ('cache',)
+))
+CACHE_MISSES = registry.register(Counter(
+    'cache_misses_total', 'Cache misses', ('cache',)
+))
+
+
+def view_labels(request, view_func):
+    """Return the (view, action) labels, 'SeriesViewSet', 'list' for DRF"""
+    cls = getattr(view_func, 'cls', None)
+    if cls is None:
+        match = request.resolver_match
+        return (match.view_name if match is not None else
+                view_func.__name__), request.method.lower()
+    # Viewsets map the HTTP methods to actions, 'upload_image' etc.
+    actions = getattr(view_func, 'actions', None)
+    if actions is not None:
+        return cls.__name__, actions.get(request.method.lower(), '')
+    return cls.__name__, request.method.lower()
+
+
+class MetricsMiddleware:
+    """
+    Count the requests and observe their latency and number of queries
+
+    Uses the timings of 'core.timing.RequestTimingMiddleware' when it runs
+    first, times the queries on its own otherwise.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        start = time.perf_counter()
+        timings = current_timings.get()
+        if timings is not None:
+            queries = timings.queries
+            response = self.get_response(request)
+        else:
+            timings, queries = RequestTimings(), 0
+            reset = current_timings.set(timings)
+            try:
+                with connection.execute_wrapper(timings.record_query):
+                    response = self.get_response(request)
+            finally:
+                current_timings.reset(reset)
+        elapsed = time.perf_counter() - start
+
+        labels = getattr(request, '_metrics_labels', ('unmatched', ''))
+        REQUESTS.inc(labels + (request.method, str(response.status_code)))
+        REQUEST_DURATION.observe(labels, elapsed)
+        REQUEST_QUERIES.observe(labels, timings.queries - queries)
+        registry.maybe_flush()
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        """Keep the labels of the view handling the request"""
+        request._metrics_labels = view_labels(request, view_func)
+        # For the slow query log as well
+        timings = current_timings.get()
+        if timings is not None:
+            timings.view = request._metrics_labels
+
+
+def metrics_view(request):
+    """Return the metrics of all the worker processes"""
+    return HttpResponse(
+        registry.render(),
+        content_type='text/plain; version=0.0.4; charset=utf-8'
+    )
@@ -0,0 +1,63 @@
+# Generated by Django 2.2.28 on 2026-10-18 16:39
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_auto_20200720_1824'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='character',
+            name='user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='series',
+            name='user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='tag',
+            name='user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='character',
+            index=models.Index(fields=['user', 'name'], name='core_character_user_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='series',
+            index=models.Index(fields=['user', 'start_date', 'id'], name='core_series_user_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tag',
+            index=models.Index(fields=['user', 'name'], name='core_tag_user_name_idx'),
+        ),
+        # The auto created M2M through tables can't declare Meta.indexes, the
+        # reverse (tag/character -> series) lookups are indexed by hand and
+        # replace the single column indexes created in 0004_series.
+        migrations.RunSQL(
+            'CREATE INDEX core_series_tags_tag_series_idx '
+            'ON core_series_tags (tag_id, series_id);'
+            'DROP INDEX core_series_tags_tag_id_fac8a7a9;',
+            reverse_sql='CREATE INDEX core_series_tags_tag_id_fac8a7a9 '
+                        'ON core_series_tags (tag_id);'
+                        'DROP INDEX core_series_tags_tag_series_idx;',
+        ),
+        migrations.RunSQL(
+            'CREATE INDEX core_series_characters_character_series_idx '
+            'ON core_series_characters (character_id, series_id);'
+            'DROP INDEX core_series_characters_character_id_2f5adb4e;',
+            reverse_sql='CREATE INDEX '
+                        'core_series_characters_character_id_2f5adb4e '
+                        'ON core_series_characters (character_id);'
+                        'DROP INDEX '
+                        'core_series_characters_character_series_idx;',
+        ),
+    ]
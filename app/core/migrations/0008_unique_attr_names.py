@@ -0,0 +1,56 @@
+from django.db import migrations
+
+
+# Tag and Character names are unique per user, ignoring the case. Existing
+# duplicates are merged into the oldest object first, their series moved to
+# it. The constraint is an expression index, Django 2.2 can only declare
+# unique constraints on plain fields.
+def merge_duplicates_sql(table, through, column):
+    """Return the SQL merging duplicate names of 'table'"""
+    duplicates = (
+        f'SELECT id, MIN(id) OVER (PARTITION BY user_id, lower(name)) '
+        f'AS keep_id FROM {table}'
+    )
+    return [
+        f'INSERT INTO {through} (series_id, {column}) '
+        f'SELECT link.series_id, dup.keep_id FROM {through} link '
+        f'JOIN ({duplicates}) dup ON link.{column} = dup.id '
+        f'WHERE dup.id <> dup.keep_id ON CONFLICT DO NOTHING;',
+        f'DELETE FROM {through} link USING ({duplicates}) dup '
+        f'WHERE link.{column} = dup.id AND dup.id <> dup.keep_id;',
+        f'DELETE FROM {table} obj USING ({duplicates}) dup '
+        f'WHERE obj.id = dup.id AND dup.id <> dup.keep_id;',
+        # Run the deferred FK checks now, an index can't be created on a
+        # table with pending trigger events
+        'SET CONSTRAINTS ALL IMMEDIATE;',
+    ]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_series_indexes'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            merge_duplicates_sql('core_tag', 'core_series_tags', 'tag_id'),
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.RunSQL(
+            merge_duplicates_sql(
+                'core_character', 'core_series_characters', 'character_id'
+            ),
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.RunSQL(
+            'CREATE UNIQUE INDEX core_tag_user_lower_name_uniq '
+            'ON core_tag (user_id, lower(name));',
+            reverse_sql='DROP INDEX core_tag_user_lower_name_uniq;',
+        ),
+        migrations.RunSQL(
+            'CREATE UNIQUE INDEX core_character_user_lower_name_uniq '
+            'ON core_character (user_id, lower(name));',
+            reverse_sql='DROP INDEX core_character_user_lower_name_uniq;',
+        ),
+    ]
@@ -0,0 +1,107 @@
+# Generated by Django 2.2.28 on 2026-10-18 17:01
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+# Statement level triggers with transition tables, a bulk INSERT of thousands
+# of rows bumps each user's version once. Postgres allows a transition table
+# only on single event triggers, hence one trigger per event.
+BUMP_FUNCTIONS_SQL = """
+CREATE FUNCTION core_bump_data_version() RETURNS trigger AS $$
+BEGIN
+    UPDATE core_dataversion SET version = version + 1
+    WHERE user_id IN (SELECT user_id FROM changed_rows);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE FUNCTION core_bump_series_data_version() RETURNS trigger AS $$
+BEGIN
+    UPDATE core_dataversion SET version = version + 1
+    WHERE user_id IN (
+        SELECT series.user_id FROM core_series series
+        JOIN changed_rows ON changed_rows.series_id = series.id
+    );
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE FUNCTION core_create_data_version() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO core_dataversion (user_id, version) VALUES (NEW.id, 0)
+    ON CONFLICT DO NOTHING;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER core_user_data_version AFTER INSERT ON core_user
+FOR EACH ROW EXECUTE PROCEDURE core_create_data_version();
+
+INSERT INTO core_dataversion (user_id, version)
+SELECT id, 0 FROM core_user ON CONFLICT DO NOTHING;
+"""
+
+DROP_FUNCTIONS_SQL = """
+DROP TRIGGER core_user_data_version ON core_user;
+DROP FUNCTION core_create_data_version();
+DROP FUNCTION core_bump_series_data_version();
+DROP FUNCTION core_bump_data_version();
+"""
+
+
+def bump_triggers_sql(table, function):
+    """Return the SQL creating the version triggers of 'table'"""
+    statements = []
+    for event, transition in (('INSERT', 'NEW'), ('UPDATE', 'NEW'),
+                              ('DELETE', 'OLD')):
+        statements.append(
+            f'CREATE TRIGGER {table}_{event.lower()}_data_version '
+            f'AFTER {event} ON {table} '
+            f'REFERENCING {transition} TABLE AS changed_rows '
+            f'FOR EACH STATEMENT EXECUTE PROCEDURE {function}();'
+        )
+    return statements
+
+
+def drop_bump_triggers_sql(table):
+    """Return the SQL dropping the version triggers of 'table'"""
+    return [
+        f'DROP TRIGGER {table}_{event}_data_version ON {table};'
+        for event in ('insert', 'update', 'delete')
+    ]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_unique_attr_names'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DataVersion',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='data_version', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('version', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunSQL(BUMP_FUNCTIONS_SQL, reverse_sql=DROP_FUNCTIONS_SQL),
+        migrations.RunSQL(
+            bump_triggers_sql('core_series', 'core_bump_data_version') +
+            bump_triggers_sql('core_tag', 'core_bump_data_version') +
+            bump_triggers_sql('core_character', 'core_bump_data_version') +
+            bump_triggers_sql(
+                'core_series_tags', 'core_bump_series_data_version'
+            ) +
+            bump_triggers_sql(
+                'core_series_characters', 'core_bump_series_data_version'
+            ),
+            reverse_sql=drop_bump_triggers_sql('core_series') +
+            drop_bump_triggers_sql('core_tag') +
+            drop_bump_triggers_sql('core_character') +
+            drop_bump_triggers_sql('core_series_tags') +
+            drop_bump_triggers_sql('core_series_characters'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 2.2.28 on 2026-10-18 17:13
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_data_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SeriesImport',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(max_length=255)),
+                ('rows_done', models.BigIntegerField(default=0)),
+                ('finished', models.BooleanField(default=False)),
+                ('updated', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('user', 'source')},
+            },
+        ),
+    ]
@@ -87,8 +87,18 @@ class Tag(models.Model):
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
+        # Covered by the (user, name) index below
+        db_index=False,
     )
 
+    class Meta:
+        # Tags are always listed per user, ordered by name
+        indexes = [
+            models.Index(
+                fields=['user', 'name'], name='core_tag_user_name_idx'
+            ),
+        ]
+
     def __str__(self):
         """String representation of Tag model"""
         return self.name
@@ -103,8 +113,17 @@ class Character(models.Model):
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
+        # Covered by the (user, name) index below
+        db_index=False,
     )
 
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['user', 'name'], name='core_character_user_name_idx'
+            ),
+        ]
+
     def __str__(self):
         """String representation of Character model"""
         return self.name
@@ -117,7 +136,9 @@ class Series(models.Model):
     """
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
-        on_delete=models.CASCADE
+        on_delete=models.CASCADE,
+        # Covered by the (user, start_date, id) index below
+        db_index=False,
     )
     title = models.CharField(max_length=255)
     start_date = models.DateTimeField(default=timezone.now)
@@ -132,5 +153,58 @@ class Series(models.Model):
     # Add the ImageField, pass reference to the function
     image = models.ImageField(null=True, upload_to=series_image_file_path)
 
+    class Meta:
+        # Matches the per user (start_date, id) keyset pagination of the list
+        indexes = [
+            models.Index(
+                fields=['user', 'start_date', 'id'],
+                name='core_series_user_start_idx'
+            ),
+        ]
+
     def __str__(self):
         return self.title
+
+
+# Bumped by database triggers(migration 0009) on every write to the user's
+# series, tags, characters or their links, including the raw bulk statements.
+# The API uses it as the ETag of the lists, an unchanged version means an
+# unchanged response.
+class DataVersion(models.Model):
+    """
+    Version of a user's series, tags and characters
+    """
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='data_version',
+    )
+    version = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f'{self.user_id}: {self.version}'
+
+
+# Progress of the 'import_series' command, updated in the transaction of each
+# imported batch, an interrupted import continues after the last batch saved.
+class SeriesImport(models.Model):
+    """
+    Series import of a user from a source file
+    """
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+    )
+    # Identifies the input, the file path by default
+    source = models.CharField(max_length=255)
+    # Number of input records imported
+    rows_done = models.BigIntegerField(default=0)
+    finished = models.BooleanField(default=False)
+    updated = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('user', 'source')
+
+    def __str__(self):
+        return f'{self.source}: {self.rows_done}'
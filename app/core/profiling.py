@@ -0,0 +1,185 @@
+import cProfile
+import marshal
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import HttpResponse
+
+from rest_framework.exceptions import APIException
+from rest_framework.request import Request
+
+
+# '?profile=<mode>' on a request of a staff user returns a profile of the
+# view(rendering included) instead of its response, as a file:
+#   cprofile - cProfile stats, 'python -m pstats' or snakeviz
+#   stacks   - sampled call stacks in the collapsed format of flamegraph.pl
+#   memory   - tracemalloc report, the peak and the top allocating lines
+# tracemalloc traces the whole process: the memory numbers include the
+# allocations of the other request threads meanwhile, and a single memory
+# profile runs at a time(409 while busy).
+PROFILE_QUERY_PARAM = 'profile'
+# Allocating lines listed by the memory report
+MEMORY_TOP_LINES = 30
+# Held for the whole traced section of a memory profile
+_memory_lock = threading.Lock()
+
+
+class ProfilerBusy(Exception):
+    """
+    The profiler asked for is in use by another request
+    """
+
+
+def _collapsed(frame):
+    """Return a frame's stack, outermost call first, joined with ';'"""
+    stack = []
+    while frame is not None:
+        code = frame.f_code
+        stack.append(f'{code.co_name} ({os.path.basename(code.co_filename)}'
+                     f':{code.co_firstlineno})')
+        frame = frame.f_back
+    return ';'.join(reversed(stack))
+
+
+class ProfilingMiddleware:
+    """
+    Profile single requests of staff users on demand
+
+    Only loaded with REQUEST_PROFILING on, requests without the query
+    parameter pay a dict lookup. Put it last in MIDDLEWARE, the profile then
+    covers the view alone.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'REQUEST_PROFILING', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.interval = getattr(
+            settings, 'REQUEST_PROFILING_SAMPLE_INTERVAL', 0.001
+        )
+
+    def __call__(self, request):
+        return self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        """Run the view under the profiler asked for, if allowed"""
+        mode = request.GET.get(PROFILE_QUERY_PARAM)
+        if mode is None:
+            return None
+        profile = getattr(self, f'_profile_{mode}', None)
+        # Anybody else gets the normal response
+        if profile is None or not self._is_staff(request, view_func):
+            return None
+
+        def view():
+            response = view_func(request, *view_args, **view_kwargs)
+            # DRF responses are rendered after the middlewares, profiled here
+            if hasattr(response, 'render') and callable(response.render):
+                response.render()
+            return response
+
+        try:
+            content, extension, response = profile(view)
+        except ProfilerBusy:
+            return HttpResponse(
+                f'Another {mode} profile is running, try again.\n',
+                status=409, content_type='text/plain; charset=utf-8'
+            )
+        name = getattr(view_func, 'cls', view_func).__name__
+        profiled = HttpResponse(
+            content, content_type='application/octet-stream'
+            if extension == 'pstats' else 'text/plain; charset=utf-8'
+        )
+        profiled['Content-Disposition'] = (
+            f'attachment; filename="{name}-{int(time.time())}.{extension}"'
+        )
+        profiled['X-Profiled-Status'] = str(response.status_code)
+        return profiled
+
+    def _is_staff(self, request, view_func):
+        """Check the user(authenticated as the view would) is staff"""
+        cls = getattr(view_func, 'cls', None)
+        if cls is not None:
+            # API views authenticate in the view, with their own classes
+            authenticators = [auth() for auth in cls.authentication_classes]
+            try:
+                user = Request(request, authenticators=authenticators).user
+            except APIException:
+                return False
+        else:
+            user = getattr(request, 'user', None)
+        if user is None or not user.is_authenticated:
+            return False
+        # Signed access tokens carry no user flags, always checked in the
+        # database
+        return get_user_model().objects.filter(
+            pk=user.pk, is_active=True, is_staff=True
+        ).exists()
+
+    def _profile_cprofile(self, view):
+        """Return the cProfile stats, in the pstats file format"""
+        profiler = cProfile.Profile()
+        response = profiler.runcall(view)
+        profiler.create_stats()
+        return marshal.dumps(profiler.stats), 'pstats', response
+
+    def _profile_stacks(self, view):
+        """Return the sampled stacks of the view, collapsed"""
+        thread_id = threading.get_ident()
+        stop = threading.Event()
+        stacks = Counter()
+
+        def sample():
+            while not stop.wait(self.interval):
+                frame = sys._current_frames().get(thread_id)
+                if frame is not None:
+                    stacks[_collapsed(frame)] += 1
+
+        sampler = threading.Thread(target=sample, daemon=True)
+        sampler.start()
+        try:
+            response = view()
+        finally:
+            stop.set()
+            sampler.join()
+        content = ''.join(f'{stack} {count}\n'
+                          for stack, count in stacks.most_common())
+        return content, 'folded', response
+
+    def _profile_memory(self, view):
+        """Return the peak and the top allocating lines of the view"""
+        # The tracemalloc state is process-global, a concurrent profile
+        # would clear or stop the traces of this one
+        if not _memory_lock.acquire(blocking=False):
+            raise ProfilerBusy
+        try:
+            # Already tracing(python -X tracemalloc), not stopped afterwards
+            started = not tracemalloc.is_tracing()
+            if started:
+                tracemalloc.start()
+            try:
+                # Resets the peak as well
+                tracemalloc.clear_traces()
+                response = view()
+                snapshot = tracemalloc.take_snapshot()
+                current, peak = tracemalloc.get_traced_memory()
+            finally:
+                if started:
+                    tracemalloc.stop()
+        finally:
+            _memory_lock.release()
+
+        lines = [f'current {current} B, peak {peak} B (process-wide, '
+                 f'other threads included)', '']
+        lines.extend(
+            str(stat) for stat in
+            snapshot.statistics('lineno')[:MEMORY_TOP_LINES]
+        )
+        return '\n'.join(lines) + '\n', 'txt', response
@@ -0,0 +1,29 @@
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from rest_framework.authtoken.models import Token
+
+from core import slow_queries
+from core.authentication import token_cache
+
+
+# Keep the token cache in sync, a deleted token must stop working at once and
+# a saved user(password, 'is_active' changes..) must be loaded again.
+@receiver(post_delete, sender=Token)
+def invalidate_deleted_token(sender, instance, **kwargs):
+    """Drop a deleted token from the token cache"""
+    token_cache.invalidate(instance.key)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def invalidate_user_tokens(sender, instance, **kwargs):
+    """Drop the cached tokens of a saved user"""
+    token_cache.invalidate_user(instance.pk)
+
+
+@receiver(connection_created)
+def install_slow_query_log(sender, connection, **kwargs):
+    """Log the slow statements of every new connection"""
+    slow_queries.install(connection)
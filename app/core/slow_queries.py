@@ -0,0 +1,119 @@
+import hashlib
+import json
+import logging
+import random
+import re
+import time
+
+from django.conf import settings
+
+from core.timing import current_timings
+
+
+logger = logging.getLogger(__name__)
+
+
+# Statements slower than SLOW_QUERY_MS are logged(logger
+# 'core.slow_queries', to the SLOW_QUERY_LOG file) as JSON lines with their
+# fingerprint, the normalized SQL without the values, so the same query with
+# other ids is counted as one, and the view and action of the request. A
+# fraction(SLOW_QUERY_EXPLAIN_RATE) is explained, with ANALYZE for the
+# SELECTs only if SLOW_QUERY_EXPLAIN_ANALYZE(they run again, in the request).
+# 'manage.py slow_queries' summarizes a log file.
+NORMALIZE = (
+    (re.compile(r"'(?:[^']|'')*'"), '?'),
+    (re.compile(r'\b\d+(?:\.\d+)?\b'), '?'),
+    (re.compile(r'%s'), '?'),
+    (re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)'), '(...)'),
+    # Any number of rows of a multi-row VALUES
+    (re.compile(r'\(\.\.\.\)(?:\s*,\s*\(\.\.\.\))+'), '(...)'),
+    (re.compile(r'\s+'), ' '),
+)
+EXPLAINABLE = ('SELECT', 'INSERT', 'UPDATE', 'DELETE', 'WITH')
+# Statements with side effects('SELECT nextval(...)' of the bulk id
+# reservation) or row locks are never explained
+NOT_EXPLAINABLE = re.compile(
+    r'\b(?:nextval|setval|random|clock_timestamp|timeofday|txid_current'
+    r'|gen_random_uuid|uuid_generate_\w+|pg_advisory_\w+|pg_notify'
+    r'|pg_sleep\w*|dblink\w*|lo_\w+)\s*\('
+    r'|\bFOR\s+(?:NO\s+KEY\s+)?(?:UPDATE|SHARE)\b'
+    r'|\bFOR\s+KEY\s+SHARE\b',
+    re.IGNORECASE
+)
+
+
+def normalize(sql):
+    """Return the SQL with the literals and placeholders replaced by '?'"""
+    for pattern, replacement in NORMALIZE:
+        sql = pattern.sub(replacement, sql)
+    return sql.strip()
+
+
+def fingerprint(normalized):
+    """Return a short hash of a normalized statement"""
+    return hashlib.md5(normalized.encode('utf-8')).hexdigest()[:16]
+
+
+def explain(connection, sql, params):
+    """Return the plan of a statement, None if it can't be explained"""
+    statement = sql.lstrip().split(None, 1)[0].upper() if sql.strip() else ''
+    if statement not in EXPLAINABLE or NOT_EXPLAINABLE.search(sql):
+        return None
+    # Only a plain SELECT may be run again, never a statement that writes
+    analyze = statement == 'SELECT' and getattr(
+        settings, 'SLOW_QUERY_EXPLAIN_ANALYZE', False
+    )
+    options = 'ANALYZE, BUFFERS' if analyze else 'COSTS'
+    # A raw cursor of the same session, not wrapped(the EXPLAIN would be
+    # logged as a slow query again) and not the cursor of the statement,
+    # its rows are not fetched yet
+    raw = connection.connection
+    in_transaction = connection.in_atomic_block
+    with raw.cursor() as cursor:
+        try:
+            # A failing EXPLAIN must not abort the transaction
+            if in_transaction:
+                cursor.execute('SAVEPOINT slow_query_explain')
+            cursor.execute(f'EXPLAIN ({options}) {sql}', params)
+            plan = '\n'.join(row[0] for row in cursor.fetchall())
+            if in_transaction:
+                cursor.execute('RELEASE SAVEPOINT slow_query_explain')
+            return plan
+        except connection.Database.Error:
+            if in_transaction:
+                cursor.execute('ROLLBACK TO SAVEPOINT slow_query_explain')
+            return None
+
+
+def log_slow_queries(execute, sql, params, many, context):
+    """Database execute wrapper, log the statements over the threshold"""
+    start = time.perf_counter()
+    result = execute(sql, params, many, context)
+    elapsed = time.perf_counter() - start
+    if elapsed * 1000 < getattr(settings, 'SLOW_QUERY_MS', 200) or \
+            not logger.isEnabledFor(logging.WARNING):
+        return result
+
+    normalized = normalize(sql)
+    timings = current_timings.get()
+    view, action = getattr(timings, 'view', None) or (None, None)
+    record = {
+        'fingerprint': fingerprint(normalized),
+        'ms': round(elapsed * 1000, 2),
+        'view': view,
+        'action': action,
+        'sql': normalized,
+    }
+    if not many and random.random() < getattr(
+            settings, 'SLOW_QUERY_EXPLAIN_RATE', 0.1):
+        record['plan'] = explain(context['connection'], sql, params)
+    logger.warning(json.dumps(record))
+    return result
+
+
+def install(connection):
+    """Add the slow query wrapper to a connection, once"""
+    # First, 'execute_wrapper()' blocks pop the last wrapper on exit and
+    # the connection may be opened inside one
+    if log_slow_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, log_slow_queries)
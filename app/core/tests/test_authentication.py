@@ -0,0 +1,197 @@
+import time
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.authentication import TokenCache, token_cache, \
+                                create_access_token
+
+
+TAGS_URL = reverse('series:tag-list')
+SERIES_URL = reverse('series:series-list')
+ME_URL = reverse('users:me')
+
+
+class TokenCacheTests(TestCase):
+    """
+    Test the LRU/TTL token cache
+    """
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'test@akshay.com',
+            'testpass'
+        )
+        self.token = Token.objects.create(user=self.user)
+
+    # Test 1
+    def test_cache_evicts_least_recently_used(self):
+        """Test the cache never grows over its max size"""
+        cache = TokenCache(max_size=2, ttl=60)
+        cache.set('a', self.token)
+        cache.set('b', self.token)
+        cache.get('a')
+        cache.set('c', self.token)
+
+        self.assertIsNotNone(cache.get('a'))
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.stats()['size'], 2)
+
+    # Test 2
+    @patch('time.monotonic')
+    def test_cache_entries_expire(self, monotonic):
+        """Test entries older than the ttl are not returned"""
+        cache = TokenCache(max_size=2, ttl=60)
+        monotonic.return_value = 100
+        cache.set('a', self.token)
+
+        monotonic.return_value = 159
+        self.assertIsNotNone(cache.get('a'))
+        monotonic.return_value = 161
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.stats(), {'size': 0, 'hits': 1, 'misses': 1})
+
+
+class CachedTokenAuthenticationTests(TestCase):
+    """
+    Test authenticating with the cached token authentication
+    """
+
+    def setUp(self):
+        token_cache.clear()
+        self.user = get_user_model().objects.create_user(
+            'test@akshay.com',
+            'testpass'
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def _count_queries(self, url):
+        """Return the number of queries of an authenticated GET"""
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(url)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return len(queries)
+
+    # Test 3
+    def test_token_lookup_is_cached(self):
+        """Test the second request doesn't look the token up again"""
+        # Not the tag list, its response is cached as well
+        first = self._count_queries(SERIES_URL)
+        second = self._count_queries(SERIES_URL)
+
+        self.assertEqual(first - 1, second)
+        self.assertEqual(token_cache.stats()['hits'], 1)
+        self.assertEqual(token_cache.stats()['misses'], 1)
+
+    # Test 4
+    def test_deleted_token_is_rejected(self):
+        """Test a deleted token stops working even if cached"""
+        self.client.get(TAGS_URL)
+        self.token.delete()
+
+        res = self.client.get(TAGS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    # Test 5
+    def test_inactive_user_is_rejected(self):
+        """Test a deactivated user stops being authenticated"""
+        self.client.get(TAGS_URL)
+        self.user.is_active = False
+        self.user.save()
+
+        res = self.client.get(TAGS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    # Test 6
+    def test_password_change_invalidates_cache(self):
+        """Test updating the user on the 'me' endpoint drops the entry"""
+        self.client.get(ME_URL)
+        res = self.client.patch(ME_URL, {'password': 'newpassword'})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        self.assertEqual(token_cache.stats()['size'], 0)
+        res = self.client.get(ME_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    # Test 7
+    def test_cached_user_is_not_shared(self):
+        """Test the views never get the cached user instance"""
+        self.client.get(TAGS_URL)
+        cached = token_cache.get(self.token.key)
+
+        self.client.patch(ME_URL, {'name': 'Changed'})
+
+        self.assertNotEqual(cached.user.name, 'Changed')
+
+
+class SignedTokenAuthenticationTests(TestCase):
+    """
+    Test authenticating with signed access tokens
+    """
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'test@akshay.com',
+            'testpass'
+        )
+        self.client = APIClient()
+
+    # Test 8
+    def test_access_token_needs_no_query(self):
+        """Test a valid access token authenticates without a lookup"""
+        access = create_access_token(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(TAGS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        # Only the data version and the tags queries, no token or user lookup
+        self.assertEqual(len(queries), 2)
+        for query in queries.captured_queries:
+            self.assertNotIn('core_user', query['sql'])
+            self.assertNotIn('authtoken_token', query['sql'])
+
+    # Test 9
+    def test_access_token_owns_created_objects(self):
+        """Test objects created with an access token belong to the user"""
+        access = create_access_token(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+
+        res = self.client.post(TAGS_URL, {'name': 'Anime'})
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertTrue(self.user.tag_set.filter(name='Anime').exists())
+
+    # Test 10
+    def test_tampered_access_token_rejected(self):
+        """Test a modified access token is rejected"""
+        access = create_access_token(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}x')
+
+        res = self.client.get(TAGS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    # Test 11
+    def test_expired_access_token_rejected(self):
+        """Test an access token past its expiry is rejected"""
+        access = create_access_token(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+
+        with patch('time.time', return_value=time.time() + 3600):
+            res = self.client.get(TAGS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
@@ -1,7 +1,20 @@
 from unittest.mock import patch  # Mock the behaviour of django get_database()
+from django.contrib.auth import get_user_model
 from django.core.management import call_command
+from django.core.management.base import CommandError
 from django.db.utils import OperationalError
-from django.test import TestCase
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+import json
+import os
+import tempfile
+from io import StringIO
+
+from core.management.commands.bench_endpoints import ENDPOINTS, compare
+from core.management.commands.import_series import Command
+from core.models import Tag, Character, Series
+from series.export import csv_stream, ndjson_stream
 
 
 # Test class
@@ -47,3 +60,253 @@ class CommandTests(TestCase):
             call_command('wait_for_db')
             # Assert the fn. is get called 6 times
             self.assertEqual(gi.call_count, 6)
+
+
+# Tests of the 'import_series' command
+class ImportSeriesCommandTests(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'test@akshay.com',
+            'testpass'
+        )
+        Tag.objects.create(user=self.user, name='Drama')
+        self.records = [{
+            'title': f'Series {i}',
+            'start_date': f'2020-01-{i + 1:02d}T10:00:00+00:00',
+            'status': i % 2 == 0,
+            'rating': '8.50',
+            'link': '',
+            'watch_rate': i,
+            'tags': ['drama', 'Sci-Fi'] if i % 2 else [],
+            'characters': ['Jonas'],
+        } for i in range(5)]
+
+    def _write(self, suffix, content):
+        """Write an input file, return its path"""
+        handle, path = tempfile.mkstemp(suffix=suffix)
+        with os.fdopen(handle, 'w', newline='') as input_file:
+            input_file.write(content)
+        self.addCleanup(os.remove, path)
+        return path
+
+    def _ndjson(self, records):
+        """Write the records as NDJSON, return the path"""
+        return self._write(
+            '.ndjson', ''.join(json.dumps(record) + '\n' for record in records)
+        )
+
+    def _import(self, path, **options):
+        """Run the command, return its output"""
+        out = StringIO()
+        call_command('import_series', path, user=self.user.email, stdout=out,
+                     **options)
+        return out.getvalue()
+
+    # Test 3
+    def test_import_ndjson(self):
+        """Test importing series with their tag and character names"""
+        out = self._import(self._ndjson(self.records), batch_size=2)
+
+        self.assertIn('rows/sec', out)
+        series = Series.objects.filter(user=self.user).order_by('start_date')
+        self.assertEqual(
+            [item.title for item in series],
+            [record['title'] for record in self.records]
+        )
+        # Existing names reused ignoring the case, new ones created once
+        self.assertEqual(
+            sorted(Tag.objects.values_list('name', flat=True)),
+            ['Drama', 'Sci-Fi']
+        )
+        self.assertEqual(Character.objects.count(), 1)
+        self.assertEqual(series[1].tags.count(), 2)
+        self.assertEqual(series[0].tags.count(), 0)
+        self.assertEqual(series[4].characters.get().name, 'Jonas')
+        self.assertTrue(series[0].status)
+        self.assertEqual(series[3].watch_rate, 3)
+
+    # Test 4
+    def test_import_export_output(self):
+        """Test importing the CSV and NDJSON written by the export"""
+        other = get_user_model().objects.create_user(
+            'other@akshay.com',
+            'testpass'
+        )
+        dark = Series.objects.create(
+            user=other, title='Dark', status=True, watch_rate=3, rating=9,
+            link='http://a.b',
+            start_date=timezone.now().replace(microsecond=123456)
+        )
+        dark.tags.set([Tag.objects.create(user=other, name=name)
+                       for name in ('drama', 'Sci|Fi, "new"')])
+        Series.objects.create(user=other, title='Lost', watch_rate=1,
+                              rating='-0.5')
+
+        for stream, suffix in ((csv_stream, '.csv'),
+                               (ndjson_stream, '.ndjson')):
+            Series.objects.filter(user=self.user).delete()
+            content = ''.join(stream(Series.objects.filter(user=other)))
+
+            self._import(self._write(suffix, content))
+
+            series = {item.title: item
+                      for item in Series.objects.filter(user=self.user)}
+            self.assertEqual(sorted(series), ['Dark', 'Lost'])
+            self.assertTrue(series['Dark'].status)
+            # To the microsecond, the keyset pagination column
+            self.assertEqual(series['Dark'].start_date, dark.start_date)
+            self.assertEqual(str(series['Lost'].rating), '-0.50')
+            # Existing names reused ignoring the case, none for empty lists
+            self.assertEqual(
+                sorted(tag.name for tag in series['Dark'].tags.all()),
+                ['Drama', 'Sci|Fi, "new"']
+            )
+            self.assertFalse(series['Lost'].tags.exists())
+            self.assertEqual(Tag.objects.filter(user=self.user).count(), 2)
+            self.assertFalse(
+                Character.objects.filter(user=self.user).exists()
+            )
+
+        # Names not written as JSON arrays
+        with self.assertRaises(CommandError):
+            self._import(
+                self._write('.csv', 'title,rating,watch_rate,tags\n'
+                                    'Dark,9,1,drama|Mystery\n'),
+                restart=True
+            )
+
+    # Test 5
+    def test_import_resumes_after_interruption(self):
+        """Test an interrupted import continues after the saved batches"""
+        path = self._ndjson(self.records)
+        original = Command._import_batch
+        calls = []
+
+        def interrupted(command, batch, offset):
+            calls.append(offset)
+            if len(calls) == 2:
+                raise KeyboardInterrupt
+            return original(command, batch, offset)
+
+        with patch.object(Command, '_import_batch', interrupted):
+            with self.assertRaises(KeyboardInterrupt):
+                self._import(path, batch_size=2)
+        self.assertEqual(Series.objects.count(), 2)
+
+        out = self._import(path, batch_size=2)
+
+        self.assertIn('Resuming after 2 rows', out)
+        self.assertEqual(
+            sorted(Series.objects.values_list('watch_rate', flat=True)),
+            list(range(5))
+        )
+        with self.assertRaises(CommandError):
+            self._import(path)
+
+    # Test 6
+    def test_import_invalid_record(self):
+        """Test an invalid record stops the import with its number"""
+        self.records[3]['rating'] = 'good'
+
+        with self.assertRaisesMessage(CommandError, 'Invalid record 4'):
+            self._import(self._ndjson(self.records), batch_size=2)
+        # The batches before it are kept
+        self.assertEqual(Series.objects.count(), 2)
+
+
+# Tests of the 'generate_dataset' command
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class GenerateDatasetCommandTests(TestCase):
+
+    def _generate(self, prefix, **options):
+        """Run the command, return its output"""
+        out = StringIO()
+        call_command('generate_dataset', users=3, series=40, tags=5,
+                     characters=4, images=0.5, batch_size=15, prefix=prefix,
+                     stdout=out, **options)
+        return out.getvalue()
+
+    def _library(self, prefix):
+        """Return the generated series of each user, without the ids"""
+        return [
+            [(series.title, series.start_date, series.watch_rate,
+              series.rating, bool(series.image),
+              sorted(tag.name for tag in series.tags.all()),
+              sorted(char.name for char in series.characters.all()))
+             for series in Series.objects.filter(user=user).order_by('id')]
+            for user in get_user_model().objects.filter(
+                email__startswith=prefix
+            ).order_by('id')
+        ]
+
+    # Test 7
+    def test_generate_dataset(self):
+        """Test generating a skewed dataset with a size report"""
+        out = self._generate('a')
+
+        self.assertIn('core_series_tags', out)
+        library = self._library('a')
+        self.assertEqual(len(library), 3)
+        self.assertEqual(sum(len(series) for series in library), 40)
+        # The first users own the biggest libraries
+        self.assertGreater(len(library[0]), len(library[2]))
+        self.assertEqual(Tag.objects.count(), 15)
+        self.assertEqual(Character.objects.count(), 12)
+        self.assertTrue(all(
+            len(series[5]) <= 3 and len(series[6]) <= 2
+            for series in library[0]
+        ))
+        series = Series.objects.exclude(image='').exclude(image=None).first()
+        self.assertTrue(os.path.exists(series.image.path))
+
+    # Test 8
+    def test_generate_dataset_is_deterministic(self):
+        """Test the same seed generates the same dataset"""
+        self._generate('a')
+        self._generate('b')
+        self._generate('c', seed=2)
+
+        self.assertEqual(self._library('a'), self._library('b'))
+        self.assertNotEqual(self._library('a'), self._library('c'))
+        with self.assertRaises(CommandError):
+            self._generate('a')
+
+
+# A TransactionTestCase, the client threads need committed data
+class BenchEndpointsCommandTests(TransactionTestCase):
+
+    def _bench(self, **options):
+        """Run a tiny benchmark in the test database, return the results"""
+        handle, path = tempfile.mkstemp(suffix='.json')
+        os.close(handle)
+        self.addCleanup(os.remove, path)
+        call_command('bench_endpoints', use_current_db=True, requests=4,
+                     concurrency=2, warmup=1, users=2, series=30,
+                     output=path, stdout=StringIO(), **options)
+        with open(path) as output:
+            return json.load(output), path
+
+    # Test 9
+    def test_bench_endpoints(self):
+        """Test every endpoint gets measured without errors"""
+        results, _ = self._bench()
+
+        self.assertEqual(list(results['endpoints']), list(ENDPOINTS))
+        for stats in results['endpoints'].values():
+            self.assertEqual(stats['requests'], 4)
+            self.assertEqual(stats['errors'], 0)
+            self.assertLessEqual(stats['p50_ms'], stats['p99_ms'])
+
+    # Test 10
+    def test_bench_endpoints_baseline(self):
+        """Test the regressions against a baseline fail the command"""
+        results, path = self._bench(endpoints=['tags'])
+        stats = results['endpoints']['tags']
+        self.assertEqual(compare(results, results, 0.2), [])
+
+        stats['queries_per_request'] -= 1
+        with open(path, 'w') as baseline:
+            json.dump(results, baseline)
+        with self.assertRaisesRegex(CommandError, 'tags: queries'):
+            self._bench(endpoints=['tags'], baseline=path)
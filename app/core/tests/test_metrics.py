@@ -0,0 +1,164 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+from io import BytesIO
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from PIL import Image
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.metrics import Counter, Histogram, registry
+from core.models import Series
+
+
+METRICS_URL = reverse('metrics')
+SERIES_URL = reverse('series:series-list')
+TOKEN_URL = reverse('users:token')
+
+
+def sample(text, name):
+    """Return the value of a sample line of the exposition, 0 if missing"""
+    for line in text.splitlines():
+        if line.startswith(name + ' '):
+            return float(line.rsplit(' ', 1)[1])
+    return 0
+
+
+class MetricsTests(TestCase):
+    """
+    Test the '/metrics' endpoint and the metrics middleware
+    """
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'test@akshay.com',
+            'testpass'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _scrape(self):
+        res = self.client.get(METRICS_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(res['Content-Type'].startswith('text/plain'))
+        return res.content.decode()
+
+    # Test 1
+    def test_requests_by_viewset_action(self):
+        """Test requests are counted and timed per viewset and action"""
+        requests = 'http_requests_total{view="SeriesViewSet",action="list",' \
+                   'method="GET",status="200"}'
+        latency = 'http_request_duration_seconds_count{view="SeriesViewSet",' \
+                  'action="list"}'
+        queries = 'http_request_queries_bucket{view="SeriesViewSet",' \
+                  'action="list",le="+Inf"}'
+        before = self._scrape()
+
+        self.client.get(SERIES_URL)
+        self.client.get(SERIES_URL)
+        after = self._scrape()
+
+        for name in (requests, latency, queries):
+            self.assertEqual(sample(after, name) - sample(before, name), 2)
+        self.assertIn('# TYPE http_request_duration_seconds histogram', after)
+        self.assertIn('cache_hit_ratio{cache="token"}', after)
+        self.assertIn('cache_hit_ratio{cache="series_list"}', after)
+
+    # Test 2
+    def test_api_view_labels(self):
+        """Test plain API views are labeled with the HTTP method"""
+        name = 'http_requests_total{view="CreateTokenView",action="post",' \
+               'method="POST",status="200"}'
+        before = sample(self._scrape(), name)
+
+        APIClient().post(TOKEN_URL, {'email': 'test@akshay.com',
+                                     'password': 'testpass'})
+
+        self.assertEqual(sample(self._scrape(), name) - before, 1)
+
+    # Test 3
+    def test_image_upload_bytes(self):
+        """Test the uploaded image bytes are counted"""
+        series = Series.objects.create(
+            user=self.user, title='Dark', rating=8, watch_rate=1
+        )
+        image = BytesIO()
+        Image.new('RGB', (10, 10)).save(image, format='JPEG')
+        image.name = 'dark.jpg'
+        size = len(image.getvalue())
+        image.seek(0)
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        before = self._scrape()
+
+        with override_settings(MEDIA_ROOT=media_root):
+            res = self.client.post(
+                reverse('series:series-upload-image', args=[series.id]),
+                {'image': image}, format='multipart'
+            )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        after = self._scrape()
+        self.assertEqual(sample(after, 'series_image_upload_bytes_total') -
+                         sample(before, 'series_image_upload_bytes_total'),
+                         size)
+        self.assertEqual(sample(after, 'series_image_uploads_total') -
+                         sample(before, 'series_image_uploads_total'), 1)
+
+    # Test 4
+    def test_histogram_buckets(self):
+        """Test the bucket counts are cumulative, with the sum and count"""
+        histogram = Histogram('test_seconds', 'Test', ('view',), (1, 5))
+        for value in (0.5, 1, 3, 7):
+            histogram.observe(('a',), value)
+
+        values = histogram.collect()[('a',)]
+        self.assertEqual(histogram.samples(values), [
+            ('_bucket', (('le', '1'),), 2),
+            ('_bucket', (('le', '5'),), 3),
+            ('_bucket', (('le', '+Inf'),), 4),
+            ('_sum', (), 11.5),
+            ('_count', (), 4),
+        ])
+
+    # Test 5
+    def test_ended_threads_are_folded(self):
+        """Test the shards of ended threads don't pile up, values are kept"""
+        counter = Counter('test_total', 'Test', ('view',))
+
+        def work():
+            counter.inc(('a',))
+        for _ in range(200):
+            thread = threading.Thread(target=work)
+            thread.start()
+            thread.join()
+        counter.inc(('a',))
+
+        self.assertLessEqual(len(counter._shards), 2)
+        self.assertEqual(counter.collect(), {('a',): [201]})
+
+    # Test 6
+    def test_multiprocess_directory(self):
+        """Test the values of the other worker processes are summed"""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        name = 'series_image_uploads_total'
+        # The file of another worker process
+        with open(os.path.join(directory, 'metrics-1-a.json'), 'w') as other:
+            json.dump({name: {'[]': [5]}}, other)
+
+        with override_settings(METRICS_DIR=directory):
+            text = registry.render()
+            self.client.get(SERIES_URL)
+            files = os.listdir(directory)
+
+        own = registry.snapshot()[name].get('[]', [0])[0]
+        self.assertEqual(sample(text, name), own + 5)
+        self.assertEqual(len(files), 2)
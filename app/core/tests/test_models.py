@@ -127,3 +127,37 @@ class ModelTests(TestCase):
 
         exp_path = f"uploads/series/{uuid}.jpg"
         self.assertEqual(file_path, exp_path)
+
+    # TEST 9:- Data version kept by the database triggers
+    def test_data_version_bumped_on_writes(self):
+        """Test writes to series, tags and their links bump the version"""
+        user = sample_user()
+        other = sample_user('other@akshaydev.com')
+
+        def version(user):
+            return models.DataVersion.objects.get(user=user).version
+
+        self.assertEqual(version(user), 0)
+        tag = models.Tag.objects.create(user=user, name='Drama')
+        series = models.Series.objects.create(
+            user=user, title='Dark', watch_rate=1, rating=9
+        )
+        series.tags.add(tag)
+        models.Series.objects.filter(user=user).update(status=True)
+        series.tags.clear()
+        series.delete()
+
+        self.assertEqual(version(user), 6)
+        self.assertEqual(version(other), 0)
+
+    # TEST 10
+    def test_data_version_bumped_once_per_statement(self):
+        """Test a bulk insert bumps the version once"""
+        user = sample_user()
+        models.Tag.objects.bulk_create(
+            [models.Tag(user=user, name=f'Tag {i}') for i in range(100)]
+        )
+        # Statements not touching any row don't count
+        models.Tag.objects.filter(name='missing').delete()
+
+        self.assertEqual(user.data_version.version, 1)
@@ -0,0 +1,116 @@
+import marshal
+import pstats
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.authentication import create_access_token
+from core.models import Series
+from core.profiling import _memory_lock
+
+
+SERIES_URL = reverse('series:series-list')
+
+
+@override_settings(REQUEST_PROFILING=True,
+                   REQUEST_PROFILING_SAMPLE_INTERVAL=0.0001)
+class ProfilingMiddlewareTests(TestCase):
+    """
+    Test the on-demand profiles of staff requests
+    """
+
+    def setUp(self):
+        self.staff = get_user_model().objects.create_user(
+            'staff@akshay.com', 'testpass', is_staff=True
+        )
+        self.user = get_user_model().objects.create_user(
+            'test@akshay.com', 'testpass'
+        )
+        for i in range(20):
+            Series.objects.create(user=self.staff, title=f'Series {i}',
+                                  rating=5, watch_rate=1)
+
+    def _get(self, user, mode):
+        """GET the series list with a signed access token"""
+        client = APIClient()
+        client.credentials(
+            HTTP_AUTHORIZATION=f'Bearer {create_access_token(user)}'
+        )
+        return client.get(SERIES_URL, {'profile': mode})
+
+    # Test 1
+    def test_cprofile(self):
+        """Test a staff request returns the pstats of the view"""
+        res = self._get(self.staff, 'cprofile')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res['X-Profiled-Status'], '200')
+        self.assertIn('.pstats"', res['Content-Disposition'])
+        with tempfile.NamedTemporaryFile(suffix='.pstats') as stats_file:
+            stats_file.write(res.content)
+            stats_file.flush()
+            stats = pstats.Stats(stats_file.name)
+        self.assertTrue(any(
+            function == 'list' for _, _, function in stats.stats
+        ))
+        self.assertEqual(marshal.loads(res.content), stats.stats)
+
+    # Test 2
+    def test_sampled_stacks(self):
+        """Test the collapsed stacks are in the flamegraph format"""
+        res = self._get(self.staff, 'stacks')
+
+        self.assertEqual(res['X-Profiled-Status'], '200')
+        lines = res.content.decode().splitlines()
+        self.assertTrue(lines)
+        for line in lines:
+            stack, count = line.rsplit(' ', 1)
+            self.assertGreater(int(count), 0)
+            self.assertIn(';', stack)
+
+    # Test 3
+    def test_memory(self):
+        """Test the tracemalloc report has the peak and the top lines"""
+        res = self._get(self.staff, 'memory')
+
+        self.assertEqual(res['X-Profiled-Status'], '200')
+        report = res.content.decode()
+        self.assertTrue(report.startswith('current '))
+        self.assertIn('peak', report)
+        self.assertIn('.py:', report)
+
+    # Test 4
+    def test_memory_busy(self):
+        """Test a memory profile while another one runs is refused"""
+        with _memory_lock:
+            res = self._get(self.staff, 'memory')
+
+        self.assertEqual(res.status_code, status.HTTP_409_CONFLICT)
+        self.assertNotIn('X-Profiled-Status', res)
+
+        res = self._get(self.staff, 'memory')
+        self.assertEqual(res['X-Profiled-Status'], '200')
+
+    # Test 5
+    def test_not_staff(self):
+        """Test other users and unknown modes get the normal response"""
+        for user, mode in ((self.user, 'cprofile'), (self.staff, 'other')):
+            res = self._get(user, mode)
+
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            self.assertNotIn('X-Profiled-Status', res)
+            self.assertIn('results', res.data)
+
+    # Test 6
+    @override_settings(REQUEST_PROFILING=False)
+    def test_disabled(self):
+        """Test nothing gets profiled with the setting off"""
+        res = self._get(self.staff, 'cprofile')
+
+        self.assertNotIn('X-Profiled-Status', res)
+        self.assertEqual(len(res.data['results']), 20)
@@ -0,0 +1,136 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from core.models import Series
+from core.slow_queries import explain, fingerprint, normalize
+
+
+SERIES_URL = reverse('series:series-list')
+
+
+class SlowQueryLogTests(TestCase):
+    """
+    Test the slow query wrapper and the fingerprints
+    """
+
+    # Test 1
+    def test_fingerprint_ignores_values(self):
+        """Test statements differing only in their values match"""
+        first = normalize(
+            "SELECT * FROM core_series WHERE id IN (1, 2, 3) AND title = 'a'"
+        )
+        second = normalize(
+            "SELECT *  FROM core_series\nWHERE id IN (%s, %s) AND title = %s"
+        )
+
+        self.assertEqual(first, second)
+        self.assertEqual(
+            first, 'SELECT * FROM core_series WHERE id IN (...) AND title = ?'
+        )
+        self.assertEqual(fingerprint(first), fingerprint(second))
+        self.assertEqual(
+            normalize('INSERT INTO t (a, b) VALUES (%s, %s), (%s, %s)'),
+            normalize('INSERT INTO t (a, b) VALUES (1, 2)'),
+        )
+
+    # Test 2
+    def test_slow_query_logged_with_plan(self):
+        """Test slow statements are logged with the view and the plan"""
+        user = get_user_model().objects.create_user('test@akshay.com',
+                                                    'testpass')
+        Series.objects.create(user=user, title='Dark', rating=8, watch_rate=1)
+        client = APIClient()
+        client.force_authenticate(user)
+
+        with self.assertLogs('core.slow_queries', 'WARNING') as logs, \
+                override_settings(SLOW_QUERY_MS=0, SLOW_QUERY_EXPLAIN_RATE=1):
+            client.get(SERIES_URL)
+
+        records = [json.loads(record.getMessage()) for record in logs.records]
+        series = [record for record in records
+                  if '"core_series"' in record['sql'] and
+                  record['sql'].startswith('SELECT')]
+        self.assertTrue(series)
+        self.assertEqual(series[0]['view'], 'SeriesViewSet')
+        self.assertEqual(series[0]['action'], 'list')
+        # Not run again by default
+        self.assertIn('cost=', series[0]['plan'])
+        self.assertNotIn('Execution Time', series[0]['plan'])
+        self.assertNotIn('EXPLAIN', ' '.join(record['sql']
+                                             for record in records))
+
+        with override_settings(SLOW_QUERY_EXPLAIN_ANALYZE=True):
+            plan = explain(connection, 'SELECT * FROM core_series', [])
+        self.assertIn('Execution Time', plan)
+
+    # Test 3
+    def test_failing_explain_keeps_the_transaction(self):
+        """Test a statement that can't be explained doesn't break anything"""
+        self.assertIsNone(explain(connection, 'SELECT * FROM missing', []))
+        self.assertIsNone(explain(connection, 'SET search_path = public', []))
+
+    # Test 4
+    def test_side_effects_not_explained(self):
+        """Test volatile functions and row locks are never run again"""
+        with override_settings(SLOW_QUERY_EXPLAIN_ANALYZE=True):
+            for sql in (
+                "SELECT nextval('core_series_id_seq') "
+                "FROM generate_series(1, %s)",
+                'SELECT * FROM core_series WHERE id = %s FOR UPDATE',
+                'SELECT id FROM core_series FOR NO KEY UPDATE SKIP LOCKED',
+            ):
+                self.assertIsNone(explain(connection, sql, [1]))
+
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT nextval('core_series_id_seq')")
+            first = cursor.fetchone()[0]
+            explain(connection, "SELECT nextval('core_series_id_seq')", [])
+            cursor.execute("SELECT nextval('core_series_id_seq')")
+            self.assertEqual(cursor.fetchone()[0], first + 1)
+
+        self.assertEqual(Series.objects.count(), 0)
+
+
+class SlowQueriesCommandTests(TestCase):
+
+    # Test 5
+    def test_summary_by_fingerprint(self):
+        """Test the worst fingerprints are printed first, with the plan"""
+        handle, path = tempfile.mkstemp(suffix='.log')
+        self.addCleanup(os.remove, path)
+        records = [
+            {'fingerprint': 'a' * 16, 'ms': 300, 'view': 'SeriesViewSet',
+             'action': 'list', 'sql': 'SELECT a'},
+            {'fingerprint': 'a' * 16, 'ms': 500, 'view': 'SeriesViewSet',
+             'action': 'list', 'sql': 'SELECT a', 'plan': 'Seq Scan on a'},
+            {'fingerprint': 'b' * 16, 'ms': 700, 'view': None,
+             'action': None, 'sql': 'SELECT b'},
+        ]
+        with os.fdopen(handle, 'w') as log:
+            log.write('not a record\n')
+            log.writelines(json.dumps(record) + '\n' for record in records)
+
+        out = StringIO()
+        call_command('slow_queries', path, plans=True, stdout=out)
+        lines = out.getvalue().splitlines()
+
+        self.assertTrue(lines[1].startswith('a' * 16))
+        self.assertIn('800.0', lines[1])
+        self.assertIn('SeriesViewSet.list', lines[1])
+        self.assertIn('Seq Scan on a', out.getvalue())
+        self.assertTrue(lines[4].startswith('b' * 16))
+
+        out = StringIO()
+        call_command('slow_queries', path, sort='max', top=1, stdout=out)
+        self.assertEqual(len(out.getvalue().splitlines()), 3)
+        self.assertIn('b' * 16, out.getvalue())
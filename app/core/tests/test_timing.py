@@ -0,0 +1,93 @@
+import json
+import re
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Series, Tag
+
+
+SERIES_URL = reverse('series:series-list')
+TIMING_RE = re.compile(
+    r'db;dur=[\d.]+;desc="(\d+) queries", serialize;dur=([\d.]+), '
+    r'render;dur=([\d.]+), total;dur=([\d.]+)$'
+)
+
+
+class RequestTimingMiddlewareTests(TestCase):
+    """
+    Test the Server-Timing headers and the request logs
+    """
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'test@akshay.com',
+            'testpass'
+        )
+        tag = Tag.objects.create(user=self.user, name='Drama')
+        for i in range(3):
+            series = Series.objects.create(
+                user=self.user, title=f'Series {i}', rating=5, watch_rate=1
+            )
+            series.tags.add(tag)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    # Test 1
+    def test_server_timing_header(self):
+        """Test the header has the queries and the time breakdown"""
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(SERIES_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        match = TIMING_RE.match(res['Server-Timing'])
+        self.assertIsNotNone(match)
+        self.assertEqual(int(match.group(1)), len(queries))
+        serialize, render, total = map(float, match.group(2, 3, 4))
+        self.assertGreater(serialize, 0)
+        self.assertGreater(render, 0)
+        self.assertLess(serialize + render, total)
+
+    # Test 2
+    def test_request_log_line(self):
+        """Test each request is logged as a JSON line at INFO"""
+        with self.assertLogs('core.timing', 'INFO') as logs:
+            self.client.get(SERIES_URL)
+
+        self.assertEqual(logs.records[0].levelname, 'INFO')
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record['view'], 'series:series-list')
+        self.assertEqual(record['status'], 200)
+        self.assertNotIn('sql', record)
+
+    # Test 3
+    @override_settings(REQUEST_TIMING_SLOW_MS=0)
+    def test_slow_request_sql_trace(self):
+        """Test the SQL of slow requests is logged as a warning"""
+        client = APIClient()
+        client.force_authenticate(self.user)
+        with self.assertLogs('core.timing', 'WARNING') as logs:
+            client.get(SERIES_URL)
+
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(len(record['sql']), record['queries'])
+        self.assertTrue(any('"core_series"' in query['sql']
+                            for query in record['sql']))
+
+    # Test 4
+    @override_settings(REQUEST_TIMING_SLOW_MS=0, REQUEST_TIMING_TRACE_RATE=0)
+    def test_slow_request_trace_sampling(self):
+        """Test no trace is logged with a zero sampling rate"""
+        client = APIClient()
+        client.force_authenticate(self.user)
+        with self.assertLogs('core.timing', 'INFO') as logs:
+            client.get(SERIES_URL)
+
+        self.assertEqual(logs.records[0].levelname, 'INFO')
+        self.assertNotIn('sql', json.loads(logs.records[0].getMessage()))
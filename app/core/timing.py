@@ -0,0 +1,147 @@
+import json
+import logging
+import random
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connection
+
+
+logger = logging.getLogger(__name__)
+
+
+# Per-request breakdown of where the time went, the middleware sets up one
+# per request and exposes it(for the serializers) through 'current_timings'.
+# A context variable, each worker thread has its own.
+class RequestTimings:
+    """
+    Query count and time spent in the database, serializers and renderer
+    """
+    __slots__ = ('queries', 'db', 'serialize', 'render', 'render_start',
+                 'serializing', 'trace', 'view')
+
+    def __init__(self):
+        self.queries = 0
+        self.db = 0.0
+        self.serialize = 0.0
+        self.render = 0.0
+        self.render_start = None
+        self.serializing = False
+        # (sql, seconds) of the queries, logged for slow requests
+        self.trace = []
+        # (view, action) of the request, see 'core.metrics.view_labels'
+        self.view = None
+
+    def record_query(self, execute, sql, params, many, context):
+        """Database execute wrapper, time the query"""
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.queries += 1
+            self.db += elapsed
+            self.trace.append((sql, elapsed))
+
+    def end_render(self, response):
+        """Post render callback of the response"""
+        if self.render_start is not None:
+            self.render += time.perf_counter() - self.render_start
+
+
+current_timings = ContextVar('current_timings', default=None)
+
+
+class TimedSerializerMixin:
+    """
+    Add the representation time of a serializer to the request timings
+    """
+
+    def to_representation(self, instance):
+        """Time the outermost serializer only, nested ones are included"""
+        timings = current_timings.get()
+        if timings is None or timings.serializing:
+            return super().to_representation(instance)
+
+        timings.serializing = True
+        start = time.perf_counter()
+        try:
+            return super().to_representation(instance)
+        finally:
+            timings.serialize += time.perf_counter() - start
+            timings.serializing = False
+
+
+class RequestTimingMiddleware:
+    """
+    Report the query count, database, serializer and render time of requests
+
+    Sent as 'Server-Timing' headers and logged(logger 'core.timing') as one
+    JSON line per request, the SQL of the requests slower than
+    REQUEST_TIMING_SLOW_MS is logged as a warning for a fraction
+    (REQUEST_TIMING_TRACE_RATE) of them. Put it first in MIDDLEWARE, the
+    total covers the middlewares after it.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.slow = getattr(settings, 'REQUEST_TIMING_SLOW_MS', 500) / 1000
+        self.trace_rate = getattr(settings, 'REQUEST_TIMING_TRACE_RATE', 1.0)
+
+    def __call__(self, request):
+        timings = RequestTimings()
+        reset = current_timings.set(timings)
+        start = time.perf_counter()
+        try:
+            with connection.execute_wrapper(timings.record_query):
+                response = self.get_response(request)
+        finally:
+            current_timings.reset(reset)
+        total = time.perf_counter() - start
+
+        # Streamed content(the export) is produced after this point, its
+        # queries are not included
+        response['Server-Timing'] = ', '.join((
+            f'db;dur={timings.db * 1000:.2f};desc="{timings.queries} queries"',
+            f'serialize;dur={timings.serialize * 1000:.2f}',
+            f'render;dur={timings.render * 1000:.2f}',
+            f'total;dur={total * 1000:.2f}',
+        ))
+        self._log(request, response, timings, total)
+        return response
+
+    def process_template_response(self, request, response):
+        """Time the rendering of DRF responses"""
+        timings = current_timings.get()
+        if timings is not None:
+            timings.render_start = time.perf_counter()
+            response.add_post_render_callback(timings.end_render)
+        return response
+
+    def _log(self, request, response, timings, total):
+        """Log the request line, with the SQL trace if slow and sampled"""
+        slow = total >= self.slow and random.random() < self.trace_rate
+        if not slow and not logger.isEnabledFor(logging.INFO):
+            return
+
+        match = request.resolver_match
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'view': match.view_name if match is not None else None,
+            'status': response.status_code,
+            'total_ms': round(total * 1000, 2),
+            'db_ms': round(timings.db * 1000, 2),
+            'queries': timings.queries,
+            'serialize_ms': round(timings.serialize * 1000, 2),
+            'render_ms': round(timings.render * 1000, 2),
+        }
+        if slow:
+            record['sql'] = [
+                {'sql': sql, 'ms': round(elapsed * 1000, 2)}
+                for sql, elapsed in timings.trace
+            ]
+            logger.warning(json.dumps(record))
+        else:
+            logger.info(json.dumps(record))
@@ -3,3 +3,10 @@ from django.apps import AppConfig
 
 class SeriesConfig(AppConfig):
     name = 'series'
+
+    def ready(self):
+        """Connect the signal handlers, expose the list cache counters"""
+        from series import signals  # noqa: F401
+        from series.cache import list_cache
+        from core.metrics import registry
+        registry.add_cache('series_list', list_cache)
@@ -0,0 +1,215 @@
+import io
+import re
+
+from django.db import connection
+from django.db.models.signals import post_delete, post_save, pre_delete, \
+                                     pre_save
+
+from core.models import Series
+
+
+# Raw statements on the M2M through tables of Series, the ids go as two
+# arrays unnested by postgres, so thousands of rows cost one statement and
+# two parameters insted of a model instance and an INSERT value per row.
+def _through_table(field_name):
+    """Return the quoted (table, series column, related column) of a field"""
+    qn = connection.ops.quote_name
+    field = Series._meta.get_field(field_name)
+    return (
+        qn(field.m2m_db_table()),
+        qn(field.m2m_column_name()),
+        qn(field.m2m_reverse_name()),
+    )
+
+
+def insert_through_rows(field_name, series_ids, related_ids):
+    """Link series_ids[i] to related_ids[i] for every i, in one INSERT"""
+    if not series_ids:
+        return
+    table, series_column, related_column = _through_table(field_name)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {table} ({series_column}, {related_column}) '
+            f'SELECT * FROM unnest(%s::integer[], %s::integer[])',
+            [list(series_ids), list(related_ids)]
+        )
+
+
+# COPY(text format) for the large loads of the management commands, the rows
+# go as one stream insted of statements. Characters with a special meaning:
+COPY_SPECIAL = re.compile(r'[\\\t\n\r]')
+# Bytes sent to the server per write of a COPY
+COPY_BUFFER_SIZE = 2 ** 20
+
+
+def copy_text(value):
+    """Return a string escaped for the COPY text format"""
+    if COPY_SPECIAL.search(value) is None:
+        return value
+    return value.replace('\\', '\\\\').replace('\t', '\\t') \
+        .replace('\n', '\\n').replace('\r', '\\r')
+
+
+def copy_lines(cursor, table, columns, lines):
+    """Load lines in the COPY text format into a table"""
+    qn = connection.ops.quote_name
+    cursor.copy_expert(
+        f'COPY {qn(table)} ({", ".join(qn(column) for column in columns)}) '
+        f'FROM STDIN',
+        io.StringIO(''.join(lines)),
+        size=COPY_BUFFER_SIZE
+    )
+
+
+def reserve_ids(cursor, model, count):
+    """Return 'count' new ids from the sequence of a model's table"""
+    # COPY can't return the ids of the rows, they are taken up front
+    cursor.execute(
+        "SELECT nextval(pg_get_serial_sequence(%s, 'id')) "
+        "FROM generate_series(1, %s)",
+        [model._meta.db_table, count]
+    )
+    return [row[0] for row in cursor.fetchall()]
+
+
+def get_or_create_names(model, user, names):
+    """Return {name: (id, stored name)} for names, creating missing ones"""
+    # The insert is race safe against concurrent writers, the unique
+    # (user_id, lower(name)) index turns a clash into a no-op and the select
+    # (a new snapshot) then sees the row the other writer inserted.
+    qn = connection.ops.quote_name
+    table = qn(model._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {table} ("user_id", "name") '
+            f'SELECT %s, name FROM unnest(%s::varchar[]) AS input(name) '
+            f'ON CONFLICT ("user_id", lower("name")) DO NOTHING',
+            [user.pk, names]
+        )
+        cursor.execute(
+            f'SELECT input.name, obj."id", obj."name" '
+            f'FROM unnest(%s::varchar[]) AS input(name) '
+            f'JOIN {table} obj ON obj."user_id" = %s '
+            f'AND lower(obj."name") = lower(input.name)',
+            [names, user.pk]
+        )
+        return {name: (pk, stored) for name, pk, stored in cursor.fetchall()}
+
+
+def delete_through_rows(field_name, series_id, related_ids):
+    """Unlink the related_ids from a series, in one DELETE"""
+    if not related_ids:
+        return
+    table, series_column, related_column = _through_table(field_name)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {table} WHERE {series_column} = %s '
+            f'AND {related_column} = ANY(%s)',
+            [series_id, list(related_ids)]
+        )
+
+
+# Bulk changes of a user's series, scoped by the user so ids of other users
+# are just not matched. Django sends no signals for QuerySet.update() and
+# only loads the rows on delete() for the signals and the cascades, so the
+# per-row path is only taken when a receiver is connected for Series.
+def _user_series(user, ids):
+    """Return the queryset of the user's series with the given ids"""
+    table = connection.ops.quote_name(Series._meta.db_table)
+    return Series.objects.filter(user=user).extra(
+        where=[f'{table}."id" = ANY(%s)'], params=[list(ids)]
+    )
+
+
+def update_series(user, ids, changes):
+    """Apply the field changes to the user's series, return the row count"""
+    queryset = _user_series(user, ids)
+    if not (pre_save.has_listeners(Series) or
+            post_save.has_listeners(Series)):
+        return queryset.update(**changes)
+
+    count = 0
+    for series in queryset.select_for_update():
+        for field_name, value in changes.items():
+            setattr(series, field_name, value)
+        series.save(update_fields=list(changes))
+        count += 1
+    return count
+
+
+def delete_series(user, ids):
+    """Delete the user's series and their links, return the row count"""
+    if pre_delete.has_listeners(Series) or post_delete.has_listeners(Series):
+        _, deleted = _user_series(user, ids).delete()
+        return deleted.get(Series._meta.label, 0)
+
+    qn = connection.ops.quote_name
+    series_table = qn(Series._meta.db_table)
+    with connection.cursor() as cursor:
+        for field_name in ('tags', 'characters'):
+            table, series_column, _ = _through_table(field_name)
+            cursor.execute(
+                f'DELETE FROM {table} USING {series_table} '
+                f'WHERE {table}.{series_column} = {series_table}."id" '
+                f'AND {series_table}."user_id" = %s '
+                f'AND {series_table}."id" = ANY(%s)',
+                [user.pk, list(ids)]
+            )
+        cursor.execute(
+            f'DELETE FROM {series_table} '
+            f'WHERE "user_id" = %s AND "id" = ANY(%s)',
+            [user.pk, list(ids)]
+        )
+        return cursor.rowcount
+
+
+def increment_watch_rate(user, series_id, by, status=None):
+    """Add 'by' to the watch rate of a series, return the new values"""
+    # The increment happens in the UPDATE itself, concurrent requests queue
+    # on the row lock and each one adds to the committed value, nothing is
+    # lost and no lock is held in between. Returns None if the user has no
+    # such series.
+    qn = connection.ops.quote_name
+    table = qn(Series._meta.db_table)
+    # Decrements stop at zero, a rate already below it(the field takes
+    # negative values) is never raised by one
+    assignments = [
+        '"watch_rate" = GREATEST("watch_rate" + %s, LEAST("watch_rate", 0))'
+    ]
+    params = [by]
+    if status is not None:
+        assignments.append('"status" = %s')
+        params.append(status)
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'UPDATE {table} SET {", ".join(assignments)} '
+            f'WHERE "user_id" = %s AND "id" = %s '
+            f'RETURNING "id", "watch_rate", "status"',
+            params + [user.pk, series_id]
+        )
+        row = cursor.fetchone()
+
+    if row is None:
+        return None
+    return dict(zip(('id', 'watch_rate', 'status'), row))
+
+
+def select_related_names(field_name, series_ids):
+    """Return {series id: [names]} of the related objects of the series"""
+    table, series_column, related_column = _through_table(field_name)
+    related_table = connection.ops.quote_name(
+        Series._meta.get_field(field_name).related_model._meta.db_table
+    )
+    names = {}
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT link.{series_column}, related."name" FROM {table} link '
+            f'JOIN {related_table} related '
+            f'ON related."id" = link.{related_column} '
+            f'WHERE link.{series_column} = ANY(%s) ORDER BY related."name"',
+            [list(series_ids)]
+        )
+        for series_id, name in cursor.fetchall():
+            names.setdefault(series_id, []).append(name)
+    return names
@@ -0,0 +1,83 @@
+import threading
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.http import urlencode
+
+
+# Cache of the tag and character list responses, one cache entry per user and
+# resource holding the response data of each query string. The entries are
+# deleted by the signals in 'series.signals' on every change and are stored
+# with the user's data version(see 'core.DataVersion'), an entry written by a
+# request racing a write, or older than a raw SQL write, is never served.
+class ListCache:
+    """
+    Per user cache of list responses with hit/miss counters
+    """
+    # Max. number of query strings kept for a user and resource
+    max_variants = 16
+
+    def __init__(self, alias):
+        self.alias = alias
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def key(self, resource, user_id):
+        """Return the cache key of a user's resource"""
+        return f'series:list:{resource}:{user_id}'
+
+    def variant(self, query_params):
+        """Return the key of a query string, independent of the order"""
+        return urlencode(sorted(query_params.lists()), doseq=True)
+
+    def get(self, resource, user_id, version, query_params):
+        """Return the cached data, None if missing or outdated"""
+        entry = self.cache.get(self.key(resource, user_id))
+        data = None
+        if entry is not None and entry['version'] == version:
+            data = entry['responses'].get(self.variant(query_params))
+
+        with self._lock:
+            if data is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return data
+
+    def set(self, resource, user_id, version, query_params, data):
+        """Cache the data of a query string"""
+        key = self.key(resource, user_id)
+        entry = self.cache.get(key)
+        if entry is None or entry['version'] != version or \
+                len(entry['responses']) >= self.max_variants:
+            entry = {'version': version, 'responses': {}}
+        entry['responses'][self.variant(query_params)] = data
+        self.cache.set(key, entry)
+
+    def invalidate(self, resource, user_id):
+        """Drop the cached responses of a user's resource"""
+        self.cache.delete(self.key(resource, user_id))
+
+    def clear(self):
+        """Reset the counters, the entries expire or get invalidated"""
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        """Return the hit/miss counters and the hit ratio"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': self.hits / total if total else 0.0,
+            }
+
+
+list_cache = ListCache(getattr(settings, 'SERIES_LIST_CACHE', 'default'))
@@ -0,0 +1,100 @@
+import csv
+import datetime
+import json
+from itertools import islice
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+from series.bulk import select_related_names
+
+
+# Streaming export of a whole library. The series are read through a server
+# side cursor, 'chunk_size' rows at a time, and the tag/character names of
+# each chunk are loaded with one query per relation, so the memory used is
+# about one chunk whatever the size of the library. Rows go out in the
+# (start_date, id) index order, no sort before the first byte.
+EXPORT_FIELDS = (
+    'id', 'title', 'start_date', 'status', 'rating', 'link', 'watch_rate',
+)
+EXPORT_RELATIONS = ('tags', 'characters')
+
+
+def export_chunks(queryset, chunk_size=2000):
+    """Yield lists of series dicts, with the tag and character names"""
+    rows = queryset.order_by('-start_date', '-id').values_list(
+        *EXPORT_FIELDS
+    ).iterator(chunk_size=chunk_size)
+
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return
+        items = [dict(zip(EXPORT_FIELDS, row)) for row in chunk]
+        names = {
+            field_name: select_related_names(
+                field_name, [row[0] for row in chunk]
+            )
+            for field_name in EXPORT_RELATIONS
+        }
+        for item in items:
+            for field_name in EXPORT_RELATIONS:
+                item[field_name] = names[field_name].get(item['id'], [])
+        yield items
+
+
+class ExportJSONEncoder(DjangoJSONEncoder):
+    """
+    JSON encoder keeping the microseconds of the datetimes, as the API
+    """
+
+    def default(self, o):
+        # DjangoJSONEncoder cuts them to milliseconds, 'start_date' would not
+        # survive an export and import
+        if isinstance(o, datetime.datetime):
+            value = timezone.localtime(o).isoformat() \
+                if timezone.is_aware(o) else o.isoformat()
+            if value.endswith('+00:00'):
+                value = value[:-6] + 'Z'
+            return value
+        return super().default(o)
+
+
+def ndjson_stream(queryset, chunk_size=2000):
+    """Yield the series as JSON lines, a chunk at a time"""
+    encoder = ExportJSONEncoder()
+    for items in export_chunks(queryset, chunk_size):
+        yield ''.join(encoder.encode(item) + '\n' for item in items)
+
+
+class _Echo:
+    """
+    File like object returning what is written, for the csv writer
+    """
+
+    def write(self, value):
+        return value
+
+
+def csv_stream(queryset, chunk_size=2000):
+    """Yield the series as CSV rows, names as JSON arrays"""
+    # Names are free text, a JSON array('["a", "b|c"]') is the only cell
+    # format any name can be read back from
+    writer = csv.writer(_Echo())
+    yield writer.writerow(EXPORT_FIELDS + EXPORT_RELATIONS)
+    for items in export_chunks(queryset, chunk_size):
+        yield ''.join(
+            writer.writerow(
+                [item[field] for field in EXPORT_FIELDS] +
+                [json.dumps(item[field], ensure_ascii=False)
+                 for field in EXPORT_RELATIONS]
+            )
+            for item in items
+        )
+
+
+# Export type -> (stream, content type, file extension)
+EXPORT_TYPES = {
+    'ndjson': (ndjson_stream, 'application/x-ndjson', 'ndjson'),
+    'csv': (csv_stream, 'text/csv', 'csv'),
+}
@@ -0,0 +1,151 @@
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections import OrderedDict
+
+from django.db import connection
+from django.utils.dateparse import parse_datetime
+
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+# Keyset(seek) pagination, the cursor carries the (start_date, id) of the last
+# row seen and the next page is a "WHERE (start_date, id) < (%s, %s)" on the
+# index, so page N costs the same as page 1, no OFFSET scans and no COUNT(*).
+class SeriesCursorPagination(BasePagination):
+    """
+    Opaque cursor pagination for series, newest first
+    """
+    cursor_query_param = 'cursor'
+    page_size = 100
+    # Clients can ask for a smaller/larger page, capped at 'max_page_size'
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+    # Both columns together give a stable, unique ordering
+    ordering = ('start_date', 'id')
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """Return a single page of the queryset after the cursor"""
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.cursor = self.decode_cursor(request)
+
+        # 'reverse' cursors come from 'previous' links, walk backwards
+        reverse = self.cursor is not None and self.cursor[0]
+        if self.cursor is not None:
+            queryset = self._seek(queryset, reverse, self.cursor[1:])
+        if reverse:
+            queryset = queryset.order_by(*self.ordering)
+        else:
+            queryset = queryset.order_by(
+                *['-' + field for field in self.ordering]
+            )
+
+        # Fetch one extra row to know if there is a following page
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+
+        if reverse:
+            results.reverse()
+            self.has_next = True
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = self.cursor is not None
+        self.page = results
+
+        return results
+
+    def get_paginated_response(self, data):
+        """Wrap the page data with the next and previous links"""
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_page_size(self, request):
+        """Return the page size requested by the client, if valid"""
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+
+        return min(page_size, self.max_page_size)
+
+    def get_next_link(self):
+        """Return the url of the following page"""
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(False, self.page[-1])
+
+    def get_previous_link(self):
+        """Return the url of the preceding page"""
+        if not self.has_previous:
+            return None
+        if not self.page:
+            # Walked past the end, the first page is the best we can offer
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(True, self.page[0])
+
+    def encode_cursor(self, reverse, obj):
+        """Return the url with an opaque cursor pointing at 'obj'"""
+        # Model instances or values() rows('series.values')
+        if isinstance(obj, dict):
+            values = [obj[field] for field in self.ordering]
+        else:
+            values = [getattr(obj, field) for field in self.ordering]
+        position = '|'.join(
+            [str(int(reverse))] + [self._to_string(value) for value in values]
+        )
+        cursor = urlsafe_b64encode(position.encode('ascii')).decode('ascii')
+
+        return replace_query_param(
+            self.base_url, self.cursor_query_param, cursor
+        )
+
+    def decode_cursor(self, request):
+        """Return (reverse, start_date, id) from the cursor, None if absent"""
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+
+        try:
+            position = urlsafe_b64decode(encoded.encode('ascii'))
+            reverse, start_date, pk = position.decode('ascii').split('|')
+            start_date = parse_datetime(start_date)
+            if start_date is None or reverse not in ('0', '1'):
+                raise ValueError
+            return reverse == '1', start_date, int(pk)
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def _seek(self, queryset, reverse, position):
+        """Filter out the rows up to and including the cursor position"""
+        # Django has no row value comparison, a raw tuple comparison lets
+        # postgres use the composite index directly for the seek.
+        qn = connection.ops.quote_name
+        table = qn(queryset.model._meta.db_table)
+        columns = ', '.join(
+            f'{table}.{qn(queryset.model._meta.get_field(field).column)}'
+            for field in self.ordering
+        )
+        placeholders = ', '.join(['%s'] * len(position))
+        operator = '>' if reverse else '<'
+
+        return queryset.extra(
+            where=[f'({columns}) {operator} ({placeholders})'],
+            params=list(position),
+        )
+
+    def _to_string(self, value):
+        """Serialize a single cursor column"""
+        if hasattr(value, 'isoformat'):
+            return value.isoformat()
+        return str(value)
@@ -1,10 +1,123 @@
+from django.db import transaction
+from django.db.models import Value
+from django.db.models.functions import Lower
+from django.db.models.signals import m2m_changed
+from django.utils.translation import ugettext_lazy as _
+
 from rest_framework import serializers
+from rest_framework.relations import MANY_RELATION_KWARGS
 
 from core.models import Tag, Character, Series
+from core.timing import TimedSerializerMixin
+from series.bulk import delete_through_rows, insert_through_rows
+
+
+# DRF resolves a 'many=True' PrimaryKeyRelatedField one id at a time, with one
+# SELECT per id and against every user's objects. This pair looks the whole
+# list up in a single query limited to the user making the request.
+class UserOwnedManyRelatedField(serializers.ManyRelatedField):
+    """
+    List of primary keys validated with a single query
+    """
+    default_error_messages = {
+        'does_not_exist': _('Invalid pk(s) {pk_values} - '
+                            'object(s) do not exist.'),
+    }
+
+    def to_internal_value(self, data):
+        """Resolve all the ids at once, reporting every missing id"""
+        if isinstance(data, str) or not hasattr(data, '__iter__'):
+            self.fail('not_a_list', input_type=type(data).__name__)
+        if not self.allow_empty and len(data) == 0:
+            self.fail('empty')
+
+        # In the order given, without duplicates
+        pks, seen = [], set()
+        for item in data:
+            # Integers or strings of digits only, int() would also take
+            # True and truncate 1.9 to 1
+            if isinstance(item, int) and not isinstance(item, bool):
+                pk = item
+            elif isinstance(item, str) and item.isdecimal():
+                pk = int(item)
+            else:
+                self.child_relation.fail(
+                    'incorrect_type', data_type=type(item).__name__
+                )
+            if pk not in seen:
+                seen.add(pk)
+                pks.append(pk)
+
+        # Bulk requests look up the ids of all their items at once and pass
+        # them in the context(see 'SeriesViewSet.bulk_create')
+        related = self.context.get('related_objects', {})
+        if self.field_name in related:
+            objects = {
+                pk: related[self.field_name][pk]
+                for pk in pks if pk in related[self.field_name]
+            }
+        else:
+            objects = self.child_relation.get_queryset().in_bulk(pks)
+        missing = [pk for pk in pks if pk not in objects]
+        if missing:
+            self.fail('does_not_exist', pk_values=missing)
+
+        return [objects[pk] for pk in pks]
+
+
+class UserOwnedPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """
+    Primary key field limited to the objects of the request user
+    """
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        """Use the batched field for 'many=True'"""
+        list_kwargs = {'child_relation': cls(*args, **kwargs)}
+        for key in kwargs:
+            if key in MANY_RELATION_KWARGS:
+                list_kwargs[key] = kwargs[key]
+        return UserOwnedManyRelatedField(**list_kwargs)
+
+    def get_queryset(self):
+        """Return only the objects owned by the authenticated user"""
+        queryset = super().get_queryset()
+        request = self.context.get('request')
+        if request is None or not request.user.is_authenticated:
+            return queryset.none()
+        return queryset.filter(user=request.user)
+
+
+# Tags and characters names are unique per user, ignoring the case
+class BaseSeriesAttrSerializer(TimedSerializerMixin,
+                               serializers.ModelSerializer):
+    """
+    Base serializer for user owned series attributes
+    """
+    default_error_messages = {
+        'duplicate_name': _('An object with this name already exists.'),
+    }
+
+    def validate_name(self, value):
+        """Check the user has no other object with the same name"""
+        request = self.context.get('request')
+        if request is None:
+            return value
+        # Compared on lower(name), as the (user_id, lower(name)) index
+        exists = self.Meta.model.objects.annotate(
+            lower_name=Lower('name')
+        ).filter(
+            user=request.user, lower_name=Lower(Value(value))
+        ).exists()
+        if exists:
+            raise serializers.ValidationError(
+                self.error_messages['duplicate_name'], code='duplicate_name'
+            )
+        return value
 
 
 # Creating a ModelSerializer and link to Tag MODEL, pull in ID and name values
-class TagSerializer(serializers.ModelSerializer):
+class TagSerializer(BaseSeriesAttrSerializer):
     """
     Serializer for Tag objects
     """
@@ -15,7 +128,7 @@ class TagSerializer(serializers.ModelSerializer):
         read_only_fields = ('id',)
 
 
-class CharacterSerializer(serializers.ModelSerializer):
+class CharacterSerializer(BaseSeriesAttrSerializer):
     """
     Serializer for Character objects
     """
@@ -26,17 +139,131 @@ class CharacterSerializer(serializers.ModelSerializer):
         read_only_fields = ('id',)
 
 
-class SeriesSerializer(serializers.ModelSerializer):
+# For the bulk get or create of tags and characters by name
+class NameListSerializer(serializers.Serializer):
+    """
+    Serializer for a list of names
+    """
+    names = serializers.ListField(
+        child=serializers.CharField(max_length=255),
+        min_length=1,
+        max_length=1000
+    )
+
+
+# For the bulk update and delete of series
+class SeriesIdListSerializer(serializers.Serializer):
+    """
+    Serializer for a list of series ids
+    """
+    ids = serializers.ListField(
+        child=serializers.IntegerField(),
+        min_length=1,
+        max_length=10000
+    )
+
+
+class SeriesBulkUpdateSerializer(SeriesIdListSerializer):
+    """
+    Serializer for the same field changes on a list of series
+    """
+    changes = serializers.DictField()
+    # Only the plain columns, set in a single UPDATE
+    update_fields = ('title', 'status', 'rating', 'link', 'watch_rate')
+
+    def validate_changes(self, value):
+        """Validate the changes as a partial update of a series"""
+        unknown = sorted(set(value) - set(self.update_fields))
+        if unknown:
+            raise serializers.ValidationError(
+                _('Fields can not be bulk updated: %s.') % ', '.join(unknown)
+            )
+        if not value:
+            raise serializers.ValidationError(_('No changes given.'))
+
+        serializer = SeriesSerializer(data=value, partial=True)
+        if not serializer.is_valid():
+            raise serializers.ValidationError(serializer.errors)
+        return serializer.validated_data
+
+
+# For incrementing the watch rate of a series
+class WatchRateIncrementSerializer(serializers.Serializer):
+    """
+    Serializer for a watch rate increment(or decrement)
+    """
+    by = serializers.IntegerField(default=1, min_value=-1000, max_value=1000)
+    status = serializers.BooleanField(required=False)
+
+    def validate_by(self, value):
+        """Reject a zero increment"""
+        if value == 0:
+            raise serializers.ValidationError(_('Must not be zero.'))
+        return value
+
+
+# Used for 'many=True', bulk creating a list of series
+class SeriesListSerializer(serializers.ListSerializer):
+    """
+    Create a list of series with batched inserts
+    """
+
+    def create(self, validated_data):
+        """Insert the series, then all their tags and characters"""
+        series_list, tag_lists, character_lists = [], [], []
+        for item in validated_data:
+            tag_lists.append(item.pop('tags', []))
+            character_lists.append(item.pop('characters', []))
+            series_list.append(Series(**item))
+
+        # One INSERT for the series(returning the new ids) and one for each
+        # through table, insted of a save() and two set() per row
+        with transaction.atomic():
+            Series.objects.bulk_create(series_list)
+            for field_name, related_lists in (('tags', tag_lists),
+                                              ('characters', character_lists)):
+                series_ids, related_ids = [], []
+                for series, related_objects in zip(series_list,
+                                                   related_lists):
+                    for related in related_objects:
+                        series_ids.append(series.id)
+                        related_ids.append(related.id)
+                insert_through_rows(field_name, series_ids, related_ids)
+
+        return series_list
+
+
+# Sparse fieldsets, 'fields' keeps a subset of Meta.fields(in their order),
+# the other fields are never built
+class SparseFieldsMixin:
+    """
+    Model serializer taking the names of the fields to include
+    """
+
+    def __init__(self, *args, fields=None, **kwargs):
+        self.sparse_fields = fields
+        super().__init__(*args, **kwargs)
+
+    def get_field_names(self, declared_fields, info):
+        """Return the Meta fields, only the requested ones if any"""
+        names = super().get_field_names(declared_fields, info)
+        if self.sparse_fields is None:
+            return names
+        return [name for name in names if name in self.sparse_fields]
+
+
+class SeriesSerializer(SparseFieldsMixin, TimedSerializerMixin,
+                       serializers.ModelSerializer):
     """
     Serialize a Series object
     """
-    characters = serializers.PrimaryKeyRelatedField(
+    characters = UserOwnedPrimaryKeyRelatedField(
         many=True,
         # lists the Characters with their id, detailed list will be created
         # later, to specify each of its name other ID
         queryset=Character.objects.all()
     )
-    tags = serializers.PrimaryKeyRelatedField(
+    tags = UserOwnedPrimaryKeyRelatedField(
         many=True,
         queryset=Tag.objects.all()
     )
@@ -50,6 +277,57 @@ class SeriesSerializer(serializers.ModelSerializer):
         read_only_fields = ('id', 'start_date')
         # The 'Characters' and 'Tags' are seperate models, so need to add them
         # as special fields |^|
+        list_serializer_class = SeriesListSerializer
+
+    def update(self, instance, validated_data):
+        """Update a series, writing only the changed tags/characters"""
+        related = {
+            field_name: validated_data.pop(field_name)
+            for field_name in ('tags', 'characters')
+            if field_name in validated_data
+        }
+        with transaction.atomic():
+            instance = super().update(instance, validated_data)
+            for field_name, objects in related.items():
+                self._update_related(instance, field_name, objects)
+
+        return instance
+
+    def _update_related(self, instance, field_name, objects):
+        """Apply the difference between the current and the new objects"""
+        # Django's set() may run a DELETE and an INSERT per changed id, here
+        # it is one DELETE and one INSERT at most, none if nothing changed.
+        field = Series._meta.get_field(field_name)
+        through = field.remote_field.through
+        current = set(through.objects.filter(
+            **{field.m2m_field_name(): instance}
+        ).values_list(field.m2m_reverse_name(), flat=True))
+        new = {obj.pk for obj in objects}
+        removed, added = current - new, new - current
+
+        # The m2m_changed signals set() would send, for the listeners
+        if removed:
+            self._m2m_changed('pre_remove', instance, field, removed)
+            delete_through_rows(field_name, instance.pk, removed)
+            self._m2m_changed('post_remove', instance, field, removed)
+        if added:
+            self._m2m_changed('pre_add', instance, field, added)
+            insert_through_rows(
+                field_name, [instance.pk] * len(added), list(added)
+            )
+            self._m2m_changed('post_add', instance, field, added)
+
+    def _m2m_changed(self, action, instance, field, pk_set):
+        """Send the m2m_changed signal of a forward M2M change"""
+        m2m_changed.send(
+            sender=field.remote_field.through,
+            action=action,
+            instance=instance,
+            reverse=False,
+            model=field.related_model,
+            pk_set=pk_set,
+            using=instance._state.db,
+        )
 
 
 # Adding SeriesDetailSerializer(modified version of SeriesSerializer(inherit))
@@ -65,7 +343,8 @@ class SeriesDetailSerializer(SeriesSerializer):
 
 
 # Adding Serializer to process the image uploaded
-class SeriesImageSerializer(serializers.ModelSerializer):
+class SeriesImageSerializer(TimedSerializerMixin,
+                            serializers.ModelSerializer):
     """
     serializer for uploading images to series
     """
@@ -0,0 +1,38 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from core.models import Tag, Character, Series
+from series.cache import list_cache
+
+
+# Drop the cached tag/character lists of the user owning the changed object,
+# a new or renamed tag changes the tag lists only and linking a tag to a
+# series changes the 'assigned_only' tag lists only.
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def invalidate_tag_lists(sender, instance, **kwargs):
+    """Drop the cached tag lists of the tag's user"""
+    list_cache.invalidate('tags', instance.user_id)
+
+
+@receiver(post_save, sender=Character)
+@receiver(post_delete, sender=Character)
+def invalidate_character_lists(sender, instance, **kwargs):
+    """Drop the cached character lists of the character's user"""
+    list_cache.invalidate('characters', instance.user_id)
+
+
+@receiver(m2m_changed, sender=Series.tags.through)
+def invalidate_linked_tag_lists(sender, instance, action, **kwargs):
+    """Drop the cached tag lists after tags get (un)linked"""
+    # 'instance' is the series, or the tag for the reverse relation, both
+    # belong to the same user
+    if action.startswith('post_'):
+        list_cache.invalidate('tags', instance.user_id)
+
+
+@receiver(m2m_changed, sender=Series.characters.through)
+def invalidate_linked_character_lists(sender, instance, action, **kwargs):
+    """Drop the cached character lists after characters get (un)linked"""
+    if action.startswith('post_'):
+        list_cache.invalidate('characters', instance.user_id)
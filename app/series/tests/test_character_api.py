@@ -7,10 +7,12 @@ from rest_framework.test import APIClient
 
 from core.models import Character, Series
 
+from series.cache import list_cache
 from series.serializers import CharacterSerializer
 
 
 CHARACTERS_URL = reverse('series:character-list')
+CHARACTERS_BULK_URL = reverse('series:character-bulk-get-or-create')
 
 
 class PublicCharacterApiTests(TestCase):
@@ -151,3 +153,39 @@ class PrivateCharacterApiTests(TestCase):
         res = self.client.get(CHARACTERS_URL, {'assigned_only': 1})
 
         self.assertEqual(len(res.data), 1)
+
+    # TEST 8:- bulk get or create characters by name
+    def test_bulk_get_or_create_characters(self):
+        """Test existing characters are returned and missing ones created"""
+        existing = Character.objects.create(user=self.user, name='Magneto')
+
+        res = self.client.post(
+            CHARACTERS_BULK_URL,
+            {'names': ['magneto', 'Storm']},
+            format='json'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data[0], {'id': existing.id, 'name': 'Magneto'})
+        self.assertTrue(
+            Character.objects.filter(user=self.user, name='Storm').exists()
+        )
+
+    # TEST 9:- cached list dropped when characters are (un)linked
+    def test_character_list_cache_invalidated(self):
+        """Test linking a character to a series updates the cached list"""
+        list_cache.cache.clear()
+        character = Character.objects.create(user=self.user, name='Jonas')
+        series = Series.objects.create(
+            user=self.user, title='Dark', watch_rate=1, rating=9
+        )
+        res = self.client.get(CHARACTERS_URL, {'assigned_only': 1})
+        self.assertEqual(res.data, [])
+
+        series.characters.add(character)
+        res = self.client.get(CHARACTERS_URL, {'assigned_only': 1})
+
+        self.assertEqual(len(res.data), 1)
+        self.assertIsNotNone(list_cache.cache.get(
+            list_cache.key('characters', self.user.pk)
+        ))
@@ -0,0 +1,153 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Tag, Series
+
+SERIES_URL = reverse('series:series-list')
+TAGS_URL = reverse('series:tag-list')
+CHARACTERS_URL = reverse('series:character-list')
+
+
+def detail_url(series_id):
+    """Return the series detail URL"""
+    return reverse('series:series-detail', args=[series_id])
+
+
+# Conditional GET of the lists with the per user data version
+class ConditionalGetTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@akshay.com',
+            'testpass'
+        )
+        self.client.force_authenticate(self.user)
+        self.series = Series.objects.create(
+            user=self.user, title='Dark', watch_rate=1, rating=9
+        )
+
+    # TEST 1:-
+    def test_lists_return_etag(self):
+        """Test the list and detail responses have a strong ETag"""
+        for url in (SERIES_URL, TAGS_URL, CHARACTERS_URL,
+                    detail_url(self.series.id)):
+            res = self.client.get(url)
+
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            self.assertTrue(res['ETag'].startswith('"'))
+
+    # TEST 2:-
+    def test_unchanged_returns_not_modified(self):
+        """Test a matching If-None-Match gets a 304 in a single query"""
+        etag = self.client.get(SERIES_URL)['ETag']
+
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(SERIES_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(res['ETag'], etag)
+        self.assertEqual(res.content, b'')
+        self.assertEqual(len(queries), 1)
+
+        # Weak comparison and lists of tags
+        res = self.client.get(
+            SERIES_URL, HTTP_IF_NONE_MATCH=f'"old", W/{etag}'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    # TEST 3:-
+    def test_write_changes_etag(self):
+        """Test any write to the user's data changes the ETag"""
+        etag = self.client.get(TAGS_URL)['ETag']
+        Tag.objects.create(user=self.user, name='Drama')
+
+        res = self.client.get(TAGS_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(res['ETag'], etag)
+        self.assertEqual(len(res.data), 1)
+
+        # Including the raw bulk statements
+        etag = res['ETag']
+        self.client.post(reverse('series:series-watch', args=[self.series.id]))
+
+        res = self.client.get(TAGS_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    # TEST 4:-
+    def test_etag_differs_between_users(self):
+        """Test two users with the same version get different ETags"""
+        user2 = get_user_model().objects.create_user(
+            'test2@akshay.com',
+            'testpass'
+        )
+        etag = self.client.get(TAGS_URL)['ETag']
+        self.client.force_authenticate(user2)
+
+        res = self.client.get(TAGS_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    # TEST 5:-
+    def test_etag_differs_between_requests(self):
+        """Test the ETag of a page or format doesn't match another one"""
+        Tag.objects.create(user=self.user, name='Drama')
+        etag = self.client.get(TAGS_URL, {'assigned_only': 0})['ETag']
+
+        for params, accept in (({'assigned_only': 1}, 'application/json'),
+                               ({}, 'application/json'),
+                               ({'assigned_only': 0}, 'text/html')):
+            res = self.client.get(TAGS_URL, params, HTTP_ACCEPT=accept,
+                                  HTTP_IF_NONE_MATCH=etag)
+
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            self.assertNotEqual(res['ETag'], etag)
+
+        # The query parameters in any order
+        etag = self.client.get(SERIES_URL, {'page_size': 1, 'fields': 'id'})[
+            'ETag']
+        res = self.client.get(f'{SERIES_URL}?fields=id&page_size=1',
+                              HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    # TEST 6:-
+    def test_unknown_id_not_modified(self):
+        """Test a missing or foreign series is a 404 with any ETag"""
+        etag = self.client.get(detail_url(self.series.id))['ETag']
+        user2 = get_user_model().objects.create_user(
+            'test2@akshay.com',
+            'testpass'
+        )
+        other = Series.objects.create(
+            user=user2, title='Lost', watch_rate=1, rating=9
+        )
+
+        for series_id in (self.series.id + 1000, other.id):
+            res = self.client.get(detail_url(series_id),
+                                  HTTP_IF_NONE_MATCH=etag)
+
+            self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(detail_url(self.series.id),
+                                  HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+        # An EXISTS on the id and the data version, the series isn't loaded
+        self.assertEqual(len(queries), 2)
+        self.assertIn('LIMIT 1', queries[0]['sql'])
+        self.assertFalse(any('core_series_tags' in query['sql']
+                             for query in queries))
+
+        res = self.client.get(detail_url('abc'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
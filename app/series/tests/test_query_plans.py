@@ -0,0 +1,154 @@
+import random
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Tag, Character, Series
+
+
+TAGS_URL = reverse('series:tag-list')
+CHARACTERS_URL = reverse('series:character-list')
+SERIES_URL = reverse('series:series-list')
+
+# Size of the seeded dataset, big enough for the planner to prefer indexes,
+# the first user owns a big library the others a small one
+USERS = 40
+SERIES_PER_USER = 250
+BIG_LIBRARY = 5000
+ATTRS_PER_USER = 50
+
+
+def seed_dataset():
+    """Bulk create a library for many users and refresh the table stats"""
+    rand = random.Random(1)
+    users = [
+        get_user_model().objects.create_user(f'user{i}@akshay.com', 'pass')
+        for i in range(USERS)
+    ]
+    Tag.objects.bulk_create(
+        Tag(user=user, name=f'Tag {i}')
+        for user in users for i in range(ATTRS_PER_USER)
+    )
+    Character.objects.bulk_create(
+        Character(user=user, name=f'Character {i}')
+        for user in users for i in range(ATTRS_PER_USER)
+    )
+    Series.objects.bulk_create(
+        Series(user=user, title=f'Series {i}', watch_rate=i, rating=5)
+        for user in users
+        for i in range(BIG_LIBRARY if user == users[0] else SERIES_PER_USER)
+    )
+
+    tags, characters = {}, {}
+    for tag in Tag.objects.all():
+        tags.setdefault(tag.user_id, []).append(tag.id)
+    for character in Character.objects.all():
+        characters.setdefault(character.user_id, []).append(character.id)
+
+    series_tags, series_characters = [], []
+    for series_id, user_id in Series.objects.values_list('id', 'user_id'):
+        for tag_id in rand.sample(tags[user_id], 3):
+            series_tags.append(
+                Series.tags.through(series_id=series_id, tag_id=tag_id)
+            )
+        for character_id in rand.sample(characters[user_id], 2):
+            series_characters.append(Series.characters.through(
+                series_id=series_id, character_id=character_id
+            ))
+    Series.tags.through.objects.bulk_create(series_tags)
+    Series.characters.through.objects.bulk_create(series_characters)
+
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+
+    return users
+
+
+# The per user query shapes must be answered from the composite indexes
+class QueryPlanTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        users = seed_dataset()
+        # A user with a big library and one with an average library
+        cls.user, cls.small_user = users[0], users[1]
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _main_plan(self, url, table, params=None):
+        """Return the EXPLAIN output of the endpoint's query on 'table'"""
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(url, params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        sql = next(
+            query['sql'] for query in queries.captured_queries
+            if query['sql'].startswith('SELECT') and
+            f'FROM "{table}"' in query['sql']
+        )
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN ' + sql)
+            return '\n'.join(row[0] for row in cursor.fetchall())
+
+    def assertIndexScan(self, plan, table, index):
+        """Assert the plan reads 'table' through 'index'"""
+        self.assertIn(index, plan)
+        self.assertNotIn(f'Seq Scan on {table}', plan)
+
+    # TEST 1
+    def test_tags_list_uses_index(self):
+        """Test the tags list is read from a (user, ..) index"""
+        plan = self._main_plan(TAGS_URL, 'core_tag')
+        self.assertIndexScan(plan, 'core_tag', 'core_tag_user_')
+
+    # TEST 2
+    def test_characters_list_uses_index(self):
+        """Test the characters list is read from a (user, ..) index"""
+        plan = self._main_plan(CHARACTERS_URL, 'core_character')
+        self.assertIndexScan(
+            plan, 'core_character', 'core_character_user_'
+        )
+
+    # TEST 3
+    def test_assigned_tags_uses_index(self):
+        """Test the assigned only tags list uses the through table index"""
+        plan = self._main_plan(TAGS_URL, 'core_tag', {'assigned_only': 1})
+        self.assertIndexScan(plan, 'core_tag', 'core_tag_user_')
+        self.assertIndexScan(
+            plan, 'core_series_tags', 'core_series_tags_tag_series_idx'
+        )
+
+    # TEST 4
+    def test_series_list_uses_index(self):
+        """Test the series list page is read from the (user, start) index"""
+        plan = self._main_plan(SERIES_URL, 'core_series')
+        self.assertIndexScan(plan, 'core_series', 'core_series_user_start_idx')
+
+    # TEST 5
+    def test_series_filter_uses_index(self):
+        """Test filtering series by tags and characters uses indexes"""
+        # For the big library a seq scan over a third of the table is as
+        # good as any index, the average user must be found by index.
+        self.client.force_authenticate(self.small_user)
+        tag = Tag.objects.filter(user=self.small_user).first()
+        character = Character.objects.filter(user=self.small_user).first()
+        plan = self._main_plan(SERIES_URL, 'core_series', {
+            'tags': str(tag.id),
+            'characters': str(character.id),
+        })
+        self.assertNotIn('Seq Scan on core_series ', plan)
+        self.assertIndexScan(
+            plan, 'core_series_tags', 'core_series_tags_tag_series_idx'
+        )
+        self.assertIndexScan(
+            plan, 'core_series_characters',
+            'core_series_characters_character_series_idx'
+        )
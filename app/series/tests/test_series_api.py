@@ -1,10 +1,19 @@
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.db import connection
+from django.db.models.signals import m2m_changed, post_delete
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 
 # Inbuilt python fun. to generate temp. files
+import csv
+from decimal import Decimal
+import json
 import tempfile
 import os
+import threading
+from unittest.mock import patch
 
 # Image library from Pillow
 from PIL import Image
@@ -14,10 +23,13 @@ from rest_framework.test import APIClient
 
 from core.models import Series, Tag, Character
 from series.serializers import SeriesSerializer, SeriesDetailSerializer
+from series.views import SeriesViewSet
 
 
 # Variable for series url
 SERIES_URL = reverse('series:series-list')
+SERIES_BULK_URL = reverse('series:series-bulk-create')
+EXPORT_URL = reverse('series:series-export')
 
 
 # To generate the upload image URL
@@ -26,6 +38,11 @@ def image_upload_url(series_id):
     return reverse('series:series-upload-image', args=[series_id])
 
 
+def watch_url(series_id):
+    """Return URL for incrementing a series watch rate"""
+    return reverse('series:series-watch', args=[series_id])
+
+
 # for detail api, need a url with idea
 # /api/series/serieses/1, need to pass in this argument(id), at the time of
 # creating url, a function for generating series url.
@@ -101,13 +118,13 @@ class PrivateSeriesApiTests(TestCase):
 
         res = self.client.get(SERIES_URL)
 
-        series = Series.objects.all().order_by('-id')
+        series = Series.objects.all().order_by('-start_date', '-id')
         # 'many=True' need in return a list of data.
         serializer = SeriesSerializer(series, many=True)
 
-        # Assert to find the data matches the serializer
+        # Assert to find the data matches the serializer, the list is paged
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data['results'], serializer.data)
 
     # TEST 3
     def test_series_limitted_to_user(self):
@@ -128,8 +145,8 @@ class PrivateSeriesApiTests(TestCase):
 
         # Assert the st.code is 'HTTP_200_OK', only data returned fr auth.usr
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(res.data), 1)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(len(res.data['results']), 1)
+        self.assertEqual(res.data['results'], serializer.data)
 
     # TEST 4
     # For the detail series api Viewset
@@ -353,9 +370,9 @@ class SeriesImageUploadTests(TestCase):
         serializer1 = SeriesSerializer(series1)
         serializer2 = SeriesSerializer(series2)
         serializer3 = SeriesSerializer(series3)
-        self.assertIn(serializer1.data, res.data)
-        self.assertIn(serializer2.data, res.data)
-        self.assertNotIn(serializer3.data, res.data)
+        self.assertIn(serializer1.data, res.data['results'])
+        self.assertIn(serializer2.data, res.data['results'])
+        self.assertNotIn(serializer3.data, res.data['results'])
 
     # TEST 13:-
     def test_filter_series_by_characters(self):
@@ -377,6 +394,963 @@ class SeriesImageUploadTests(TestCase):
         serializer1 = SeriesSerializer(series1)
         serializer2 = SeriesSerializer(series2)
         serializer3 = SeriesSerializer(series3)
-        self.assertIn(serializer1.data, res.data)
-        self.assertIn(serializer2.data, res.data)
-        self.assertNotIn(serializer3.data, res.data)
+        self.assertIn(serializer1.data, res.data['results'])
+        self.assertIn(serializer2.data, res.data['results'])
+        self.assertNotIn(serializer3.data, res.data['results'])
+
+
+# Tests for the keyset(cursor) pagination on the series list
+class SeriesPaginationTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@akshay.com',
+            'testpass'
+        )
+        self.client.force_authenticate(self.user)
+        # Same start_date on every row, the id must break the ties
+        start_date = timezone.now()
+        self.series = [
+            sample_series(user=self.user, title=f'Series {i}',
+                          start_date=start_date)
+            for i in range(5)
+        ]
+
+    # TEST 14:- walk all the pages forward
+    def test_pages_cover_all_series_once(self):
+        """Test following 'next' links returns every series once"""
+        res = self.client.get(SERIES_URL, {'page_size': 2})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIsNone(res.data['previous'])
+
+        ids = [item['id'] for item in res.data['results']]
+        while res.data['next']:
+            res = self.client.get(res.data['next'])
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            self.assertLessEqual(len(res.data['results']), 2)
+            ids += [item['id'] for item in res.data['results']]
+
+        expected = sorted([series.id for series in self.series], reverse=True)
+        self.assertEqual(ids, expected)
+
+    # TEST 15:- the 'previous' link returns the same page again
+    def test_previous_link(self):
+        """Test going back a page returns the preceding series"""
+        first = self.client.get(SERIES_URL, {'page_size': 2})
+        second = self.client.get(first.data['next'])
+        res = self.client.get(second.data['previous'])
+
+        self.assertEqual(res.data['results'], first.data['results'])
+
+    # TEST 16:- deep pages run the same queries, no OFFSET and no COUNT
+    def test_no_offset_or_count_queries(self):
+        """Test a page is fetched with a seek, not with an offset or count"""
+        first = self.client.get(SERIES_URL, {'page_size': 2})
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(first.data['next'])
+
+        for query in queries.captured_queries:
+            self.assertNotIn('OFFSET', query['sql'])
+            self.assertNotIn('COUNT(', query['sql'])
+
+    # TEST 17:-
+    def test_invalid_cursor(self):
+        """Test an invalid cursor returns 404"""
+        res = self.client.get(SERIES_URL, {'cursor': 'not-a-cursor'})
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+
+# The number of queries must not depend on the number of series returned
+class SeriesQueryCountTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@akshay.com',
+            'testpass'
+        )
+        self.client.force_authenticate(self.user)
+
+    def _create_series(self, count):
+        """Create 'count' series each with a couple of tags and characters"""
+        series_list = []
+        # Continue the numbering, tag and character names must be unique
+        start = Series.objects.count()
+        for i in range(start, start + count):
+            series = sample_series(user=self.user, title=f'Series {i}')
+            series.tags.add(
+                sample_tag(user=self.user, name=f'Tag {i}a'),
+                sample_tag(user=self.user, name=f'Tag {i}b'),
+            )
+            series.characters.add(
+                sample_character(user=self.user, name=f'Character {i}')
+            )
+            series_list.append(series)
+        return series_list
+
+    def _count_queries(self, url):
+        """Return the number of queries run by a GET to 'url'"""
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(url)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return len(queries)
+
+    # TEST 18:-
+    def test_list_query_count_is_constant(self):
+        """Test listing series runs the same queries for 1 or many rows"""
+        self._create_series(1)
+        small = self._count_queries(SERIES_URL)
+
+        self._create_series(10)
+        large = self._count_queries(SERIES_URL)
+
+        self.assertEqual(small, large)
+
+    # TEST 19:-
+    def test_detail_query_count_is_constant(self):
+        """Test the detail view queries don't grow with tags/characters"""
+        series = self._create_series(1)[0]
+        small = self._count_queries(detail_url(series.id))
+
+        series.tags.add(*[
+            sample_tag(user=self.user, name=f'Extra {i}') for i in range(10)
+        ])
+        series.characters.add(*[
+            sample_character(user=self.user, name=f'Extra {i}')
+            for i in range(10)
+        ])
+        large = self._count_queries(detail_url(series.id))
+
+        self.assertEqual(small, large)
+
+
+# Tags and characters ids are validated in one query, for the user only
+class SeriesRelatedValidationTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@akshay.com',
+            'testpass'
+        )
+        self.client.force_authenticate(self.user)
+
+    def _payload(self, **params):
+        """Return a series payload"""
+        payload = {
+            'title': 'Dark',
+            'status': False,
+            'watch_rate': 2,
+            'rating': 9.00,
+        }
+        payload.update(params)
+        return payload
+
+    # TEST 20:-
+    def test_create_series_with_other_users_tags_fails(self):
+        """Test tags of another user are rejected, all reported at once"""
+        user2 = get_user_model().objects.create_user(
+            'test2@akshay.com',
+            'testpass'
+        )
+        tag1 = sample_tag(user=user2, name='Time travel')
+        tag2 = sample_tag(user=user2, name='German')
+        own_tag = sample_tag(user=self.user, name='Mystery')
+
+        res = self.client.post(
+            SERIES_URL,
+            self._payload(tags=[own_tag.id, tag1.id, tag2.id]),
+            format='json'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn(str(tag1.id), res.data['tags'][0])
+        self.assertIn(str(tag2.id), res.data['tags'][0])
+        self.assertFalse(Series.objects.exists())
+
+    # TEST 21:-
+    def test_create_series_invalid_tag_id(self):
+        """Test a non integer tag id is rejected"""
+        tag = sample_tag(user=self.user)
+        # Floats would be truncated and True taken as 1 by int()
+        for value in ('abc', tag.id + 0.9, float(tag.id), True, '1.5', None,
+                      [tag.id]):
+            res = self.client.post(
+                SERIES_URL, self._payload(tags=[value]), format='json'
+            )
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertEqual(res.data['tags'][0].code, 'incorrect_type')
+        self.assertFalse(Series.objects.exists())
+
+        # Strings of digits are ids, duplicates are dropped
+        res = self.client.post(
+            SERIES_URL,
+            self._payload(tags=[str(tag.id), tag.id], characters=[]),
+            format='json'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res.data['tags'], [tag.id])
+
+    # TEST 22:-
+    def test_create_query_count_is_constant(self):
+        """Test the create queries don't grow with the number of tags"""
+        tags = [
+            sample_tag(user=self.user, name=f'Tag {i}') for i in range(20)
+        ]
+        characters = [
+            sample_character(user=self.user, name=f'Character {i}')
+            for i in range(20)
+        ]
+
+        with CaptureQueriesContext(connection) as small:
+            res = self.client.post(SERIES_URL, self._payload(
+                tags=[tags[0].id], characters=[characters[0].id]
+            ), format='json')
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+
+        with CaptureQueriesContext(connection) as large:
+            res = self.client.post(SERIES_URL, self._payload(
+                tags=[tag.id for tag in tags],
+                characters=[character.id for character in characters]
+            ), format='json')
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+
+        self.assertEqual(len(small), len(large))
+        self.assertEqual(len(res.data['tags']), 20)
+
+
+# Tests for the any/all match of the tags and characters filters
+class SeriesFilterMatchTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@akshay.com',
+            'testpass'
+        )
+        self.client.force_authenticate(self.user)
+        self.tag1 = sample_tag(user=self.user, name='Drama')
+        self.tag2 = sample_tag(user=self.user, name='Crime')
+        self.character = sample_character(user=self.user, name='Tony')
+
+        self.both = sample_series(user=self.user, title='The Sopranos')
+        self.both.tags.add(self.tag1, self.tag2)
+        self.both.characters.add(self.character)
+        self.one = sample_series(user=self.user, title='Mad Men')
+        self.one.tags.add(self.tag1)
+        self.none = sample_series(user=self.user, title='Friends')
+
+    def _filtered_ids(self, params):
+        """Return the ids of the series listed with the filter 'params'"""
+        res = self.client.get(SERIES_URL, params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return [item['id'] for item in res.data['results']]
+
+    # TEST 23:-
+    def test_filter_match_any_returns_unique_series(self):
+        """Test a series matching several tags is returned once"""
+        ids = self._filtered_ids({'tags': f'{self.tag1.id},{self.tag2.id}'})
+
+        self.assertEqual(sorted(ids), sorted([self.both.id, self.one.id]))
+
+    # TEST 24:-
+    def test_filter_match_all(self):
+        """Test match=all returns only series with every tag"""
+        ids = self._filtered_ids({
+            'tags': f'{self.tag1.id},{self.tag2.id}',
+            'match': 'all',
+        })
+
+        self.assertEqual(ids, [self.both.id])
+
+    # TEST 25:-
+    def test_filter_tags_and_characters(self):
+        """Test combining the tags and characters filters"""
+        ids = self._filtered_ids({
+            'tags': str(self.tag1.id),
+            'characters': str(self.character.id),
+        })
+
+        self.assertEqual(ids, [self.both.id])
+
+    # TEST 26:-
+    def test_filter_uses_array_parameter(self):
+        """Test the ids are sent as one array, without a DISTINCT"""
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(SERIES_URL, {
+                'tags': f'{self.tag1.id},{self.tag2.id}'
+            })
+
+        # After the data version lookup of the ETag
+        sql = queries.captured_queries[1]['sql']
+        self.assertIn('= ANY(ARRAY[', sql)
+        self.assertNotIn('DISTINCT', sql)
+
+    # TEST 27:-
+    def test_filter_invalid_match(self):
+        """Test an unknown match mode returns 400"""
+        res = self.client.get(SERIES_URL, {
+            'tags': str(self.tag1.id), 'match': 'some'
+        })
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+# Tests for creating a list of series in one request
+class SeriesBulkCreateTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@akshay.com',
+            'testpass'
+        )
+        self.client.force_authenticate(self.user)
+        self.tags = [
+            sample_tag(user=self.user, name=f'Tag {i}') for i in range(3)
+        ]
+        self.character = sample_character(user=self.user)
+
+    def _items(self, count):
+        """Return a list of series payloads"""
+        return [{
+            'title': f'Series {i}',
+            'status': False,
+            'watch_rate': i,
+            'rating': '7.50',
+            'tags': [tag.id for tag in self.tags],
+            'characters': [self.character.id],
+        } for i in range(count)]
+
+    # TEST 28:-
+    def test_bulk_create_series(self):
+        """Test creating series with tags and characters in bulk"""
+        res = self.client.post(SERIES_BULK_URL, self._items(3), format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(res.data['ids']), 3)
+        for series in Series.objects.filter(id__in=res.data['ids']):
+            self.assertEqual(series.user, self.user)
+            self.assertEqual(set(series.tags.all()), set(self.tags))
+            self.assertEqual(list(series.characters.all()), [self.character])
+
+    # TEST 29:-
+    def test_bulk_create_query_count_is_constant(self):
+        """Test the bulk create queries don't grow with the items"""
+        with CaptureQueriesContext(connection) as small:
+            self.client.post(SERIES_BULK_URL, self._items(1), format='json')
+        with CaptureQueriesContext(connection) as large:
+            self.client.post(SERIES_BULK_URL, self._items(50), format='json')
+
+        self.assertEqual(len(small), len(large))
+        self.assertEqual(Series.objects.count(), 51)
+
+    # TEST 30:-
+    def test_bulk_create_reports_item_errors(self):
+        """Test the errors are reported per item and nothing is created"""
+        user2 = get_user_model().objects.create_user(
+            'test2@akshay.com',
+            'testpass'
+        )
+        items = self._items(3)
+        items[1]['title'] = ''
+        items[2]['tags'] = [sample_tag(user=user2).id]
+
+        res = self.client.post(SERIES_BULK_URL, items, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        errors = res.data['errors']
+        self.assertEqual(errors[0], {})
+        self.assertIn('title', errors[1])
+        self.assertIn('tags', errors[2])
+        self.assertFalse(Series.objects.exists())
+
+    # TEST 31:-
+    def test_bulk_create_requires_list(self):
+        """Test the payload must be a list"""
+        res = self.client.post(
+            SERIES_BULK_URL, self._items(1)[0], format='json'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+# Updating tags/characters writes only the difference
+class SeriesRelatedUpdateTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@akshay.com',
+            'testpass'
+        )
+        self.client.force_authenticate(self.user)
+        self.tags = [
+            sample_tag(user=self.user, name=f'Tag {i}') for i in range(4)
+        ]
+        self.series = sample_series(user=self.user)
+        self.series.tags.add(self.tags[0], self.tags[1])
+
+    def _through_writes(self, queries):
+        """Return the INSERT/DELETE statements on the through tables"""
+        return [
+            query['sql'] for query in queries.captured_queries
+            if query['sql'].startswith(('INSERT', 'DELETE')) and
+            'core_series_' in query['sql']
+        ]
+
+    # TEST 32:-
+    def test_patch_unchanged_tags_writes_nothing(self):
+        """Test sending the same tags doesn't touch the through table"""
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.patch(detail_url(self.series.id), {
+                'tags': [self.tags[1].id, self.tags[0].id]
+            }, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(self._through_writes(queries), [])
+
+    # TEST 33:-
+    def test_patch_without_tags_writes_nothing(self):
+        """Test a patch not sending tags doesn't touch the through table"""
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.patch(
+                detail_url(self.series.id), {'title': 'Ozark'}, format='json'
+            )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(self._through_writes(queries), [])
+        self.assertEqual(self.series.tags.count(), 2)
+
+    # TEST 34:-
+    def test_patch_changed_tags_one_delete_one_insert(self):
+        """Test changing tags runs a single DELETE and a single INSERT"""
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.patch(detail_url(self.series.id), {
+                'tags': [self.tags[1].id, self.tags[2].id, self.tags[3].id]
+            }, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        writes = self._through_writes(queries)
+        self.assertEqual(len(writes), 2)
+        self.assertTrue(writes[0].startswith('DELETE'))
+        self.assertTrue(writes[1].startswith('INSERT'))
+        self.assertEqual(set(self.series.tags.all()), set(self.tags[1:]))
+
+    # TEST 35:-
+    def test_update_sends_m2m_changed(self):
+        """Test the m2m_changed listeners still see the changes"""
+        received = []
+
+        def listener(action, pk_set, **kwargs):
+            received.append((action, pk_set))
+
+        m2m_changed.connect(listener, sender=Series.tags.through)
+        try:
+            self.client.patch(detail_url(self.series.id), {
+                'tags': [self.tags[0].id, self.tags[2].id]
+            }, format='json')
+        finally:
+            m2m_changed.disconnect(listener, sender=Series.tags.through)
+
+        self.assertIn(('post_remove', {self.tags[1].id}), received)
+        self.assertIn(('post_add', {self.tags[2].id}), received)
+
+
+# Changing and deleting a list of series in one request
+class SeriesBulkUpdateDeleteTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@akshay.com',
+            'testpass'
+        )
+        self.client.force_authenticate(self.user)
+        self.series = [
+            sample_series(user=self.user, status=False, watch_rate=1)
+            for _ in range(3)
+        ]
+        self.series[0].tags.add(sample_tag(user=self.user))
+        user2 = get_user_model().objects.create_user(
+            'test2@akshay.com',
+            'testpass'
+        )
+        self.other = sample_series(user=user2, status=False, watch_rate=1)
+
+    def _ids(self):
+        """Return the ids of the user's and the other user's series"""
+        return [series.id for series in self.series] + [self.other.id]
+
+    # TEST 36:-
+    def test_bulk_update_series(self):
+        """Test updating a list of series in a single UPDATE"""
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.patch(SERIES_BULK_URL, {
+                'ids': self._ids(),
+                'changes': {'status': True, 'watch_rate': 3},
+            }, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, {'updated': 3})
+        updates = [
+            query['sql'] for query in queries.captured_queries
+            if query['sql'].startswith('UPDATE')
+        ]
+        self.assertEqual(len(updates), 1)
+        for series in self.series:
+            series.refresh_from_db()
+            self.assertTrue(series.status)
+            self.assertEqual(series.watch_rate, 3)
+        # Other user's series are left alone
+        self.other.refresh_from_db()
+        self.assertFalse(self.other.status)
+
+    # TEST 37:-
+    def test_bulk_update_invalid_changes(self):
+        """Test read only, related and invalid fields are rejected"""
+        for changes in ({'tags': []}, {'start_date': '2020-01-01'},
+                        {'watch_rate': 'a lot'}, {}):
+            res = self.client.patch(SERIES_BULK_URL, {
+                'ids': self._ids(), 'changes': changes
+            }, format='json')
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Series.objects.filter(status=True).exists())
+
+    # TEST 38:-
+    def test_bulk_delete_series(self):
+        """Test deleting a list of series with their links"""
+        ids = self._ids()[1:]
+        res = self.client.delete(
+            SERIES_BULK_URL, {'ids': ids}, format='json'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, {'deleted': 2})
+        self.assertEqual(
+            list(Series.objects.filter(user=self.user)), [self.series[0]]
+        )
+        self.assertTrue(Series.objects.filter(id=self.other.id).exists())
+
+        res = self.client.delete(
+            SERIES_BULK_URL, {'ids': [self.series[0].id]}, format='json'
+        )
+
+        self.assertEqual(res.data, {'deleted': 1})
+        self.assertFalse(Series.tags.through.objects.exists())
+
+    # TEST 39:-
+    def test_bulk_delete_sends_signals_to_listeners(self):
+        """Test the per-row signals are sent when a listener is connected"""
+        received = []
+
+        def listener(instance, **kwargs):
+            received.append(instance.id)
+
+        post_delete.connect(listener, sender=Series)
+        try:
+            res = self.client.delete(
+                SERIES_BULK_URL, {'ids': self._ids()}, format='json'
+            )
+        finally:
+            post_delete.disconnect(listener, sender=Series)
+
+        self.assertEqual(res.data, {'deleted': 3})
+        self.assertEqual(
+            sorted(received), sorted(series.id for series in self.series)
+        )
+        self.assertFalse(Series.tags.through.objects.exists())
+
+
+# Incrementing the watch rate in a single statement
+class SeriesWatchRateTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@akshay.com',
+            'testpass'
+        )
+        self.client.force_authenticate(self.user)
+        self.series = sample_series(user=self.user, status=False, watch_rate=5)
+
+    # TEST 40:-
+    def test_increment_watch_rate(self):
+        """Test incrementing the watch rate in one query"""
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.post(watch_url(self.series.id))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, {
+            'id': self.series.id, 'watch_rate': 6, 'status': False
+        })
+        self.assertEqual(len(queries), 1)
+        self.assertIn('RETURNING', queries.captured_queries[0]['sql'])
+
+    # TEST 41:-
+    def test_decrement_and_set_status(self):
+        """Test decrementing the watch rate and setting the status"""
+        res = self.client.post(
+            watch_url(self.series.id), {'by': -2, 'status': True}
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.series.refresh_from_db()
+        self.assertEqual(self.series.watch_rate, 3)
+        self.assertTrue(self.series.status)
+
+        # Never goes below zero
+        res = self.client.post(watch_url(self.series.id), {'by': -10})
+
+        self.assertEqual(res.data['watch_rate'], 0)
+
+        # A negative rate(set by an update) is never raised by a decrement
+        Series.objects.filter(id=self.series.id).update(watch_rate=-5)
+        res = self.client.post(watch_url(self.series.id), {'by': -1})
+
+        self.assertEqual(res.data['watch_rate'], -5)
+
+        res = self.client.post(watch_url(self.series.id), {'by': 2})
+
+        self.assertEqual(res.data['watch_rate'], -3)
+
+    # TEST 42:-
+    def test_increment_other_users_series(self):
+        """Test other user's series are not found"""
+        user2 = get_user_model().objects.create_user(
+            'test2@akshay.com',
+            'testpass'
+        )
+        series = sample_series(user=user2)
+
+        res = self.client.post(watch_url(series.id))
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+        series.refresh_from_db()
+        self.assertEqual(series.watch_rate, 5)
+
+    # TEST 43:-
+    def test_increment_invalid(self):
+        """Test a zero or non integer increment is rejected"""
+        for by in (0, 'one'):
+            res = self.client.post(watch_url(self.series.id), {'by': by})
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class ConcurrentWatchRateTests(TransactionTestCase):
+
+    # TEST 44:-
+    def test_concurrent_increments_are_not_lost(self):
+        """Test every concurrent increment is applied"""
+        user = get_user_model().objects.create_user(
+            'test@akshay.com',
+            'testpass'
+        )
+        series = sample_series(user=user, watch_rate=0)
+        threads_count, increments = 8, 25
+        errors = []
+        barrier = threading.Barrier(threads_count)
+
+        def worker():
+            client = APIClient()
+            client.force_authenticate(user)
+            try:
+                barrier.wait()
+                for _ in range(increments):
+                    res = client.post(watch_url(series.id))
+                    if res.status_code != status.HTTP_200_OK:
+                        errors.append(res.status_code)
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker)
+                   for _ in range(threads_count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        series.refresh_from_db()
+        self.assertEqual(series.watch_rate, threads_count * increments)
+
+
+# Streaming export of the whole library
+class SeriesExportTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@akshay.com',
+            'testpass'
+        )
+        self.client.force_authenticate(self.user)
+        self.tags = [
+            sample_tag(user=self.user, name=name) for name in ('b', 'a')
+        ]
+        self.character = sample_character(user=self.user, name='Jonas')
+        self.series = []
+        for i in range(5):
+            series = sample_series(user=self.user, title=f'Series {i}')
+            series.tags.add(*self.tags)
+            self.series.append(series)
+        self.series[0].characters.add(self.character)
+        sample_series(
+            user=get_user_model().objects.create_user(
+                'test2@akshay.com',
+                'testpass'
+            )
+        )
+
+    def _export(self, params=None):
+        """Return the export response and its content"""
+        res = self.client.get(EXPORT_URL, params or {})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return res, b''.join(res.streaming_content).decode()
+
+    # TEST 45:-
+    def test_export_ndjson(self):
+        """Test the export has a JSON line per series with the names"""
+        res, content = self._export()
+
+        self.assertEqual(res['Content-Type'], 'application/x-ndjson')
+        items = [json.loads(line) for line in content.splitlines()]
+        self.assertEqual(
+            [item['id'] for item in items],
+            [series.id for series in reversed(self.series)]
+        )
+        self.assertEqual(items[-1]['tags'], ['a', 'b'])
+        self.assertEqual(items[-1]['characters'], ['Jonas'])
+        self.assertEqual(items[0]['characters'], [])
+        self.assertEqual(items[0]['rating'], '8.00')
+        # The datetimes as the API renders them, with the microseconds
+        self.assertEqual(
+            items[0]['start_date'],
+            SeriesSerializer(self.series[-1]).data['start_date']
+        )
+
+    # TEST 46:-
+    def test_export_csv(self):
+        """Test the CSV export has a header and a row per series"""
+        res, content = self._export({'type': 'csv'})
+
+        self.assertEqual(res['Content-Type'], 'text/csv')
+        rows = list(csv.DictReader(content.splitlines()))
+        self.assertEqual(len(rows), 5)
+        self.assertEqual(rows[-1]['title'], 'Series 0')
+        self.assertEqual(json.loads(rows[-1]['tags']), ['a', 'b'])
+        self.assertEqual(json.loads(rows[-1]['characters']), ['Jonas'])
+        self.assertEqual(json.loads(rows[0]['characters']), [])
+
+    # TEST 56:-
+    def test_export_csv_names_with_separators(self):
+        """Test names with '|', commas and quotes are read back as is"""
+        names = ['Sci|Fi', 'Drama, "dark"', '[1]']
+        self.series[0].tags.set(
+            [sample_tag(user=self.user, name=name) for name in names]
+        )
+
+        res, content = self._export({'type': 'csv'})
+
+        rows = list(csv.DictReader(content.splitlines()))
+        self.assertEqual(sorted(json.loads(rows[-1]['tags'])), sorted(names))
+
+    # TEST 47:-
+    def test_export_queries_per_chunk(self):
+        """Test the names are looked up once per chunk, not per series"""
+        with patch.object(SeriesViewSet, 'export_chunk_size', 2):
+            with CaptureQueriesContext(connection) as queries:
+                self._export()
+
+        # 3 chunks, the series and two name queries each
+        name_queries = [
+            query for query in queries.captured_queries
+            if 'core_series_tags' in query['sql'] or
+            'core_series_characters' in query['sql']
+        ]
+        self.assertEqual(len(name_queries), 6)
+
+    # TEST 48:-
+    def test_export_filtered_and_invalid_type(self):
+        """Test the export takes the list filters and rejects bad types"""
+        tag = sample_tag(user=self.user, name='c')
+        self.series[2].tags.add(tag)
+
+        _, content = self._export({'tags': tag.id})
+
+        self.assertEqual(len(content.splitlines()), 1)
+        res = self.client.get(EXPORT_URL, {'type': 'xml'})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class SeriesSparseFieldsTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@akshay.com',
+            'testpass'
+        )
+        self.client.force_authenticate(self.user)
+        self.tag = sample_tag(user=self.user)
+        self.character = sample_character(user=self.user)
+        self.series = []
+        for i in range(3):
+            series = sample_series(
+                user=self.user, title=f'Series {i}',
+                start_date=timezone.now() - timezone.timedelta(days=i)
+            )
+            series.tags.add(self.tag)
+            series.characters.add(self.character)
+            self.series.append(series)
+
+    # TEST 49:-
+    def test_list_sparse_fields(self):
+        """Test only the fields asked for are loaded and returned"""
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(
+                SERIES_URL, {'fields': 'id,title,status', 'page_size': 2}
+            )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['results'], [
+            {'id': series.id, 'title': series.title, 'status': True}
+            for series in self.series[:2]
+        ])
+        # The data version(ETag) and the page, no prefetch of the tags and
+        # characters and no unused column
+        self.assertEqual(len(queries), 2)
+        self.assertNotIn('"core_series"."link"', queries[1]['sql'])
+        self.assertNotIn('core_series_tags', queries[1]['sql'])
+
+        # The cursor still works with the sparse fields
+        res = self.client.get(res.data['next'])
+        self.assertEqual(
+            [item['id'] for item in res.data['results']], [self.series[2].id]
+        )
+
+    # TEST 50:-
+    def test_sparse_fields_prefetch_requested_relations(self):
+        """Test only the relations asked for are prefetched"""
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(SERIES_URL, {'fields': 'title,tags'})
+
+        self.assertEqual(res.data['results'][0],
+                         {'title': 'Series 0', 'tags': [self.tag.id]})
+        # The tag ids come with the page, the character ids are not read
+        self.assertEqual(len(queries), 2)
+        self.assertIn('core_series_tags', queries[1]['sql'])
+        self.assertFalse(any('core_series_characters' in query['sql']
+                             for query in queries))
+
+    # TEST 51:-
+    def test_detail_sparse_fields(self):
+        """Test the detail view takes the fields, nested relations too"""
+        res = self.client.get(detail_url(self.series[0].id),
+                              {'fields': 'id,characters'})
+
+        self.assertEqual(res.data, {
+            'id': self.series[0].id,
+            'characters': [{'id': self.character.id, 'name': 'Berlin'}],
+        })
+
+    # TEST 52:-
+    def test_invalid_sparse_fields(self):
+        """Test unknown and empty fieldsets are rejected"""
+        for fields in ('id,owner', ',', 'image'):
+            res = self.client.get(SERIES_URL, {'fields': fields})
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn('fields', res.data)
+
+
+# The list is built from values() rows, it must render exactly like the
+# 'SeriesSerializer' path
+class SeriesValuesListTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@akshay.com',
+            'testpass'
+        )
+        self.client.force_authenticate(self.user)
+        tags = [sample_tag(user=self.user, name=f'Tag {i}') for i in range(3)]
+        characters = [sample_character(user=self.user, name=f'Character {i}')
+                      for i in range(2)]
+        start = timezone.now().replace(microsecond=0)
+        values = (
+            {'rating': 8, 'link': ''},
+            {'rating': '-0.5', 'link': 'https://example.com', 'status': False},
+            {'rating': '7.25', 'title': 'Señor Ünicode "quoted"'},
+            {'rating': '99.99', 'watch_rate': 0},
+        )
+        for i, params in enumerate(values):
+            # Whole seconds and microseconds render differently
+            params['start_date'] = start - timezone.timedelta(
+                days=i, microseconds=i * 1500
+            )
+            series = sample_series(user=self.user, **params)
+            # Added in a different order than the ids
+            series.tags.add(*reversed(tags[i % 2:]))
+            if i != 3:
+                series.characters.add(*characters[:i])
+
+    def _compare(self, params, url=SERIES_URL):
+        """Assert both list paths return the same bytes"""
+        res = self.client.get(url, params)
+        with patch.object(SeriesViewSet, 'values_list', False):
+            expected = self.client.get(url, params)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.content, expected.content)
+        self.assertEqual(res['ETag'], expected['ETag'])
+        return res
+
+    # TEST 53:-
+    def test_values_list_matches_serializer(self):
+        """Test the values list renders like the serializer, page by page"""
+        for params in (
+            {},
+            {'page_size': 2},
+            {'fields': 'start_date,rating,id'},
+            {'fields': 'tags,title', 'page_size': 3},
+            {'tags': str(Tag.objects.first().id), 'match': 'any'},
+        ):
+            res = self._compare(params)
+            # Following the cursors
+            while res.data['next']:
+                res = self._compare({}, res.data['next'])
+            if res.data['previous']:
+                self._compare({}, res.data['previous'])
+
+        with timezone.override('Asia/Kolkata'):
+            self._compare({})
+
+    # TEST 54:-
+    def test_values_list_queries(self):
+        """Test the page and its ids are read in a single query"""
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(SERIES_URL)
+
+        self.assertEqual(len(res.data['results']), 4)
+        # The data version(ETag) and the page
+        self.assertEqual(len(queries), 2)
+        self.assertIn('core_series_characters', queries[1]['sql'])
+
+    # TEST 55:-
+    def test_values_list_falls_back_to_serializer(self):
+        """Test other output settings use the serializer"""
+        with override_settings(REST_FRAMEWORK={
+                'COERCE_DECIMAL_TO_STRING': False}):
+            res = self.client.get(SERIES_URL)
+
+        self.assertIsInstance(res.data['results'][0]['rating'], Decimal)
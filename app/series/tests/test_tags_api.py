@@ -1,15 +1,23 @@
+import threading
+from unittest.mock import patch
+
 from django.contrib.auth import get_user_model
+from django.db import connection, transaction
 from django.urls import reverse
-from django.test import TestCase
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
 
 from rest_framework import status
 from rest_framework.test import APIClient
 
 from core.models import Tag, Series
 
-from series.serializers import TagSerializer
+from series.bulk import get_or_create_names
+from series.cache import list_cache
+from series.serializers import BaseSeriesAttrSerializer, TagSerializer
 
 TAGS_URL = reverse('series:tag-list')
+TAGS_BULK_URL = reverse('series:tag-bulk-get-or-create')
 
 
 # Public API tests
@@ -150,3 +158,194 @@ class PrivateTagApiTests(TestCase):
         res = self.client.get(TAGS_URL, {'assigned_only': 1})
         # There need a second dummy tag for the transparancy of the test
         self.assertEqual(len(res.data), 1)
+
+    # TEST 8:- tag names are unique per user, ignoring the case
+    def test_create_tag_duplicate_name(self):
+        """Test creating a tag with an existing name fails"""
+        Tag.objects.create(user=self.user, name='Thriller')
+        res = self.client.post(TAGS_URL, {'name': 'THRILLER'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 1)
+
+    # TEST 9:- bulk get or create tags by name
+    def test_bulk_get_or_create_tags(self):
+        """Test existing tags are returned and missing ones created"""
+        existing = Tag.objects.create(user=self.user, name='Thriller')
+        user2 = get_user_model().objects.create_user(
+            'test2@akshay.com',
+            'testpass123'
+        )
+        Tag.objects.create(user=user2, name='Noir')
+
+        res = self.client.post(
+            TAGS_BULK_URL,
+            {'names': ['Noir', 'thriller', 'Satire']},
+            format='json'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [item['name'] for item in res.data],
+            ['Noir', 'Thriller', 'Satire']
+        )
+        self.assertEqual(res.data[1]['id'], existing.id)
+        tags = Tag.objects.filter(user=self.user)
+        self.assertEqual(tags.count(), 3)
+        self.assertEqual(
+            {item['id'] for item in res.data},
+            set(tags.values_list('id', flat=True))
+        )
+
+    # TEST 10:-
+    def test_bulk_get_or_create_query_count_is_constant(self):
+        """Test the queries don't grow with the number of names"""
+        with CaptureQueriesContext(connection) as small:
+            self.client.post(TAGS_BULK_URL, {'names': ['a']}, format='json')
+        names = [f'Tag {i}' for i in range(100)]
+        with CaptureQueriesContext(connection) as large:
+            self.client.post(TAGS_BULK_URL, {'names': names}, format='json')
+
+        self.assertEqual(len(small), len(large))
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 101)
+
+    # TEST 11:-
+    def test_bulk_get_or_create_invalid(self):
+        """Test an empty list of names is rejected"""
+        res = self.client.post(TAGS_BULK_URL, {'names': []}, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+# The tag list responses are cached per user
+class TagListCacheTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@akshay.com',
+            'password123'
+        )
+        self.client.force_authenticate(self.user)
+        self.tag = Tag.objects.create(user=self.user, name='Drama')
+        list_cache.cache.clear()
+        list_cache.clear()
+
+    def _list_tags(self, params=None):
+        """Return the tag list response and its number of queries"""
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(TAGS_URL, params or {})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return res, len(queries)
+
+    # TEST 12:-
+    def test_list_served_from_cache(self):
+        """Test an unchanged list is served without the list query"""
+        first, first_count = self._list_tags()
+        second, second_count = self._list_tags()
+
+        self.assertEqual(second.data, first.data)
+        # Only the data version lookup left
+        self.assertEqual(second_count, first_count - 1)
+        self.assertEqual(list_cache.stats(), {
+            'hits': 1, 'misses': 1, 'hit_ratio': 0.5
+        })
+
+    # TEST 13:-
+    def test_cache_invalidated_by_changes(self):
+        """Test saving or deleting a tag drops the cached lists"""
+        self._list_tags()
+        tag = Tag.objects.create(user=self.user, name='Comedy')
+
+        self.assertIsNone(
+            list_cache.cache.get(list_cache.key('tags', self.user.pk))
+        )
+        res, _ = self._list_tags()
+        self.assertEqual(len(res.data), 2)
+
+        tag.delete()
+        res, _ = self._list_tags()
+        self.assertEqual(len(res.data), 1)
+
+    # TEST 14:-
+    def test_assigned_only_cached_separately(self):
+        """Test linking a tag to a series updates the assigned list"""
+        res, _ = self._list_tags({'assigned_only': 1})
+        self.assertEqual(res.data, [])
+        series = Series.objects.create(
+            user=self.user, title='Dark', watch_rate=1, rating=9
+        )
+        series.tags.add(self.tag)
+
+        res, _ = self._list_tags({'assigned_only': 1})
+
+        self.assertEqual([tag['id'] for tag in res.data], [self.tag.id])
+        res, _ = self._list_tags()
+        self.assertEqual(len(res.data), 1)
+
+    # TEST 15:-
+    def test_raw_writes_not_served_stale(self):
+        """Test writes without signals are seen through the data version"""
+        self._list_tags()
+        # Raw INSERT, no post_save
+        get_or_create_names(Tag, self.user, ['Comedy'])
+
+        res, _ = self._list_tags()
+
+        self.assertEqual(len(res.data), 2)
+
+
+# Concurrent get or create, needs real transactions(not the test case ones)
+class ConcurrentTagBulkTests(TransactionTestCase):
+
+    # TEST 16:-
+    def test_concurrent_get_or_create_creates_once(self):
+        """Test concurrent writers never create duplicate names"""
+        user = get_user_model().objects.create_user(
+            'test@akshay.com',
+            'password123'
+        )
+        names = [f'Tag {i}' for i in range(50)]
+        results, errors = [], []
+        barrier = threading.Barrier(8)
+
+        def worker():
+            try:
+                barrier.wait()
+                with transaction.atomic():
+                    results.append(get_or_create_names(Tag, user, names))
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(Tag.objects.filter(user=user).count(), len(names))
+        # Every writer got the same ids
+        self.assertTrue(all(result == results[0] for result in results))
+
+    # TEST 17:-
+    def test_concurrent_create_same_name(self):
+        """Test a create losing the race on a name gets a 400, not a 500"""
+        user = get_user_model().objects.create_user(
+            'test@akshay.com',
+            'password123'
+        )
+        client = APIClient()
+        client.force_authenticate(user)
+        Tag.objects.create(user=user, name='Drama')
+
+        # As if the other create committed after this one was validated
+        with patch.object(BaseSeriesAttrSerializer, 'validate_name',
+                          lambda self, value: value):
+            res = client.post(TAGS_URL, {'name': 'drama'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data['name'][0].code, 'duplicate_name')
+        self.assertEqual(Tag.objects.filter(user=user).count(), 1)
@@ -1,21 +1,40 @@
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Prefetch
+from django.http import StreamingHttpResponse
+
 from rest_framework import viewsets, mixins, status
-from rest_framework.authentication import TokenAuthentication
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound, ValidationError
 from rest_framework.response import Response
 
+from core.authentication import CachedTokenAuthentication, \
+                                SignedTokenAuthentication
+from core.metrics import IMAGE_UPLOADS, IMAGE_UPLOAD_BYTES
 from core.models import Tag, Character, Series
 from series import serializers
+from series.bulk import delete_series, get_or_create_names, \
+                        increment_watch_rate, update_series
+from series.cache import list_cache
+from series.conditional import DataVersionETagMixin
+from series.export import EXPORT_TYPES
+from series.pagination import SeriesCursorPagination
+from series.values import represent, series_values, supported
 
 
 # Refractoring the code
-class BaseSeriesAttrViewset(viewsets.GenericViewSet,
+class BaseSeriesAttrViewset(DataVersionETagMixin,
+                            viewsets.GenericViewSet,
                             mixins.ListModelMixin,
                             mixins.CreateModelMixin):
     """
     Base viewset for user owned series attributes
     """
-    authentication_classes = (TokenAuthentication,)
+    # Signed access tokens('Bearer') need no database lookup, authtokens
+    # ('Token') are still accepted
+    authentication_classes = (SignedTokenAuthentication,
+                              CachedTokenAuthentication)
     permission_classes = (IsAuthenticated,)
     # queryset and serializer class are different on both
 
@@ -34,13 +53,69 @@ class BaseSeriesAttrViewset(viewsets.GenericViewSet,
         )
         queryset = self.queryset
         if assigned_only:
-            # return only tags and characters assigned.
-            queryset = queryset.filter(series__isnull=False)
+            # return only tags and characters assigned, with an EXISTS
+            # semi-join on the through table. Joining 'series' needed a
+            # DISTINCT over the whole result to get unique items.
+            queryset = queryset.extra(where=[self._assigned_sql()])
+
+        return queryset.filter(user=self.request.user).order_by('-name')
+
+    def _assigned_sql(self):
+        """Return the EXISTS clause for objects assigned to any series"""
+        # Django 2.2 can only filter on an annotated Exists() as
+        # 'EXISTS(...) = true', which postgres runs as a subplan per row
+        # instead of a semi-join, so the clause is written out here.
+        qn = connection.ops.quote_name
+        field = Series._meta.get_field(self.series_field)
+        through = qn(field.m2m_db_table())
+        table = qn(self.queryset.model._meta.db_table)
+        return (
+            f'EXISTS (SELECT 1 FROM {through} '
+            f'WHERE {through}.{qn(field.m2m_reverse_name())} = {table}."id")'
+        )
+
+    # Cached per user, 'series.signals' drops the entries on changes
+    def list(self, request, *args, **kwargs):
+        """List the objects, from the cache if unchanged"""
+        return self.conditional_response(
+            self.cached_list, request, *args, **kwargs
+        )
+
+    def cached_list(self, request, *args, **kwargs):
+        """Return the cached list response, listing on a miss"""
+        version = self.get_data_version(request)
+        data = list_cache.get(
+            self.series_field, request.user.pk, version, request.query_params
+        )
+        if data is not None:
+            return Response(data)
 
-        # To get unique items test pass,
-        return queryset.filter(
-            user=self.request.user
-        ).order_by('-name').distinct()
+        response = mixins.ListModelMixin.list(self, request, *args, **kwargs)
+        list_cache.set(
+            self.series_field, request.user.pk, version,
+            request.query_params, response.data
+        )
+        return response
+
+    # Bulk get or create by name, returns the id of every name in the order
+    # given, creating the missing ones, in a constant number of queries.
+    @action(methods=['POST'], detail=False, url_path='bulk')
+    def bulk_get_or_create(self, request):
+        """Return the objects with the given names, creating missing ones"""
+        serializer = serializers.NameListSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        names = serializer.validated_data['names']
+
+        with transaction.atomic():
+            objects = get_or_create_names(
+                self.queryset.model, request.user, names
+            )
+
+        return Response(
+            [{'id': objects[name][0], 'name': objects[name][1]}
+             for name in names],
+            status=status.HTTP_200_OK
+        )
 
     # To pass tag tests 4&5-need to add CreateModelMixin[viewsets are custom.
     # using mixins], then it needs to override the perform_create,to assign the
@@ -51,7 +126,16 @@ class BaseSeriesAttrViewset(viewsets.GenericViewSet,
         # process, when a "create object" requested in viewset, this fun. evoke
         # and validated serializer will get passed as an argument, here it sets
         # the saved used to "Authenticated user"
-        serializer.save(user=self.request.user)
+        try:
+            # A concurrent create of the same name passes 'validate_name'
+            # too, the (user_id, lower(name)) index rejects the second one
+            with transaction.atomic():
+                serializer.save(user=self.request.user)
+        except IntegrityError:
+            raise ValidationError(
+                {'name': [serializer.error_messages['duplicate_name']]},
+                code='duplicate_name'
+            )
 
 
 # creating a 'Viewset' view based on generic viewset and use the ListModelMixin
@@ -61,6 +145,8 @@ class TagViewSet(BaseSeriesAttrViewset):
     """
     queryset = Tag.objects.all()
     serializer_class = serializers.TagSerializer
+    # The Series M2M field linking to the objects, for 'assigned_only'
+    series_field = 'tags'
 
 
 class CharacterViewSet(BaseSeriesAttrViewset):
@@ -69,17 +155,32 @@ class CharacterViewSet(BaseSeriesAttrViewset):
     """
     queryset = Character.objects.all()
     serializer_class = serializers.CharacterSerializer
+    series_field = 'characters'
 
 
 # All functionality create, retrive, update and view details.so -ModelViewSet-
-class SeriesViewSet(viewsets.ModelViewSet):
+class SeriesViewSet(DataVersionETagMixin, viewsets.ModelViewSet):
     """
     Manage Series in Database
     """
     serializer_class = serializers.SeriesSerializer
     queryset = Series.objects.all()
-    authentication_classes = (TokenAuthentication,)
+    # Signed access tokens('Bearer') need no database lookup, authtokens
+    # ('Token') are still accepted
+    authentication_classes = (SignedTokenAuthentication,
+                              CachedTokenAuthentication)
     permission_classes = (IsAuthenticated,)
+    # Large libraries are paged with a (start_date, id) keyset cursor
+    pagination_class = SeriesCursorPagination
+    # Max. number of series in a single bulk request
+    bulk_max_items = 10000
+    # Rows read(and names looked up) at a time by the export
+    export_chunk_size = 2000
+    # '?fields=id,title,status' for the list and detail views
+    fields_query_param = 'fields'
+    related_fields = ('tags', 'characters')
+    # Lists from values() rows, False for the serializer path
+    values_list = True
 
     # If any function intended as private, provide the fun. name '_fun-name'
     # priv. fun to convert the filter string to intergers.
@@ -87,6 +188,52 @@ class SeriesViewSet(viewsets.ModelViewSet):
         """Convert the List of strings ID's to a list of integers"""
         return [int(str_id) for str_id in qs.split(',')]
 
+    def _collect_ids(self, data, field_name):
+        """Return every valid integer id of a field in a list of items"""
+        ids = set()
+        for item in data:
+            values = item.get(field_name) if isinstance(item, dict) else None
+            if not isinstance(values, list):
+                continue
+            for value in values:
+                # Invalid ids are reported by the serializer field
+                try:
+                    ids.add(int(value))
+                except (TypeError, ValueError):
+                    pass
+        return list(ids)
+
+    def _filter_related(self, queryset, field_name, ids, match):
+        """Filter series linked to any/all of the ids of an M2M field"""
+        # The ids go as a single array parameter('= ANY(%s)'), the same
+        # statement whatever the number of ids.
+        qn = connection.ops.quote_name
+        field = Series._meta.get_field(field_name)
+        through = qn(field.m2m_db_table())
+        series_column = qn(field.m2m_column_name())
+        related_column = qn(field.m2m_reverse_name())
+        table = qn(Series._meta.db_table)
+
+        if match == 'all':
+            # Grouped on the (related, series) index, the through table is
+            # unique on (series, related) so the count matches only if every
+            # id is linked.
+            where = (
+                f'{table}."id" IN (SELECT {series_column} FROM {through} '
+                f'WHERE {related_column} = ANY(%s) '
+                f'GROUP BY {series_column} HAVING COUNT(*) = %s)'
+            )
+            params = [ids, len(set(ids))]
+        else:
+            where = (
+                f'EXISTS (SELECT 1 FROM {through} '
+                f'WHERE {through}.{series_column} = {table}."id" '
+                f'AND {through}.{related_column} = ANY(%s))'
+            )
+            params = [ids]
+
+        return queryset.extra(where=[where], params=params)
+
     def get_queryset(self):
         """Retrive the series for the authenticated user"""
         # Adding filter feature to API,need extracting the comma seperated
@@ -94,23 +241,115 @@ class SeriesViewSet(viewsets.ModelViewSet):
         # 'query_params'- is variable in request parameter ie a dictionary
         tags = self.request.query_params.get("tags")  # string retrieved
         characters = self.request.query_params.get("characters")
+        # 'any'- series with at least one of the ids, 'all'- with every id
+        match = self.request.query_params.get('match', 'any')
+        if match not in ('any', 'all'):
+            raise ValidationError({'match': "Must be 'any' or 'all'."})
 
         # refernce the queryset, apply the filtes and return the same
         queryset = self.queryset
         # if tags is not None(default ret. of get())
         if tags:
             tag_ids = self._params_to_ints(tags)
-            # Django syntax: filtering on foreignkey objects, tags field has
-            # a foreignkey relationship with tags table id, need to filter by
-            # that id('__' represents that remote table), 'in'- function
-            # to return all the tags that matches with id in given list.
-            queryset = queryset.filter(tags__id__in=tag_ids)
+            # Filtering with 'tags__id__in' joins the through table and
+            # returns a series once per matching tag, the subquery keeps
+            # every series once without a DISTINCT.
+            queryset = self._filter_related(queryset, 'tags', tag_ids, match)
         if characters:
             character_ids = self._params_to_ints(characters)
-            queryset = queryset.filter(characters__id__in=character_ids)
+            queryset = self._filter_related(
+                queryset, 'characters', character_ids, match
+            )
+
+        if self.action in ('list', 'retrieve'):
+            fields = self.get_sparse_fields()
+            # Load the M2M ids/rows for the whole page in one query per
+            # relation insted of one query per series(N+1), for the list and
+            # detail views, only for the relations asked for. The ids in id
+            # order, as listed by 'series.values'
+            related = [
+                Prefetch(name, queryset=Series._meta.get_field(
+                    name).related_model.objects.order_by('id'))
+                for name in self.related_fields
+                if fields is None or name in fields
+            ]
+            if related:
+                queryset = queryset.prefetch_related(*related)
+            if fields is not None:
+                # The cursor of the next page needs the ordering columns
+                columns = set(fields).difference(self.related_fields)
+                columns.update(self.pagination_class.ordering)
+                queryset = queryset.only(*columns)
 
         return queryset.filter(user=self.request.user)
 
+    def get_sparse_fields(self):
+        """Return the fields asked for with '?fields=', None for all"""
+        value = self.request.query_params.get(self.fields_query_param)
+        if value is None:
+            return None
+        fields = [name.strip() for name in value.split(',') if name.strip()]
+        allowed = self.get_serializer_class().Meta.fields
+        unknown = [name for name in fields if name not in allowed]
+        if not fields or unknown:
+            raise ValidationError({self.fields_query_param: (
+                f"Must be some of: {', '.join(allowed)}."
+            )})
+        return fields
+
+    def get_serializer(self, *args, **kwargs):
+        """Pass the sparse fieldset to the list and detail serializers"""
+        if self.action in ('list', 'retrieve'):
+            kwargs.setdefault('fields', self.get_sparse_fields())
+        return super().get_serializer(*args, **kwargs)
+
+    # The list is built from values() rows('series.values'), skipping the
+    # model instances and serializer fields, the output is the same. Only for
+    # 'SeriesSerializer' and the settings it is written for.
+    def list(self, request, *args, **kwargs):
+        """List the series, unless the client has the current version"""
+        serializer_class = self.get_serializer_class()
+        if not self.values_list or not supported() or \
+                serializer_class is not serializers.SeriesSerializer:
+            return super().list(request, *args, **kwargs)
+        return self.conditional_response(
+            self.list_values, request, *args, **kwargs
+        )
+
+    def list_values(self, request, *args, **kwargs):
+        """Return a page of series read as values() rows"""
+        # In the serializer's order, whatever the order asked for
+        sparse = self.get_sparse_fields()
+        fields = [name for name in serializers.SeriesSerializer.Meta.fields
+                  if sparse is None or name in sparse]
+        queryset = series_values(
+            self.filter_queryset(self.get_queryset()), fields,
+            self.pagination_class.ordering
+        )
+
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(represent(page, fields))
+        return Response(represent(list(queryset), fields))
+
+    def retrieve(self, request, *args, **kwargs):
+        """Return a series, unless the client has the current version"""
+        # A missing or foreign series is a 404, not a 304: checked first,
+        # with an EXISTS on the primary key, the series is loaded and
+        # serialized only if the client's version is not the current one
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        try:
+            exists = self.filter_queryset(self.get_queryset()).filter(
+                **{self.lookup_field: kwargs[lookup_url_kwarg]}
+            ).exists()
+        except (TypeError, ValueError, DjangoValidationError):
+            exists = False
+        if not exists:
+            raise NotFound
+        return self.conditional_response(
+            super().retrieve, request, *args, **kwargs
+        )
+
     # In DRF "get_serializer_class" is the function called to retrieve the
     # serializer class for a particuler request.,if one need to change to diff.
     # serializer class for different actions that are available(detail api)
@@ -133,6 +372,127 @@ class SeriesViewSet(viewsets.ModelViewSet):
         # ModelViewSet allows to create objects-as default., just assaign the
         # authenticated user to it
 
+    # The whole library(or the filtered series) as a download, streamed a
+    # chunk at a time, 'type' is 'ndjson'(default) or 'csv'.
+    @action(methods=['GET'], detail=False, url_path='export')
+    def export(self, request):
+        """Stream all the series with their tag and character names"""
+        export_type = request.query_params.get('type', 'ndjson')
+        if export_type not in EXPORT_TYPES:
+            raise ValidationError(
+                {'type': f"Must be one of: {', '.join(EXPORT_TYPES)}."}
+            )
+        stream, content_type, extension = EXPORT_TYPES[export_type]
+
+        response = StreamingHttpResponse(
+            stream(self.get_queryset(), self.export_chunk_size),
+            content_type=content_type
+        )
+        response['Content-Disposition'] = \
+            f'attachment; filename="series.{extension}"'
+        return response
+
+    # Bulk create for importers, a JSON list of series in a single request,
+    # all or nothing: any invalid item and nothing is created.
+    @action(methods=['POST'], detail=False, url_path='bulk')
+    def bulk_create(self, request):
+        """Create a list of series"""
+        if not isinstance(request.data, list):
+            return Response(
+                {'non_field_errors': ['Expected a list of items.']},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if len(request.data) > self.bulk_max_items:
+            return Response(
+                {'non_field_errors': [
+                    f'Ensure this list has no more than '
+                    f'{self.bulk_max_items} items.'
+                ]},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        # The tags and characters of the whole payload in two queries, the
+        # serializer fields read them from the context.
+        context = self.get_serializer_context()
+        context['related_objects'] = {
+            'tags': Tag.objects.filter(user=request.user).in_bulk(
+                self._collect_ids(request.data, 'tags')
+            ),
+            'characters': Character.objects.filter(
+                user=request.user
+            ).in_bulk(self._collect_ids(request.data, 'characters')),
+        }
+        serializer = serializers.SeriesSerializer(
+            data=request.data, many=True, context=context
+        )
+        if not serializer.is_valid():
+            # A list with the errors of each item, '{}' for the valid ones
+            return Response(
+                {'errors': serializer.errors},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        series_list = serializer.save(user=request.user)
+
+        return Response(
+            {'ids': [series.id for series in series_list]},
+            status=status.HTTP_201_CREATED
+        )
+
+    # The same changes on a list of series('{"ids": [...], "changes": {}}'),
+    # ids of other users are not matched, the response has the row count.
+    @bulk_create.mapping.patch
+    def bulk_update(self, request):
+        """Apply the same field changes to a list of series"""
+        serializer = serializers.SeriesBulkUpdateSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        with transaction.atomic():
+            updated = update_series(
+                request.user,
+                serializer.validated_data['ids'],
+                serializer.validated_data['changes']
+            )
+
+        return Response({'updated': updated}, status=status.HTTP_200_OK)
+
+    @bulk_create.mapping.delete
+    def bulk_destroy(self, request):
+        """Delete a list of series"""
+        serializer = serializers.SeriesIdListSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        with transaction.atomic():
+            deleted = delete_series(
+                request.user, serializer.validated_data['ids']
+            )
+
+        return Response({'deleted': deleted}, status=status.HTTP_200_OK)
+
+    # "Watched one more episode" in a single statement, '{"by": -1}' to go
+    # back and '{"status": true}' to also mark the series as watched.
+    @action(methods=['POST'], detail=True, url_path='watch')
+    def watch(self, request, pk=None):
+        """Increment the watch rate of a series"""
+        serializer = serializers.WatchRateIncrementSerializer(
+            data=request.data
+        )
+        serializer.is_valid(raise_exception=True)
+
+        try:
+            series_id = int(pk)
+        except ValueError:
+            raise NotFound
+        result = increment_watch_rate(
+            request.user,
+            series_id,
+            serializer.validated_data['by'],
+            serializer.validated_data.get('status')
+        )
+        if result is None:
+            raise NotFound
+
+        return Response(result, status=status.HTTP_200_OK)
+
     # Add a new action: for the image upload Feature, can ovveride or add
     # custom actions, using action decorator.
     # 'detail=True'- only upload images for existing series, in detail url
@@ -150,6 +510,10 @@ class SeriesViewSet(viewsets.ModelViewSet):
         # valid. provided data correct and no extra-fields
         if serializer.is_valid():
             serializer.save()
+            image = serializer.validated_data.get('image')
+            if image:
+                IMAGE_UPLOADS.inc()
+                IMAGE_UPLOAD_BYTES.inc(amount=image.size)
             # return content - data, url of the image
             return Response(
                 serializer.data,
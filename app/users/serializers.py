@@ -4,9 +4,11 @@ from django.utils.translation import ugettext_lazy as _
 
 from rest_framework import serializers
 
+from core.timing import TimedSerializerMixin
+
 
 # using model serializer
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """
     Serializer for the user object
     """
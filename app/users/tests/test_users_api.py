@@ -13,6 +13,8 @@ CREATE_USER_URL = reverse('users:create')
 TOKEN_URL = reverse('users:token')
 # manage user endpoints url,
 ME_URL = reverse('users:me')
+# signed access token refresh url
+TOKEN_REFRESH_URL = reverse('users:token-refresh')
 
 
 # Helper function to create users for the tests(insted of creating manually..)
@@ -138,6 +140,38 @@ class PublicUserApiTests(TestCase):
 
         self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
 
+    # Test 8a: - signed access tokens along with the auth token
+    def test_create_token_returns_access_token(self):
+        """Test that a signed access token is returned with the token"""
+        payload = {'email': 'test@akshay.com', 'password': 'testpass'}
+        create_user(**payload)
+        res = self.client.post(TOKEN_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIn('access', res.data)
+        self.assertIn('expires_in', res.data)
+
+    # Test 8b
+    def test_refresh_access_token(self):
+        """Test the auth token can be exchanged for a new access token"""
+        payload = {'email': 'test@akshay.com', 'password': 'testpass'}
+        create_user(**payload)
+        token = self.client.post(TOKEN_URL, payload).data['token']
+
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token}')
+        res = self.client.post(TOKEN_REFRESH_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIn('access', res.data)
+
+    # Test 8c
+    def test_refresh_access_token_unauthorized(self):
+        """Test refreshing requires a valid auth token"""
+        self.client.credentials(HTTP_AUTHORIZATION='Token invalid')
+        res = self.client.post(TOKEN_REFRESH_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
 
 # PRIVATE USER API TESTS :- Auth. required
 # Adding some authenticated requests, to test the successful retrieval of
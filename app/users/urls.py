@@ -7,5 +7,7 @@ app_name = 'users'
 urlpatterns = [
     path('create/', views.CreateUserView.as_view(), name='create'),
     path('token/', views.CreateTokenView.as_view(), name='token'),
+    path('token/refresh/', views.RefreshAccessTokenView.as_view(),
+         name='token-refresh'),
     path('me/', views.ManageUserView.as_view(), name='me'),
 ]
@@ -1,8 +1,16 @@
-from rest_framework import generics, authentication, permissions
+from django.conf import settings
+
+from rest_framework import generics, permissions
+from rest_framework.authentication import TokenAuthentication
 # ObtainAuthToken, slight modification needed
+from rest_framework.authtoken.models import Token
 from rest_framework.authtoken.views import ObtainAuthToken
+from rest_framework.response import Response
 from rest_framework.settings import api_settings
+from rest_framework.views import APIView
 
+from core.authentication import CachedTokenAuthentication, \
+                                create_access_token
 from users.serializers import UserSerializer, AuthTokenSerializer
 
 
@@ -24,6 +32,40 @@ class CreateTokenView(ObtainAuthToken):
     # Set the renderer, can view the Endpoints in the browser
     renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES
 
+    def post(self, request, *args, **kwargs):
+        """Return the auth token and a signed access token"""
+        serializer = self.serializer_class(
+            data=request.data,
+            context={'request': request}
+        )
+        serializer.is_valid(raise_exception=True)
+        user = serializer.validated_data['user']
+        token, created = Token.objects.get_or_create(user=user)
+
+        return Response({
+            'token': token.key,
+            'access': create_access_token(user),
+            'expires_in': settings.ACCESS_TOKEN_LIFETIME,
+        })
+
+
+# The auth token works as the refresh token of the signed access tokens
+class RefreshAccessTokenView(APIView):
+    """
+    Create a new access token for the auth token user
+    """
+    # Not the cached authentication, refreshing must see a deleted token or
+    # a deactivated user at once.
+    authentication_classes = (TokenAuthentication,)
+    permission_classes = (permissions.IsAuthenticated,)
+
+    def post(self, request):
+        """Return a new signed access token"""
+        return Response({
+            'access': create_access_token(request.user),
+            'expires_in': settings.ACCESS_TOKEN_LIFETIME,
+        })
+
 
 # For createing manage user endpoints
 class ManageUserView(generics.RetrieveUpdateAPIView):
@@ -34,9 +76,9 @@ class ManageUserView(generics.RetrieveUpdateAPIView):
 
     # For authentication and permission
     # The mechanism by which the authentication happens, there is cookie auth.
-    # Here it is token authentication
+    # Here it is token authentication(cached, see 'core.authentication')
     # permissions are the level of access the user has
-    authentication_classes = (authentication.TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (permissions.IsAuthenticated,)
 
     # Get object function to the API view:- get the model for the logged in usr